@@ -8,4 +8,9 @@ pip install -r requirements.txt
 python manage.py collectstatic --no-input
 
 # تحديث قاعدة البيانات
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+# بعد البناء تعمل عمليتان (Procfile): gunicorn للموقع و run_worker لطابور المهام
+# (الصور المصغرة، التصدير، الـ feeds، التنبيهات، تحرير الحجوزات). بدون العامل تبقى
+# المهام في الطابور ولا تُنفذ:
+#   python manage.py run_worker --concurrency 2
@@ -0,0 +1,43 @@
+"""
+إعدادات gunicorn: gunicorn -c gunicorn.conf.py
+- preload_app: تحميل Django والاستيرادات مرة واحدة في العملية الرئيسية قبل إنشاء العمال
+- تسخين الكاش (manage.py warm_store) قبل استقبال الطلبات
+"""
+
+import glob
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+wsgi_app = "mystor.wsgi:application"
+workers = int(os.environ.get("WEB_CONCURRENCY", "3"))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# 0 لتعطيل التسخين عند الإقلاع
+WARM_BUDGET = float(os.environ.get("WARM_BUDGET", "20"))
+
+
+def on_starting(server):
+    # عدادات /metrics تبدأ من الصفر مع كل نشر (ملف لكل عامل في METRICS_DIR)
+    metrics_dir = os.environ.get("METRICS_DIR")
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, "metrics-*.json")):
+            os.remove(path)
+
+
+def when_ready(server):
+    if not WARM_BUDGET:
+        return
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mystor.settings")
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connections
+
+    try:
+        call_command("warm_store", budget=WARM_BUDGET)
+    except Exception:
+        server.log.exception("فشل تسخين الكاش")
+    finally:
+        # لا نورث اتصالات قاعدة البيانات للعمال بعد fork
+        connections.close_all()
@@ -48,12 +48,17 @@ MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    "store.middleware.MetricsMiddleware",  # عدد وزمن الطلبات لكل view (/metrics)
+    "store.middleware.ResilienceMiddleware",  # صفحات الكتالوج المخزنة + الوضع المتدهور
+    "store.middleware.RateLimitMiddleware",  # قبل الجلسات: رد 429 لا يلمس الجلسة
+    "store.middleware.ReplicaRoutingMiddleware",  # القراءة من النسخة المتماثلة + Read-Your-Writes
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "store.middleware.ProfilingMiddleware",  # آخر القائمة: يقيس الـ view والقالب فقط
 ]
 
 ROOT_URLCONF = "mystor.urls"
@@ -90,6 +95,105 @@ DATABASES = {
     )
 }
 
+# نسخة متماثلة للقراءة (اختيارية). للتجربة محلياً بملفي SQLite:
+#   cp db.sqlite3 replica.sqlite3 && DATABASE_REPLICA_URL=sqlite:///replica.sqlite3
+if os.environ.get("DATABASE_REPLICA_URL"):
+    DATABASES["replica"] = dj_database_url.parse(
+        os.environ["DATABASE_REPLICA_URL"], conn_max_age=600
+    )
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+# وضع SQLite للإنتاج (اختياري): WAL و mmap و busy_timeout عند كل اتصال (store/sqlite.py)
+# ومعاملات IMMEDIATE لكتل الكتابة transaction.atomic. للمقارنة: python manage.py sqlite_benchmark
+SQLITE_TUNING = os.environ.get("SQLITE_TUNING") == "1"
+SQLITE_PRAGMAS = {}  # لتعديل القيم الافتراضية، مثلاً {"mmap_size": 0}
+if SQLITE_TUNING and DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    DATABASES["default"].setdefault("OPTIONS", {}).update(
+        {"transaction_mode": "IMMEDIATE", "timeout": 5}
+    )
+
+DATABASE_ROUTERS = ["store.routers.PrimaryReplicaRouter"]
+REPLICA_DATABASE_ALIAS = "replica"  # إذا لم تكن معرّفة تذهب كل القراءات إلى default
+REPLICA_ROUTED_APPS = ["store"]  # الجلسات والمستخدمون تبقى دائماً على الأساسية
+READ_YOUR_WRITES_SECONDS = 5  # مدة تثبيت المستخدم على الأساسية بعد الكتابة
+
+
+# Authentication
+# https://docs.djangoproject.com/en/5.2/topics/auth/customizing/
+
+AUTHENTICATION_BACKENDS = [
+    "store.backends.EmailOrUsernameBackend",  # الدخول بالبريد أو اسم المستخدم باستعلام واحد
+]
+
+# حد محاولات تسجيل الدخول (Token Bucket) لكل IP ولكل حساب
+LOGIN_THROTTLE = {
+    "ip": {"capacity": 20, "refill_per_second": 20 / 60},
+    "account": {"capacity": 5, "refill_per_second": 5 / 300},
+}
+# عدد البروكسيات الموثوقة التي تضيف X-Forwarded-For (Render يضع واحداً)
+THROTTLE_PROXY_COUNT = 1 if "RENDER" in os.environ else 0
+
+# تحديد معدل طلبات الكتابة لكل مسار (حسب اسم المسار في store/urls.py)
+# السياسات: fixed_window / sliding_window / token_bucket
+RATE_LIMITS = {
+    "add_to_cart": {"policy": "token_bucket", "capacity": 30, "refill_per_second": 0.5},
+    "remove_from_cart": {"policy": "token_bucket", "capacity": 30, "refill_per_second": 0.5},
+    "add_review": {"policy": "fixed_window", "limit": 5, "window": 60},
+    "register_ajax": {"policy": "sliding_window", "limit": 5, "window": 3600},
+    "toggle_wishlist": {"policy": "token_bucket", "capacity": 20, "refill_per_second": 0.5},
+    "remove_from_wishlist": {"policy": "token_bucket", "capacity": 20, "refill_per_second": 0.5},
+    "move_wishlist_to_cart": {"policy": "fixed_window", "limit": 10, "window": 60},
+    "toggle_compare": {"policy": "token_bucket", "capacity": 30, "refill_per_second": 1},
+}
+# مكان حفظ العدادات:
+#   store.throttling.LocalMemoryStore  -> داخل العملية (خادم واحد)
+#   store.throttling.CacheStore        -> كاش "shared" إذا كان Redis/Memcached (بدون token_bucket)
+#   store.throttling.DatabaseStore     -> قاعدة البيانات الحالية (ذري، لكل السياسات)
+# حد محاولات الدخول يستخدم DatabaseStore دائماً
+RATE_LIMIT_STORE = {
+    "BACKEND": os.environ.get("RATE_LIMIT_STORE", "store.throttling.DatabaseStore"),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # الكاش المشترك بين عمال gunicorn (ملفات محلياً، ويمكن استبداله بـ Redis/Memcached)
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("SHARED_CACHE_DIR", os.path.join(BASE_DIR, "cache")),
+        "TIMEOUT": 300,
+    },
+}
+
+# الكاش ذو الطبقتين لاستعلامات الكتالوج (store/cache.py). قفل إعادة البناء بين
+# العمال ذري فقط مع Redis/Memcached؛ مع الملفات قد يعيد عاملان البناء معاً أحياناً
+STORE_CACHE = {
+    "ALIAS": "shared",
+    "LOCAL_MAX_ENTRIES": 1000,
+    "LOCAL_TTL": 5,  # أقصى مدة يرى فيها عامل آخر قيمة قديمة بعد الإبطال
+    "BETA": 1.0,  # معامل التحديث المبكر الاحتمالي (أكبر = أبكر)
+}
+
+
+# Stale-While-Revalidate لصفحات الكتالوج والوضع المتدهور عند ضغط قاعدة البيانات
+# (store/resilience.py). الحالة: api/health/ للموظفين
+RESILIENCE = {
+    "SWR_VIEWS": ["index", "products", "product_details"],
+    "FRESH_SECONDS": 30,
+    "STALE_SECONDS": 600,
+    "LATENCY_MS": 500,
+    "ERROR_RATE": 0.2,
+    "MIN_SAMPLES": 20,
+    "WINDOW_SECONDS": 30,
+    "COOLDOWN_SECONDS": 30,
+    "FORCE_MODE": os.environ.get("STORE_FORCE_MODE") or None,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -124,6 +228,11 @@ USE_TZ = True
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = "media/"
+# تقديم الوسائط من Django (views.media_file) للتطوير فقط: django.views.static.serve
+# غير مناسب للإنتاج. في الإنتاج يقدم خادم الواجهة (nginx أو CDN) MEDIA_ROOT على MEDIA_URL
+# مع "Cache-Control: public, max-age=31536000, immutable" لـ products/ وcustomers/
+# (أسماء مبنية على المحتوى) ومدة قصيرة لـ variants/
+SERVE_MEDIA = DEBUG
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
@@ -135,7 +244,20 @@ MEDIA_ROOT = "media/"
 STATIC_URL = "/dist/"
 STATICFILES_DIRS = [BASE_DIR / "dist"]  # هذا يشير إلى مجلد static الموجود في مشروعك
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# الوسائط المرفوعة تُسمى بـ sha256 محتواها (store/storage.py). الملفات القديمة:
+#   python manage.py rehash_media
+# ملاحظة: STATICFILES_STORAGE لم يعد مقروءاً منذ Django 5.1، لذلك كانت الملفات الثابتة
+# تُجمع فعلياً بـ StaticFilesStorage ونبقي عليه هنا كما هو
+STORAGES = {
+    "default": {
+        "BACKEND": "store.storage.ContentAddressedStorage",
+        "OPTIONS": {"prefixes": ["products/", "customers/"]},
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
 
 
 # Session configuration
@@ -148,9 +270,76 @@ SESSION_COOKIE_SECURE = False  # False في التطوير، True في الإن
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False  # الجلسة لا تنتهي عند إغلاق المتصفح
 
 
+# كتابة التقييمات: "sync" فوراً، أو "buffered" لتجميعها في دفعات (store/reviews.py)
+REVIEW_WRITE_MODE = os.environ.get("REVIEW_WRITE_MODE", "sync")
+REVIEW_BUFFER = {"max_size": 50, "max_delay": 2.0}
+# الحد الأقصى لعدد المنتجات في صفحة المقارنة
+COMPARE_MAX_PRODUCTS = 4
+# عدد المنتجات في شريط "شاهدتها مؤخراً" (كوكي موقّعة)، وفترة كتابة عدادات المشاهدة
+RECENTLY_VIEWED_MAX = 12
+VIEW_COUNTER_FLUSH_INTERVAL = 10.0
+# مقاييس Prometheus على /metrics (store/metrics.py). كل عامل يكتب ملفاً في METRICS_DIR
+# وتُجمع عند القراءة. الوصول للموظفين أو بالترويسة Authorization: Bearer <METRICS_TOKEN>
+METRICS_DIR = os.environ.get("METRICS_DIR", "")
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_FLUSH_INTERVAL = 5.0
+# قياس أداء الطلبات بـ cProfile أو بالعينات (store/profiling.py):
+# للموظفين ?_profile=1 أو ?_profile=sampling، والنتائج في لوحة التحكم
+PROFILING = {
+    "ENABLED": os.environ.get("PROFILING_ENABLED") == "1",
+    "MODE": "cprofile",
+    "SAMPLE_RATE": float(os.environ.get("PROFILING_SAMPLE_RATE", "0")),
+}
+# نسخة عمودية (NumPy، اختياري) لفلترة وترتيب صفحة المنتجات (store/snapshot.py).
+# البناء الأول: python manage.py build_catalog_snapshot، والتحديث عبر run_worker
+CATALOG_SNAPSHOT = {
+    "ENABLED": os.environ.get("CATALOG_SNAPSHOT") == "1",
+    "DIR": os.environ.get("CATALOG_SNAPSHOT_DIR", BASE_DIR / "snapshot"),
+}
+# ملفات sitemap وfeed المنتجات (store/feeds.py): python manage.py generate_feeds
+# وتُنشر على /sitemap.xml و/feeds/<name>
+FEEDS = {
+    "DIR": os.environ.get("FEEDS_DIR", BASE_DIR / "feeds"),
+    "SITE_URL": os.environ.get("SITE_URL", "http://localhost:8000"),
+    "SHARD_SIZE": 10000,
+}
+# تنبيهات المفضلة عند انخفاض السعر أو عودة المخزون (store/notifications.py):
+# رسالة واحدة لكل مستخدم تجمع تغييرات DIGEST_DELAY ثانية، ترسلها مهام run_worker
+WISHLIST_NOTIFICATIONS = {
+    "ENABLED": True,
+    "BACKEND": "store.notifications.EmailDigestBackend",
+    "DIGEST_DELAY": 300,
+    "CHUNK_SIZE": 1000,
+}
+EMAIL_BACKEND = os.environ.get(
+    "EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend"
+)
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "store@localhost")
+# حجز المخزون عند الإضافة للسلة لمدة TTL ثانية (store/reservations.py). الحجوزات
+# المنتهية تحررها مهام run_worker أو: python manage.py release_reservations
+STOCK_RESERVATIONS = {
+    "ENABLED": os.environ.get("STOCK_RESERVATIONS") == "1",
+    "TTL": int(os.environ.get("STOCK_RESERVATION_TTL", "900")),
+    "BATCH_SIZE": 500,
+}
+# طابور المهام الخلفية في قاعدة البيانات (store/jobs.py). العامل عملية منفصلة
+# بجانب gunicorn (انظر Procfile):
+#   python manage.py run_worker --concurrency 4
+JOB_QUEUE = {
+    "MAX_ATTEMPTS": 5,
+    "BACKOFF_BASE": 10,
+    "LOCK_TIMEOUT": 600,
+    "HEARTBEAT_INTERVAL": 60,
+    "RETENTION_DAYS": 7,
+}
+# ملفات تصدير الطلبات من لوحة التحكم: خارج MEDIA_ROOT فلا تُقدم للعامة
+EXPORTS_DIR = os.environ.get("EXPORTS_DIR", BASE_DIR / "exports")
+# عدد التقييمات في كل صفحة (صفحة المنتج و api/product/<id>/reviews/)
+REVIEWS_PAGE_SIZE = 10
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
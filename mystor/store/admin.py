@@ -1,5 +1,84 @@
-from django.contrib import admin
+from datetime import timedelta
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.core.paginator import Paginator
+from django.db import IntegrityError, connections, transaction
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from django.utils import timezone
+
 from . import models
+from .analytics import dashboard_data
+from .bulk import OPERATIONS, bulk_update_products
+from .reservations import release
+from .tasks import (
+    EXPORT_NAME_RE,
+    export_name,
+    export_orders,
+    exports_storage,
+    recompute_ratings_task,
+)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    COUNT(*) الكامل بطيء على الجداول الكبيرة (ملايين الصفوف).
+    للقائمة بدون فلاتر نستخدم تقدير قاعدة البيانات إذا تجاوز ESTIMATE_THRESHOLD:
+    - PostgreSQL: pg_class.reltuples (يُحدّث مع ANALYZE/autovacuum)
+    - SQLite: sqlite_stat1 بعد تشغيل ANALYZE
+    ومع الفلاتر أو البحث، أو إذا لم يتوفر تقدير، نعد الصفوف فعلياً.
+    """
+
+    ESTIMATE_THRESHOLD = 100_000
+
+    def _estimate(self):
+        query = self.object_list.query
+        if query.where or query.distinct:
+            return None
+        table = self.object_list.model._meta.db_table
+        connection = connections[self.object_list.db]
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [table],
+                )
+            elif connection.vendor == "sqlite":
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'"
+                )
+                if cursor.fetchone() is None:
+                    return None
+                cursor.execute(
+                    "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]
+                )
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+            else:
+                return None
+            row = cursor.fetchone()
+        return row[0] if row and row[0] > 0 else None
+
+    @cached_property
+    def count(self):
+        estimate = self._estimate()
+        if estimate is not None and estimate >= self.ESTIMATE_THRESHOLD:
+            return estimate
+        return super().count
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """إعدادات مشتركة لقوائم الجداول الكبيرة: عدد تقديري وبدون عدّ إجمالي ثانٍ"""
+
+    list_per_page = 50
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(models.Category)
@@ -15,27 +94,334 @@ class BrandAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.Review)
-class RivewAdmin(admin.ModelAdmin):
-    list_per_page = 50
-    search_fields = ["name"]
+class RivewAdmin(ScalableAdmin):
+    list_display = ["id", "product", "customer", "rating", "review_date"]
+    list_select_related = ["product", "customer"]
+    list_filter = ["rating"]
+    date_hierarchy = "review_date"
+    search_fields = ["product__name", "customer__name"]
+    autocomplete_fields = ["product", "customer"]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # التعديل اليدوي لا يمر عبر store/reviews.py، لذا نعيد بناء ملخص المنتج في الخلفية
+        recompute_ratings_task.enqueue(
+            product_ids=[obj.product_id], dedup_key=f"ratings:{obj.product_id}"
+        )
+
+
+@admin.register(models.Customer)
+class CustomerAdmin(ScalableAdmin):
+    list_display = ["id", "name", "email", "phone_number"]
+    search_fields = ["name", "email"]
+    raw_id_fields = ["user"]
+
+
+class BulkEditForm(forms.Form):
+    operation = forms.ChoiceField(label="العملية", choices=OPERATIONS.items())
+    value = forms.DecimalField(
+        label="القيمة",
+        required=False,
+        max_digits=10,
+        decimal_places=2,
+        help_text="النسبة أو المبلغ أو الكمية (غير مطلوبة لتغيير التوفر)",
+    )
+
+    def clean(self):
+        data = super().clean()
+        operation, value = data.get("operation"), data.get("value")
+        if operation in ("price_percent", "price_delta", "stock_delta") and value is None:
+            self.add_error("value", "هذه العملية تحتاج قيمة")
+        if operation == "stock_delta" and value is not None and value != int(value):
+            self.add_error("value", "كمية المخزون يجب أن تكون عدداً صحيحاً")
+        return data
 
 
 @admin.register(models.Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_per_page = 50
-    search_fields = ["name"]
+class ProductAdmin(ScalableAdmin):
+    list_display = [
+        "id", "name", "category", "brand", "price", "stock", "reserved", "is_available",
+        "updated_at",
+    ]
+    list_select_related = ["category", "brand"]
+    list_filter = ["is_available", "category", "brand"]
+    search_fields = ["name", "=sku"]
+    autocomplete_fields = ["category", "brand"]
+    actions = ["bulk_edit"]
+
+    @admin.action(description="تعديل جماعي (السعر، المخزون، التوفر)", permissions=["change"])
+    def bulk_edit(self, request, queryset):
+        form = BulkEditForm(request.POST if "apply" in request.POST else None)
+        if form.is_valid():
+            changed, skipped = bulk_update_products(
+                queryset, form.cleaned_data["operation"], form.cleaned_data["value"]
+            )
+            self.message_user(request, f"تم تعديل {changed} منتج")
+            if skipped:
+                shown = ", ".join(str(pk) for pk in skipped[:50])
+                more = f" و{len(skipped) - 50} غيرها" if len(skipped) > 50 else ""
+                self.message_user(
+                    request,
+                    f"تم تخطي {len(skipped)} منتج لأن مخزونها غير المحجوز لا يكفي: "
+                    f"{shown}{more}",
+                    messages.WARNING,
+                )
+            return None
+
+        select_across = request.POST.get("select_across") == "1"
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "تعديل جماعي للمنتجات",
+            "form": form,
+            "count": queryset.count(),
+            "select_across": select_across,
+            # مع "تحديد الكل" تكفي الفلاتر في الرابط، بدون قائمة المعرفات
+            "selected_ids": (
+                [] if select_across else request.POST.getlist(ACTION_CHECKBOX_NAME)
+            ),
+            "action_checkbox_name": ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, "admin/store/product_bulk_edit.html", context)
 
 
 @admin.register(models.Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_per_page = 50
+class OrderAdmin(ScalableAdmin):
+    list_display = ["id", "customer", "status", "total", "order_date"]
+    list_select_related = ["customer"]
+    list_filter = ["status"]
+    date_hierarchy = "order_date"
+    search_fields = ["customer__name"]
+    autocomplete_fields = ["customer"]
+    actions = ["export_csv"]
+
+    def get_search_results(self, request, queryset, search_term):
+        # رقم الطلب بالمطابقة التامة للأرقام فقط: "=id" مع نص غير رقمي يعطي خطأ 500
+        results, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term
+        )
+        term = search_term.strip()
+        if term.isdecimal() and len(term) <= 18:
+            results |= queryset.filter(pk=int(term))
+        return results, may_have_duplicates
+
+    @admin.action(description="تصدير الطلبات المحددة إلى CSV (في الخلفية)")
+    def export_csv(self, request, queryset):
+        name = export_name()
+        job = export_orders.enqueue(
+            order_ids=list(queryset.values_list("pk", flat=True)), name=name
+        )
+        url = reverse("admin:store_order_export", args=[name])
+        self.message_user(
+            request,
+            format_html(
+                'تمت إضافة مهمة التصدير #{}، والملف متاح بعد انتهائها من <a href="{}">هنا</a>',
+                job.pk,
+                url,
+            ),
+        )
+
+    def get_urls(self):
+        return [
+            path(
+                "exports/<str:name>/",
+                self.admin_site.admin_view(self.export_view),
+                name="store_order_export",
+            ),
+        ] + super().get_urls()
+
+    def export_view(self, request, name):
+        storage = exports_storage()
+        if (
+            not self.has_view_permission(request)
+            or not EXPORT_NAME_RE.fullmatch(name)
+            or not storage.exists(name)
+        ):
+            raise Http404
+        return FileResponse(
+            storage.open(name, "rb"),
+            as_attachment=True,
+            filename=name,
+            content_type="text/csv; charset=utf-8",
+        )
 
 
 @admin.register(models.Specification)
-class SpecificationAdmin(admin.ModelAdmin):
-    list_per_page = 50
+class SpecificationAdmin(ScalableAdmin):
+    list_display = ["id", "product", "name", "value"]
+    list_select_related = ["product"]
+    search_fields = ["name", "value"]
+    autocomplete_fields = ["product"]
 
 
 @admin.register(models.InventoryMovement)
-class InventoryMovementAdmin(admin.ModelAdmin):
+class InventoryMovementAdmin(ScalableAdmin):
+    list_display = ["id", "product", "movement_type", "quantity", "movement_date"]
+    list_select_related = ["product"]
+    list_filter = ["movement_type"]
+    date_hierarchy = "movement_date"
+    search_fields = ["product__name"]
+    autocomplete_fields = ["product"]
+
+
+@admin.register(models.Attribute)
+class AttributeAdmin(admin.ModelAdmin):
     list_per_page = 50
+    list_display = ["name", "slug", "kind", "unit"]
+    search_fields = ["name", "slug"]
+
+
+@admin.register(models.SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    """لوحة تقارير المبيعات: تقرأ من جداول التجميع فقط ولا تلمس جدول الطلبات"""
+
+    DAY_OPTIONS = [7, 30, 90, 365]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        try:
+            days = int(request.GET.get("days", 30))
+        except ValueError:
+            days = 30
+        days = days if days in self.DAY_OPTIONS else 30
+        granularity = "HOUR" if request.GET.get("granularity") == "HOUR" else "DAY"
+        # الأيام الكاملة فقط حتى تتطابق بداية الفترة مع صفوف التجميع اليومية
+        start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        start -= timedelta(days=days - 1)
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "تقارير المبيعات",
+            "days": days,
+            "day_options": self.DAY_OPTIONS,
+            "granularity": granularity,
+            "data": dashboard_data(start, granularity),
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, "admin/store/sales_dashboard.html", context)
+
+
+@admin.register(models.Job)
+class JobAdmin(admin.ModelAdmin):
+    list_per_page = 50
+    list_display = ["id", "task", "status", "priority", "attempts", "run_at", "finished_at"]
+    list_filter = ["status", "task"]
+    readonly_fields = ["locked_by", "locked_at", "last_error", "created_at", "finished_at"]
+    actions = ["retry"]
+
+    @admin.action(description="إعادة تشغيل المهام المحددة")
+    def retry(self, request, queryset):
+        # كل مهمة على حدة: مهمة نشطة بنفس dedup_key تمنع إعادة نسختها المنتهية
+        updated, skipped = 0, []
+        for job in queryset.filter(status__in=["FAILED", "DONE"]).only("pk"):
+            try:
+                with transaction.atomic():
+                    updated += models.Job.objects.filter(pk=job.pk).update(
+                        status="QUEUED", attempts=0, run_at=timezone.now(), finished_at=None
+                    )
+            except IntegrityError:
+                skipped.append(str(job.pk))
+        self.message_user(request, f"أعيدت {updated} مهمة إلى الطابور")
+        if skipped:
+            self.message_user(
+                request,
+                f"لم تُعد المهام {', '.join(skipped)}: توجد مهمة نشطة بنفس مفتاح التكرار",
+                messages.WARNING,
+            )
+
+
+@admin.register(models.ProductChangeEvent)
+class ProductChangeEventAdmin(ScalableAdmin):
+    list_display = ["id", "product", "kind", "old_price", "new_price", "created_at", "fanned_out_at"]
+    list_select_related = ["product"]
+    list_filter = ["kind"]
+    date_hierarchy = "created_at"
+    readonly_fields = list_display
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(models.StockReservation)
+class StockReservationAdmin(ScalableAdmin):
+    list_display = ["id", "product", "quantity", "cart_id", "expires_at", "created_at"]
+    list_select_related = ["product"]
+    search_fields = ["=cart_id"]
+    autocomplete_fields = ["product"]
+    readonly_fields = ["product", "cart_id", "quantity", "expires_at", "created_at"]
+
+    def has_add_permission(self, request):
+        return False
+
+    # الحذف عبر release() حتى يُخصم من Product.reserved
+    def delete_model(self, request, obj):
+        release(obj.product_id, obj.cart_id)
+
+    def delete_queryset(self, request, queryset):
+        for product_id, cart_id in queryset.values_list("product_id", "cart_id"):
+            release(product_id, cart_id)
+
+
+@admin.register(models.ProfileRecord)
+class ProfileRecordAdmin(admin.ModelAdmin):
+    list_per_page = 50
+    list_display = [
+        "id", "created_at", "method", "path", "url_name", "mode",
+        "status_code", "duration_ms", "downloads",
+    ]
+    list_filter = ["mode", "url_name"]
+    search_fields = ["path"]
+    fields = [
+        "created_at", "method", "path", "url_name", "user", "mode",
+        "status_code", "duration_ms", "downloads", "summary",
+    ]
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="تحميل")
+    def downloads(self, obj):
+        if obj.pstats:
+            url = reverse("admin:store_profilerecord_download", args=[obj.pk, "pstats"])
+            return format_html('<a href="{}">pstats</a>', url)
+        url = reverse("admin:store_profilerecord_download", args=[obj.pk, "collapsed"])
+        return format_html('<a href="{}">collapsed (flamegraph)</a>', url)
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:pk>/download/<str:kind>/",
+                self.admin_site.admin_view(self.download_view),
+                name="store_profilerecord_download",
+            ),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk, kind):
+        if not self.has_view_permission(request):
+            raise Http404
+        record = get_object_or_404(models.ProfileRecord, pk=pk)
+        if kind == "pstats" and record.pstats:
+            response = HttpResponse(
+                bytes(record.pstats), content_type="application/octet-stream"
+            )
+            filename = f"profile-{record.pk}.pstats"
+        elif kind == "collapsed" and record.collapsed:
+            response = HttpResponse(record.collapsed, content_type="text/plain; charset=utf-8")
+            filename = f"profile-{record.pk}.collapsed.txt"
+        else:
+            raise Http404
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
@@ -0,0 +1,210 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Order, OrderItem, ProductSalesRollup, SalesRollup
+
+COMPLETED = "COMPLETED"
+
+
+def period_starts(moment):
+    """بداية الساعة وبداية اليوم (بتوقيت UTC كما في TIME_ZONE)"""
+    hour = moment.replace(minute=0, second=0, microsecond=0)
+    return {"HOUR": hour, "DAY": hour.replace(hour=0)}
+
+
+def _increment(model, lookup, deltas, defaults=None):
+    """زيادة عدادات صف التجميع، وإنشاؤه إذا لم يكن موجوداً"""
+    changes = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **(defaults or {}), **deltas)
+    except IntegrityError:
+        # عملية أخرى أنشأت الصف في نفس اللحظة
+        model.objects.filter(**lookup).update(**changes)
+
+
+class RollupBatch:
+    """تجميع التغييرات في الذاكرة ثم كتابتها بتحديث واحد لكل صف"""
+
+    def __init__(self):
+        self.totals = defaultdict(lambda: {"revenue": Decimal(0), "units": 0, "orders": 0})
+        self.products = defaultdict(lambda: {"revenue": Decimal(0), "units": 0, "orders": 0})
+        self.dimensions = {}
+
+    def add_order(self, order_date, items, sign=1):
+        """items: قواميس فيها product_id, category_id, brand_id, quantity, price"""
+        per_product = defaultdict(lambda: [Decimal(0), 0])
+        for item in items:
+            line = per_product[item["product_id"]]
+            line[0] += item["price"] * item["quantity"]
+            line[1] += item["quantity"]
+            self.dimensions[item["product_id"]] = (item["category_id"], item["brand_id"])
+        if not per_product:
+            return
+
+        for granularity, period in period_starts(order_date).items():
+            total = self.totals[(granularity, period)]
+            total["orders"] += sign
+            for product_id, (revenue, units) in per_product.items():
+                total["revenue"] += sign * revenue
+                total["units"] += sign * units
+                row = self.products[(granularity, period, product_id)]
+                row["revenue"] += sign * revenue
+                row["units"] += sign * units
+                row["orders"] += sign
+
+    def flush(self):
+        with transaction.atomic():
+            for (granularity, period), deltas in self.totals.items():
+                _increment(
+                    SalesRollup,
+                    {"granularity": granularity, "period_start": period},
+                    deltas,
+                )
+            for (granularity, period, product_id), deltas in self.products.items():
+                category_id, brand_id = self.dimensions[product_id]
+                _increment(
+                    ProductSalesRollup,
+                    {
+                        "granularity": granularity,
+                        "period_start": period,
+                        "product_id": product_id,
+                    },
+                    deltas,
+                    defaults={"category_id": category_id, "brand_id": brand_id},
+                )
+
+
+ITEM_FIELDS = {
+    "category_id": F("product__category_id"),
+    "brand_id": F("product__brand_id"),
+}
+
+
+def apply_order(order_id, sign=1):
+    """إضافة (sign=1) أو طرح (sign=-1) طلب مكتمل من جداول التجميع"""
+    order = Order.objects.filter(pk=order_id).values("order_date").first()
+    if order is None:
+        return
+    items = OrderItem.objects.filter(order_id=order_id).values(
+        "product_id", "quantity", "price", **ITEM_FIELDS
+    )
+    batch = RollupBatch()
+    batch.add_order(order["order_date"], list(items), sign)
+    batch.flush()
+
+
+@receiver(post_save, sender=Order)
+def order_status_changed(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, "_loaded_status", None)
+    current = instance.status
+    instance._loaded_status = current
+    if previous == current:
+        return
+    if current == COMPLETED:
+        sign = 1
+    elif previous == COMPLETED:
+        sign = -1
+    else:
+        return
+    # بعد نهاية المعاملة حتى تكون عناصر الطلب محفوظة
+    order_id = instance.pk
+    transaction.on_commit(lambda: apply_order(order_id, sign))
+
+
+def rebuild(since=None, chunk_size=1000, stdout=None):
+    """
+    إعادة بناء جداول التجميع من الطلبات المكتملة على دفعات مرتبة بالمفتاح.
+    since: تاريخ/وقت (بداية يوم) لإعادة البناء من بعده فقط.
+
+    الحذف وإعادة البناء في معاملة واحدة: اللوحة ترى الأرقام القديمة حتى النهاية
+    لا مجاميع جزئية. الحذف أول كتابة فيها فيأخذ قفل الكتابة (SQLite) أو أقفال الصفوف،
+    فالطلب الذي يكتمل أثناء البناء ينتظر ثم تُضاف زيادته فوق الأرقام الجديدة
+    ولا يُحسب مرتين.
+    """
+    rollups = [SalesRollup.objects.all(), ProductSalesRollup.objects.all()]
+    orders = Order.objects.filter(status=COMPLETED)
+    if since is not None:
+        rollups = [qs.filter(period_start__gte=since) for qs in rollups]
+        orders = orders.filter(order_date__gte=since)
+
+    last_pk = 0
+    processed = 0
+    with transaction.atomic():
+        for qs in rollups:
+            qs.delete()
+
+        while True:
+            chunk = list(
+                orders.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", "order_date")[:chunk_size]
+            )
+            if not chunk:
+                break
+            dates = dict(chunk)
+            items = defaultdict(list)
+            for item in OrderItem.objects.filter(order_id__in=dates).values(
+                "order_id", "product_id", "quantity", "price", **ITEM_FIELDS
+            ):
+                items[item["order_id"]].append(item)
+
+            batch = RollupBatch()
+            for order_id, order_date in chunk:
+                batch.add_order(order_date, items[order_id])
+            batch.flush()
+
+            last_pk = chunk[-1][0]
+            processed += len(chunk)
+            if stdout is not None:
+                stdout.write(f"{processed} طلب...")
+    return processed
+
+
+# ==========================================
+# بيانات لوحة التقارير (من جداول التجميع فقط)
+# ==========================================
+
+DASHBOARD_TOP = 10
+
+
+def dashboard_data(start, granularity="DAY"):
+    """ملخص المبيعات منذ start: السلسلة الزمنية وأفضل المنتجات والأصناف والشركات"""
+    totals = SalesRollup.objects.filter(granularity=granularity, period_start__gte=start)
+    products = ProductSalesRollup.objects.filter(
+        granularity=granularity, period_start__gte=start
+    )
+    sums = {"revenue": Sum("revenue"), "units": Sum("units")}
+
+    return {
+        "summary": totals.aggregate(orders=Sum("orders"), **sums),
+        "series": list(
+            totals.order_by("period_start").values(
+                "period_start", "revenue", "units", "orders"
+            )
+        ),
+        "top_products": list(
+            products.values("product_id", "product__name")
+            .annotate(orders=Sum("orders"), **sums)
+            .order_by("-revenue")[:DASHBOARD_TOP]
+        ),
+        "by_category": list(
+            products.values("category__name")
+            .annotate(**sums)
+            .order_by("-revenue")[:DASHBOARD_TOP]
+        ),
+        "by_brand": list(
+            products.values("brand__name").annotate(**sums).order_by("-revenue")[
+                :DASHBOARD_TOP
+            ]
+        ),
+    }
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        # تسجيل الإشارات: إعدادات SQLite وإبطال كاش الكتالوج وتجميع المبيعات
+        # وتسجيل المهام الخلفية (tasks) وعدادات المقاييس وتنبيهات المفضلة وحجز المخزون
+        from . import (  # noqa: F401
+            analytics,
+            catalog,
+            metrics,
+            notifications,
+            reservations,
+            sqlite,
+            tasks,
+        )
@@ -0,0 +1,270 @@
+import re
+from dataclasses import dataclass
+
+from django.utils.text import slugify
+
+from .models import Attribute, ProductAttributeValue, Specification
+
+# الوحدة كما تُكتب -> (الوحدة الموحدة، معامل التحويل).
+# المطابقة حساسة لحالة الأحرف: "5G" شبكة وليست 5 جرام، و"W" واط فقط.
+UNITS = {
+    "TB": ("GB", 1024),
+    "GB": ("GB", 1),
+    "MB": ("GB", 1 / 1024),
+    "تيرابايت": ("GB", 1024),
+    "جيجابايت": ("GB", 1),
+    "جيجا": ("GB", 1),
+    "ميجابايت": ("GB", 1 / 1024),
+    "GHz": ("GHz", 1),
+    "MHz": ("GHz", 1 / 1000),
+    "Hz": ("Hz", 1),
+    "inch": ("inch", 1),
+    "inches": ("inch", 1),
+    "in": ("inch", 1),
+    '"': ("inch", 1),
+    "بوصة": ("inch", 1),
+    "انش": ("inch", 1),
+    "mAh": ("mAh", 1),
+    "W": ("W", 1),
+    "kg": ("kg", 1),
+    "g": ("kg", 1 / 1000),
+    "كجم": ("kg", 1),
+    "جرام": ("kg", 1 / 1000),
+    "mm": ("mm", 1),
+    "cm": ("mm", 10),
+    "MP": ("MP", 1),
+}
+# الوحدات من حرفين فأكثر تُقبل بأي حالة أحرف ("16gb" و "2.4 ghz")
+_UNITS_ANY_CASE = {key.lower(): unit for key, unit in UNITS.items() if len(key) > 1}
+
+# القيم الأطول من ذلك تعتبر نصاً حراً وليست قائمة قيم
+ENUM_MAX_LENGTH = 64
+
+_NUMBER_RE = re.compile(r"^\s*([-+]?\d+(?:[.,]\d+)?)\s*(.*?)\s*$")
+_ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩٫", "0123456789.")
+
+
+@dataclass
+class ParsedValue:
+    numeric: float | None
+    unit: str
+    enum: str
+
+
+def normalize_text(raw):
+    return " ".join(str(raw).split()).lower()[:255]
+
+
+def parse_value(raw):
+    """
+    تحليل قيمة مواصفة مثل "16 GB" أو "1 TB" أو "15.6 بوصة".
+    القيمة الرقمية تُحوَّل للوحدة الموحدة (1 TB -> 1024 GB).
+    """
+    enum = normalize_text(raw)
+    match = _NUMBER_RE.match(" ".join(str(raw).split()).translate(_ARABIC_DIGITS))
+    if match:
+        number, unit_text = match.groups()
+        number = float(number.replace(",", "."))
+        if not unit_text:
+            return ParsedValue(number, "", enum)
+        unit = UNITS.get(unit_text) or _UNITS_ANY_CASE.get(unit_text.lower())
+        if unit is not None:
+            return ParsedValue(number * unit[1], unit[0], enum)
+    return ParsedValue(None, "", enum)
+
+
+class KindSummary:
+    """ملخص قيم خاصية واحدة لتحديد نوعها من كل القيم لا من أول قيمة"""
+
+    def __init__(self):
+        self.numeric = True
+        self.units = set()
+        self.max_length = 0
+
+    def add(self, parsed):
+        if parsed.numeric is None:
+            self.numeric = False
+        else:
+            self.units.add(parsed.unit)
+        self.max_length = max(self.max_length, len(parsed.enum))
+
+    def kind(self):
+        """(النوع، الوحدة): رقمية فقط إذا كانت كل القيم أرقاماً بوحدة واحدة"""
+        if self.numeric and len(self.units) == 1:
+            return "NUMERIC", next(iter(self.units))
+        if self.max_length <= ENUM_MAX_LENGTH:
+            return "ENUM", ""
+        return "TEXT", ""
+
+
+def _slug(name):
+    return slugify(name, allow_unicode=True)[:255] or "attribute"
+
+
+def attribute_for(name, parsed, cache=None):
+    """الخاصية المطابقة لاسم المواصفة (تُنشأ عند أول ظهور بنوع أول قيمة ثم يُراجع النوع)"""
+    slug = _slug(name)
+    if cache is not None and slug in cache:
+        return cache[slug]
+    summary = KindSummary()
+    summary.add(parsed)
+    kind, unit = summary.kind()
+    attribute, _ = Attribute.objects.get_or_create(
+        slug=slug, defaults={"name": name.strip(), "kind": kind, "unit": unit}
+    )
+    if cache is not None:
+        cache[slug] = attribute
+    return attribute
+
+
+def fits(attribute, parsed):
+    """هل تتفق القيمة مع نوع الخاصية ووحدتها الحالية؟"""
+    if attribute.kind == "NUMERIC":
+        return parsed.numeric is not None and parsed.unit == attribute.unit
+    if attribute.kind == "ENUM":
+        return len(parsed.enum) <= ENUM_MAX_LENGTH
+    return True
+
+
+def build_value(spec, cache=None):
+    parsed = parse_value(spec.value)
+    attribute = attribute_for(spec.name, parsed, cache)
+    numeric = parsed.numeric
+    # القيمة الرقمية بوحدة مختلفة عن وحدة الخاصية لا تصلح للمقارنة
+    if attribute.kind != "NUMERIC" or parsed.unit != attribute.unit:
+        numeric = None
+    return ProductAttributeValue(
+        product_id=spec.product_id,
+        attribute=attribute,
+        specification=spec,
+        numeric_value=numeric,
+        enum_value=parsed.enum,
+    )
+
+
+def _save_values(values):
+    ProductAttributeValue.objects.bulk_create(
+        values,
+        update_conflicts=True,
+        unique_fields=["specification"],
+        update_fields=["product", "attribute", "numeric_value", "enum_value"],
+    )
+
+
+def reclassify(attribute):
+    """إعادة تحديد نوع الخاصية من كل قيمها وإعادة بناء قيمها المنظمة"""
+    specs = list(Specification.objects.filter(typed_value__attribute=attribute))
+    summary = KindSummary()
+    for spec in specs:
+        summary.add(parse_value(spec.value))
+    kind, unit = summary.kind()
+    if (kind, unit) == (attribute.kind, attribute.unit):
+        return attribute
+    attribute.kind, attribute.unit = kind, unit
+    attribute.save(update_fields=["kind", "unit"])
+    _save_values([build_value(spec, {attribute.slug: attribute}) for spec in specs])
+    return attribute
+
+
+def sync_specification(spec):
+    """تحديث القيمة المنظمة لمواصفة واحدة (يُستدعى من إشارة post_save)"""
+    value = build_value(spec)
+    ProductAttributeValue.objects.update_or_create(
+        specification=spec,
+        defaults={
+            "product_id": value.product_id,
+            "attribute": value.attribute,
+            "numeric_value": value.numeric_value,
+            "enum_value": value.enum_value,
+        },
+    )
+    # قيمة لا تناسب النوع المحدد من القيم السابقة ("5G" بعد "4 GB"): يُراجع النوع
+    if not fits(value.attribute, parse_value(spec.value)):
+        reclassify(value.attribute)
+
+
+def backfill(batch_size=1000, stdout=None):
+    """
+    بناء الفهرس المنظم من كل المواصفات الموجودة على دفعات مرتبة بالمفتاح.
+    مروران: الأول يحدد نوع كل خاصية ووحدتها من كل قيمها، والثاني يكتب القيم.
+    """
+    summaries, names = {}, {}
+    for name, value in Specification.objects.values_list("name", "value").iterator(
+        chunk_size=batch_size
+    ):
+        slug = _slug(name)
+        names.setdefault(slug, name.strip())
+        summaries.setdefault(slug, KindSummary()).add(parse_value(value))
+
+    cache = {}
+    for slug, summary in summaries.items():
+        kind, unit = summary.kind()
+        attribute, created = Attribute.objects.get_or_create(
+            slug=slug, defaults={"name": names[slug], "kind": kind, "unit": unit}
+        )
+        if not created and (attribute.kind, attribute.unit) != (kind, unit):
+            attribute.kind, attribute.unit = kind, unit
+            attribute.save(update_fields=["kind", "unit"])
+        cache[slug] = attribute
+
+    last_pk = 0
+    total = 0
+    while True:
+        batch = list(
+            Specification.objects.filter(pk__gt=last_pk).order_by("pk")[:batch_size]
+        )
+        if not batch:
+            break
+        _save_values([build_value(spec, cache) for spec in batch])
+        last_pk = batch[-1].pk
+        total += len(batch)
+        if stdout is not None:
+            stdout.write(f"{total} مواصفة...")
+    return total
+
+
+# ==========================================
+# الفلترة بالمواصفات: ?spec=ram:gte:16&spec=color:eq:black
+# ==========================================
+
+NUMERIC_OPS = {"gt", "gte", "lt", "lte"}
+FILTER_OPS = NUMERIC_OPS | {"eq"}
+
+
+def parse_spec_filters(values):
+    """["ram:gte:16 GB", ...] -> [("ram", "gte", "16 GB"), ...] مع تجاهل الصيغ غير الصالحة"""
+    filters = []
+    for value in values:
+        parts = value.split(":", 2)
+        if len(parts) == 3 and parts[1] in FILTER_OPS and parts[2].strip():
+            filters.append((parts[0], parts[1], parts[2]))
+    return filters
+
+
+def filter_products(queryset, filters):
+    """
+    تطبيق فلاتر المواصفات على استعلام المنتجات.
+    كل فلتر يصبح استعلاماً فرعياً على فهرس (attribute, numeric_value) أو (attribute, enum_value).
+    """
+    if not filters:
+        return queryset
+    attributes = Attribute.objects.in_bulk({slug for slug, _, _ in filters}, field_name="slug")
+    for slug, op, raw in filters:
+        attribute = attributes.get(slug)
+        if attribute is None:
+            return queryset.none()
+
+        values = ProductAttributeValue.objects.filter(attribute=attribute)
+        parsed = parse_value(raw)
+        if attribute.kind == "NUMERIC" and parsed.numeric is not None:
+            if parsed.unit and parsed.unit != attribute.unit:
+                return queryset.none()
+            lookup = "exact" if op == "eq" else op
+            values = values.filter(**{f"numeric_value__{lookup}": parsed.numeric})
+        elif op == "eq":
+            values = values.filter(enum_value=parsed.enum)
+        else:
+            # مقارنة أكبر/أصغر تحتاج قيمة رقمية
+            return queryset.none()
+        queryset = queryset.filter(id__in=values.values("product_id"))
+    return queryset
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    """
+    مصادقة بالبريد الإلكتروني أو اسم المستخدم.
+    - استعلام واحد فقط يستفيد من فهرس lower(email) وفهرس username الفريد
+    - دالة التجزئة (PBKDF2) تعمل مرة واحدة فقط في كل محاولة
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if not username or password is None:
+            return None
+
+        login_input = username.strip()
+        lookup = Q(**{UserModel.USERNAME_FIELD: login_input})
+        users = UserModel._default_manager.all()
+        if "@" in login_input:
+            # Lower("email") يطابق تعبير الفهرس الوظيفي في الهجرة 0011
+            users = users.annotate(email_lower=Lower("email"))
+            lookup |= Q(email_lower=login_input.lower())
+
+        candidates = list(users.filter(lookup).order_by("pk")[:3])
+
+        # الأولوية لمطابقة اسم المستخدم حرفياً، ثم لأقدم حساب بنفس البريد
+        user = next(
+            (
+                u
+                for u in candidates
+                if getattr(u, UserModel.USERNAME_FIELD) == login_input
+            ),
+            candidates[0] if candidates else None,
+        )
+
+        if user is None:
+            # تشغيل دالة التجزئة مرة واحدة لتقليل فرق التوقيت بين مستخدم موجود وغير موجود
+            UserModel().set_password(password)
+            return None
+
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
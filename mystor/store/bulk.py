@@ -0,0 +1,117 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Greatest, Now, Round
+
+from .catalog import invalidate_on_commit
+from .models import InventoryMovement, Product
+from .notifications import record_changes, watched_state
+
+OPERATIONS = {
+    "price_percent": "تغيير السعر بنسبة مئوية",
+    "price_delta": "تغيير السعر بمبلغ ثابت",
+    "stock_delta": "تعديل المخزون (موجب للإضافة، سالب للإزالة)",
+    "set_available": "جعلها متوفرة",
+    "set_unavailable": "جعلها غير متوفرة",
+}
+
+
+def _price_expression(operation, value):
+    value = Decimal(value)
+    if operation == "price_percent":
+        new_price = F("price") * Value(1 + value / 100)
+    else:
+        new_price = F("price") + Value(value)
+    # لا سعر سالب، وبنفس دقة الحقل (خانتان عشريتان)
+    return Greatest(
+        Round(new_price, 2, output_field=DecimalField(max_digits=10, decimal_places=2)),
+        Value(Decimal("0.00")),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def _may_notify(operation, value):
+    """العمليات التي قد تخفض السعر أو تعيد المنتج للمخزون (تنبيهات المفضلة)"""
+    if operation in ("price_percent", "price_delta"):
+        return Decimal(value) < 0
+    if operation == "stock_delta":
+        return int(value) > 0
+    return operation == "set_available"
+
+
+def _apply_chunk(ids, operation, value):
+    """تحديث واحد للدفعة. يعيد ids المنتجات التي تغيرت فعلاً"""
+    products = Product.objects.filter(pk__in=ids)
+
+    if operation == "stock_delta":
+        quantity = int(value)
+        if quantity < 0:
+            # الإزالة فقط من المنتجات التي يكفي مخزونها غير المحجوز، والباقي يُتخطى
+            products = products.filter(stock__gte=F("reserved") - quantity)
+        ids = list(products.select_for_update().values_list("pk", flat=True))
+        Product.objects.filter(pk__in=ids).update(
+            stock=F("stock") + quantity, updated_at=Now()
+        )
+        InventoryMovement.objects.bulk_create(
+            [
+                InventoryMovement(
+                    product_id=pk,
+                    quantity=abs(quantity),
+                    movement_type="ADD" if quantity > 0 else "REMOVE",
+                )
+                for pk in ids
+            ]
+        )
+        return ids
+
+    if operation in ("set_available", "set_unavailable"):
+        available = operation == "set_available"
+        # المنتجات التي حالتها مطابقة أصلاً لا تُكتب
+        products = products.exclude(is_available=available)
+        ids = list(products.values_list("pk", flat=True))
+        Product.objects.filter(pk__in=ids).update(is_available=available, updated_at=Now())
+        return ids
+
+    products.update(price=_price_expression(operation, value), updated_at=Now())
+    return ids
+
+
+def bulk_update_products(queryset, operation, value=None, chunk_size=1000, stdout=None):
+    """
+    تعديل جماعي لمنتجات queryset (بعد الفلترة) على دفعات مرتبة بالمفتاح الأساسي:
+    كل دفعة في معاملة قصيرة بتحديث واحد (UPDATE ... SET x = F(x) ...) وسجلات
+    المخزون بـ bulk_create، ثم إبطال الكاش للدفعة بعد نهاية معاملتها.
+    يعيد (عدد المنتجات التي تغيرت، ids المنتجات المتخطاة لأن مخزونها غير المحجوز
+    لا يكفي للإزالة).
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"عملية غير معروفة: {operation}")
+    if operation in ("price_percent", "price_delta", "stock_delta") and value in (None, ""):
+        raise ValueError("هذه العملية تحتاج قيمة")
+    if operation == "stock_delta" and int(value) == 0:
+        return 0, []
+
+    ids_queryset = queryset.order_by("pk").values_list("pk", flat=True)
+    last_pk = 0
+    changed = 0
+    skipped = []
+    while True:
+        ids = list(ids_queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            # update() لا يرسل post_save: نقارن حالة المنتجات المفضلة قبل وبعد
+            before = watched_state(ids) if _may_notify(operation, value) else {}
+            updated = _apply_chunk(ids, operation, value)
+            if before:
+                record_changes(before, watched_state(list(before)))
+            invalidate_on_commit(updated)
+        changed += len(updated)
+        if operation == "stock_delta":
+            updated_ids = set(updated)
+            skipped += [pk for pk in ids if pk not in updated_ids]
+        last_pk = ids[-1]
+        if stdout is not None:
+            stdout.write(f"{changed} منتج...")
+    return changed, skipped
@@ -0,0 +1,216 @@
+import math
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class LocalLRU:
+    """كاش داخل العملية بحد أقصى للعناصر ومدة صلاحية لكل عنصر"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """يعيد (موجود؟، القيمة)"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return False, None
+            value, expires_at = item
+            if expires_at <= time.time():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TwoTierCache:
+    """
+    كاش من طبقتين:
+    1. LocalLRU داخل كل عامل (مدة قصيرة LOCAL_TTL)
+    2. كاش Django المشترك بين العمال (ملفات/قاعدة بيانات/Redis)
+
+    - عند انتهاء الصلاحية يعيد بناء القيمة عامل واحد فقط (single-flight)
+      والباقون يقدمون القيمة القديمة أو ينتظرون قليلاً.
+    - تحديث مبكر احتمالي (XFetch) قبل انتهاء الصلاحية لتجنب تزاحم الطلبات.
+
+    داخل العامل تُقفل المفاتيح بعدد ثابت من الأقفال (hash(key) % lock_stripes)
+    فلا تنمو الذاكرة مع عدد المفاتيح؛ تصادم مفتاحين على نفس القفل يؤخر أحدهما فقط.
+    بين العمال القفل هو shared.add(): ذري في Redis/Memcached/قاعدة البيانات، أما
+    FileBasedCache فيتحقق ثم يكتب، فقد يعيد عاملان البناء معاً أحياناً (عمل مكرر
+    لا قيمة خاطئة). لضمان عامل واحد استخدم Redis أو Memcached في CACHES["shared"].
+    """
+
+    def __init__(
+        self,
+        alias="default",
+        local_max_entries=1000,
+        local_ttl=5,
+        beta=1.0,
+        lock_timeout=30,
+        wait_timeout=2.0,
+        lock_stripes=64,
+    ):
+        self.alias = alias
+        self.local = LocalLRU(local_max_entries)
+        self.local_ttl = local_ttl
+        self.beta = beta
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(lock_stripes)]
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """عدادات الإصابة والإخفاق لهذه العملية"""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _key_lock(self, key):
+        return self._key_locks[hash(key) % len(self._key_locks)]
+
+    def _needs_refresh(self, entry, now):
+        # XFetch: كلما اقتربنا من الانتهاء وطال زمن الحساب زاد احتمال التحديث المبكر
+        _, expires_at, delta = entry
+        return now - delta * self.beta * math.log(random.random() or 1e-12) >= expires_at
+
+    def get_or_set(self, key, compute, ttl, local_ttl=None):
+        local_ttl = self.local_ttl if local_ttl is None else local_ttl
+
+        found, entry = self.local.get(key)
+        if found:
+            self._count("local_hits")
+            return entry[0]
+
+        entry = self.shared.get(key)
+        if entry is not None and not self._needs_refresh(entry, time.time()):
+            self._count("shared_hits")
+            self.local.set(key, entry, min(local_ttl, entry[1] - time.time()))
+            return entry[0]
+
+        if entry is None:
+            self._count("misses")
+        else:
+            self._count("early_refreshes")
+        return self._recompute(key, compute, ttl, local_ttl, stale=entry)
+
+    def _recompute(self, key, compute, ttl, local_ttl, stale):
+        key_lock = self._key_lock(key)
+        if not key_lock.acquire(blocking=stale is None):
+            # thread آخر في نفس العامل يعيد البناء: نقدم القيمة الحالية
+            self._count("stale_served")
+            return stale[0]
+        try:
+            # ربما انتهى thread آخر من البناء أثناء انتظارنا
+            found, entry = self.local.get(key)
+            if found:
+                return entry[0]
+
+            lock_key = f"{key}:lock"
+            if self.shared.add(lock_key, 1, self.lock_timeout):
+                try:
+                    return self._compute_and_store(key, compute, ttl, local_ttl)
+                finally:
+                    self.shared.delete(lock_key)
+
+            # عامل آخر يعيد البناء
+            if stale is not None:
+                self._count("stale_served")
+                return stale[0]
+            self._count("lock_waits")
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = self.shared.get(key)
+                if entry is not None:
+                    self.local.set(key, entry, local_ttl)
+                    return entry[0]
+            # العامل الآخر تأخر كثيراً: نحسب القيمة بأنفسنا
+            return self._compute_and_store(key, compute, ttl, local_ttl)
+        finally:
+            key_lock.release()
+
+    def _compute_and_store(self, key, compute, ttl, local_ttl):
+        started = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - started
+        entry = (value, time.time() + ttl, delta)
+        self.shared.set(key, entry, ttl)
+        self.local.set(key, entry, min(local_ttl, ttl))
+        self._count("recomputes")
+        return value
+
+    def delete(self, *keys):
+        """الحذف من الكاش المشترك ومن كاش هذه العملية (العمال الآخرون خلال LOCAL_TTL)"""
+        for key in keys:
+            self.local.delete(key)
+        self.shared.delete_many(keys)
+
+
+def _build_cache():
+    conf = getattr(settings, "STORE_CACHE", {})
+    return TwoTierCache(
+        alias=conf.get("ALIAS", "default"),
+        local_max_entries=conf.get("LOCAL_MAX_ENTRIES", 1000),
+        local_ttl=conf.get("LOCAL_TTL", 5),
+        beta=conf.get("BETA", 1.0),
+    )
+
+
+catalog_cache = _build_cache()
+
+
+def cached(key, ttl, local_ttl=None):
+    """
+    مزخرف لدوال القراءة المكلفة:
+
+        @cached("catalog:product:{}", ttl=120)
+        def product_data(product_id): ...
+
+        product_data.invalidate(product_id)
+
+    القيمة المعادة يجب أن تكون قابلة للتخزين (قوائم وليست QuerySet).
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args):
+            return catalog_cache.get_or_set(
+                key.format(*args), lambda: func(*args), ttl, local_ttl
+            )
+
+        wrapper.cache_key = lambda *args: key.format(*args)
+        wrapper.invalidate = lambda *args: catalog_cache.delete(key.format(*args))
+        return wrapper
+
+    return decorator
@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import cached, catalog_cache
+from .loaders import load_product_details
+from .models import Brand, Category, Product, Review, Specification
+from .snapshot import mark_dirty
+
+# ==========================================
+# استعلامات الكتالوج المتكررة لكل الزوار (عبر الكاش ذي الطبقتين)
+# ==========================================
+
+
+@cached("catalog:categories", ttl=300)
+def all_categories():
+    return list(Category.objects.order_by("id"))
+
+
+@cached("catalog:main_categories", ttl=300)
+def main_categories():
+    # الفئات الرئيسية مع أبنائها (prefetch محفوظ مع القيمة في الكاش)
+    return list(Category.objects.filter(parent=None).prefetch_related("children"))
+
+
+@cached("catalog:latest_products", ttl=60)
+def latest_products():
+    """أحدث 4 منتجات متوفرة (الصفحة الرئيسية)"""
+    return list(
+        Product.objects.select_related("category").filter(stock__gt=0).order_by("-id")[:4]
+    )
+
+
+@cached("catalog:suggested_products", ttl=60)
+def suggested_products():
+    """مقترحات صفحة السلة"""
+    return list(Product.objects.filter(stock__gt=0).order_by("-id")[:4])
+
+
+@cached("catalog:product:{}", ttl=120)
+def product_details_data(product_id):
+    return load_product_details(product_id)
+
+
+CATALOG_KEYS = [
+    all_categories.cache_key(),
+    main_categories.cache_key(),
+    latest_products.cache_key(),
+    suggested_products.cache_key(),
+]
+
+
+def invalidate_catalog(product_ids=()):
+    """حذف قوائم الكتالوج وبيانات صفحات المنتجات المحددة من الكاش"""
+    catalog_cache.delete(
+        *CATALOG_KEYS, *(product_details_data.cache_key(pid) for pid in product_ids)
+    )
+    # النسخة العمودية لصفحة المنتجات (إن كانت مفعلة)
+    mark_dirty(product_ids)
+
+
+def invalidate_on_commit(product_ids=()):
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: invalidate_catalog(product_ids))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    invalidate_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Specification)
+@receiver(post_delete, sender=Specification)
+@receiver(post_delete, sender=Review)
+def product_part_changed(sender, instance, **kwargs):
+    invalidate_on_commit([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def taxonomy_changed(sender, instance, **kwargs):
+    # الاسم يظهر في صفحات كل منتجات الصنف/الشركة، وتبقى حتى انتهاء صلاحيتها القصيرة
+    invalidate_on_commit()
@@ -0,0 +1,120 @@
+from django.conf import settings
+
+from .models import Product, Specification, Wishlist
+
+COOKIE_NAME = "compare"
+COOKIE_SALT = "store.compare"
+COOKIE_MAX_AGE = 60 * 60 * 24 * 30
+
+
+def compare_limit():
+    return getattr(settings, "COMPARE_MAX_PRODUCTS", 4)
+
+
+def get_compare_ids(request):
+    """أرقام منتجات المقارنة من الكوكي الموقّعة (مثل recently_viewed)"""
+    raw = request.get_signed_cookie(COOKIE_NAME, default="", salt=COOKIE_SALT)
+    return [int(part) for part in raw.split(".") if part.isdigit()][: compare_limit()]
+
+
+def toggle_compare_id(request, product_id):
+    """إضافة/إزالة منتج من قائمة المقارنة. تُحفظ بـ set_compare_cookie على الرد"""
+    ids = get_compare_ids(request)
+    if product_id in ids:
+        ids.remove(product_id)
+        added = False
+    else:
+        ids.append(product_id)
+        # عند تجاوز الحد يُستبعد أقدم منتج
+        ids = ids[-compare_limit():]
+        added = True
+    return added, ids
+
+
+def set_compare_cookie(response, ids):
+    """القائمة في كوكي موقّعة بدلاً من الجلسة: لا كتابة في قاعدة البيانات لكل إضافة"""
+    response.set_signed_cookie(
+        COOKIE_NAME,
+        ".".join(str(pid) for pid in ids),
+        salt=COOKIE_SALT,
+        max_age=COOKIE_MAX_AGE,
+        httponly=True,
+        samesite="Lax",
+    )
+
+
+def ids_from_source(request, source):
+    """مصدر المنتجات: القائمة المحفوظة، أو السلة، أو المفضلة"""
+    if source == "cart":
+        ids = [int(key) for key in request.session.get("cart", {}) if str(key).isdigit()]
+    elif source == "wishlist" and request.user.is_authenticated:
+        ids = list(
+            Wishlist.objects.filter(user=request.user)
+            .order_by("-added_at")
+            .values_list("product_id", flat=True)
+        )
+    else:
+        ids = get_compare_ids(request)
+    return ids[: compare_limit()]
+
+
+def parse_ids(raw):
+    """"1,2,3" -> [1, 2, 3] بدون تكرار وبحد أقصى COMPARE_MAX_PRODUCTS"""
+    ids = []
+    for part in raw.split(","):
+        part = part.strip()
+        if part.isdigit() and int(part) not in ids:
+            ids.append(int(part))
+    return ids[: compare_limit()]
+
+
+def _normalize(value):
+    return " ".join(str(value).split()).lower()
+
+
+def build_comparison(product_ids):
+    """
+    جدول مقارنة (خاصية × منتج) باستعلامين فقط:
+    1. المنتجات مع الشركة والصنف
+    2. كل مواصفات هذه المنتجات
+    ثم تحويل المواصفات في الذاكرة إلى صفوف مع تمييز الاختلافات.
+    """
+    by_id = Product.objects.select_related("brand", "category").in_bulk(product_ids)
+    products = [by_id[pid] for pid in product_ids if pid in by_id]
+    if not products:
+        return {"products": [], "rows": []}
+
+    rows = [
+        ("السعر", [p.price for p in products]),
+        ("الشركة", [p.brand.name if p.brand else None for p in products]),
+        ("الصنف", [p.category.name for p in products]),
+        ("التقييم", [round(p.average_rating, 1) for p in products]),
+        ("التوفر", ["متوفر" if p.is_available and p.available_stock > 0 else "غير متوفر" for p in products]),
+    ]
+
+    column = {p.id: index for index, p in enumerate(products)}
+    spec_rows = {}
+    for product_id, name, value in (
+        Specification.objects.filter(product_id__in=column)
+        .order_by("id")
+        .values_list("product_id", "name", "value")
+    ):
+        key = _normalize(name)
+        if key not in spec_rows:
+            # الترتيب حسب أول ظهور، والاسم كما كُتب أول مرة
+            spec_rows[key] = (name, [None] * len(products))
+        spec_rows[key][1][column[product_id]] = value
+    rows.extend(spec_rows.values())
+
+    return {
+        "products": products,
+        "rows": [
+            {
+                "name": name,
+                "values": values,
+                # مختلف إذا تعددت القيم أو غابت المواصفة عن بعض المنتجات
+                "differs": len({_normalize(v) if v is not None else None for v in values}) > 1,
+            }
+            for name, values in rows
+        ],
+    }
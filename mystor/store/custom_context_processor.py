@@ -1,4 +1,6 @@
+from store.catalog import main_categories
 from store.models import Category, Cart, Wishlist
+from store.recently_viewed import is_background_render
 
 
 def categories_processor(request):
@@ -8,8 +10,8 @@ def categories_processor(request):
 
 def cart_context(request):
     """يجعل عدد عناصر السلة متاحاً في كل صفحات الموقع"""
-    # ⚠️ إنشاء الجلسة إذا لم تكن موجودة ⚠️
-    if not request.session.session_key:
+    # ⚠️ إنشاء الجلسة إذا لم تكن موجودة ⚠️ (إلا للعرض في الخلفية: صفحة عامة للكاش)
+    if not request.session.session_key and not is_background_render(request):
         request.session.create()
 
     cart = request.session.get("cart", {})
@@ -27,7 +29,6 @@ def wishlist_context(request):
 
 
 def categories_processor(request):
-    # نجلب الفئات الرئيسية فقط (التي ليس لها أب)
-    # ونستخدم prefetch_related لجلب الأبناء معهم دفعة واحدة (لتحسين الأداء)
-    main_categories = Category.objects.filter(parent=None).prefetch_related("children")
-    return {"main_categories": main_categories}
+    # نجلب الفئات الرئيسية فقط (التي ليس لها أب) مع أبنائها
+    # من الكاش ذي الطبقتين بدلاً من استعلامين في كل صفحة
+    return {"main_categories": main_categories()}
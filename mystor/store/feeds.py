@@ -0,0 +1,289 @@
+"""
+ملفات sitemap وfeed المنتجات (XML/CSV) مولدة على دفعات من جدول المنتجات.
+
+- المنتجات مقسمة إلى أجزاء (shards) حسب نطاق الـ id، بحد SHARD_SIZE منتج لكل جزء.
+- manifest.json يحفظ بصمة كل جزء (العدد، أقصى updated_at، أصغر/أكبر id، والمنتجات
+  المتوفرة)؛ الأجزاء التي لم تتغير بصمتها لا يُعاد توليدها. التعديلات بـ update()
+  تضبط updated_at بنفسها (bulk.py، reviews.py، media.py)، أما الحجوزات فلا تلمسه
+  فيلتقط توفرها عددُ ومجموعُ ids المنتجات المتوفرة في البصمة.
+- feed.xml.gz وfeed.csv.gz تُبنى بوصل ملفات الأجزاء المضغوطة (gzip متعدد الأعضاء)
+  بدون إعادة ضغط الأجزاء غير المتغيرة.
+"""
+
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import uuid
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Brand, Category, Product
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+FEED_FIELDS = ["id", "title", "price", "availability", "link", "image", "brand"]
+
+
+def get_config():
+    return {
+        "DIR": os.path.join(settings.BASE_DIR, "feeds"),
+        "SITE_URL": "http://localhost:8000",
+        "SHARD_SIZE": 10000,  # حد sitemap الواحد 50 ألف رابط
+        "CHUNK_SIZE": 2000,
+        "CURRENCY": "USD",  # نفس العملة المعروضة في القوالب ($)
+        "MAX_AGE": 3600,  # Cache-Control للملفات المنشورة
+        **getattr(settings, "FEEDS", {}),
+    }
+
+
+def _absolute(config, path):
+    return config["SITE_URL"].rstrip("/") + path
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _gzip(text):
+    # mtime=0 حتى يكون الناتج ثابتاً لنفس المحتوى
+    return gzip.compress(text.encode("utf-8"), mtime=0)
+
+
+# ==========================================
+# بصمات الأجزاء
+# ==========================================
+
+
+# نفس شرط "in stock" في _feed_row
+IN_STOCK = Q(is_available=True, stock__gt=F("reserved"))
+
+
+def shard_fingerprints(shard_size):
+    """بصمة كل جزء باستعلام تجميعي واحد"""
+    rows = (
+        Product.objects.annotate(shard=(F("id") - 1) / shard_size)
+        .values("shard")
+        .annotate(
+            count=Count("id"),
+            last=Max("updated_at"),
+            first_id=Min("id"),
+            last_id=Max("id"),
+            in_stock=Count("id", filter=IN_STOCK),
+            in_stock_ids=Sum("id", filter=IN_STOCK),
+        )
+        .order_by("shard")
+    )
+    return {
+        str(row["shard"]): (
+            f"{row['count']}:{row['first_id']}:{row['last_id']}:"
+            f"{row['last'].isoformat() if row['last'] else ''}:"
+            f"{row['in_stock']}:{row['in_stock_ids'] or 0}"
+        )
+        for row in rows
+    }
+
+
+def taxonomy_fingerprint():
+    """أسماء الشركات تظهر في الـ feed: تغييرها يعيد توليد كل الأجزاء"""
+    names = Brand.objects.order_by("pk").values_list("pk", "name")
+    return hashlib.md5(json.dumps(list(names)).encode()).hexdigest()
+
+
+# ==========================================
+# توليد جزء واحد
+# ==========================================
+
+
+def _shard_products(shard, shard_size, chunk_size):
+    return (
+        Product.objects.filter(id__gt=shard * shard_size, id__lte=(shard + 1) * shard_size)
+        .select_related("brand")
+        .only(
+            "id", "name", "price", "stock", "reserved", "is_available", "image",
+            "updated_at", "brand__name",
+        )
+        .order_by("id")
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _feed_row(config, product):
+    # المخزون المحجوز في السلال (reservations.py) غير متاح للشراء
+    in_stock = product.is_available and product.available_stock > 0
+    return {
+        "id": product.pk,
+        "title": product.name,
+        "price": f"{product.price} {config['CURRENCY']}",
+        "availability": "in stock" if in_stock else "out of stock",
+        "link": _absolute(config, reverse("product_details", args=[product.pk])),
+        "image": _absolute(config, product.image.url) if product.image else "",
+        "brand": product.brand.name if product.brand_id else "",
+    }
+
+
+def build_shard(config, shard):
+    """sitemap الجزء + جزء feed بصيغتي XML وCSV (بدون رأس/ذيل)"""
+    sitemap = io.StringIO()
+    sitemap.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n')
+    feed_xml = io.StringIO()
+    feed_csv = io.StringIO()
+    writer = csv.DictWriter(feed_csv, FEED_FIELDS)
+
+    for product in _shard_products(shard, config["SHARD_SIZE"], config["CHUNK_SIZE"]):
+        row = _feed_row(config, product)
+        sitemap.write(
+            f"<url><loc>{escape(row['link'])}</loc>"
+            f"<lastmod>{product.updated_at.date().isoformat()}</lastmod></url>\n"
+        )
+        feed_xml.write(
+            "<item>"
+            + "".join(f"<g:{k}>{escape(str(v))}</g:{k}>" for k, v in row.items() if k != "link")
+            + f"<link>{escape(row['link'])}</link></item>\n"
+        )
+        writer.writerow(row)
+    sitemap.write("</urlset>\n")
+
+    directory = config["DIR"]
+    _write_atomic(os.path.join(directory, f"sitemap-products-{shard}.xml.gz"), _gzip(sitemap.getvalue()))
+    _write_atomic(os.path.join(directory, "parts", f"feed-{shard}.xml.gz"), _gzip(feed_xml.getvalue()))
+    _write_atomic(os.path.join(directory, "parts", f"feed-{shard}.csv.gz"), _gzip(feed_csv.getvalue()))
+
+
+def build_static_sitemap(config):
+    """الصفحات الثابتة وصفحات الأصناف (جدول صغير، يُولد كل مرة)"""
+    paths = [reverse("index"), reverse("products"), reverse("about"), reverse("contact")]
+    paths += [
+        reverse("products", args=[pk])
+        for pk in Category.objects.order_by("pk").values_list("pk", flat=True)
+    ]
+    body = "".join(f"<url><loc>{escape(_absolute(config, p))}</loc></url>\n" for p in paths)
+    path = os.path.join(config["DIR"], "sitemap-pages.xml.gz")
+    data = _gzip(
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+        f"{body}</urlset>\n"
+    )
+    # بدون تغيير في المحتوى يبقى الملف (وتاريخ lastmod في الفهرس) كما هو
+    if not os.path.exists(path) or _read(path) != data:
+        _write_atomic(path, data)
+
+
+def build_index_and_feeds(config, shards):
+    directory = config["DIR"]
+    files = ["sitemap-pages.xml.gz"] + [f"sitemap-products-{s}.xml.gz" for s in shards]
+    index = "".join(
+        f"<sitemap><loc>{escape(_absolute(config, reverse('feed_file', args=[name])))}</loc>"
+        f"<lastmod>{_mtime_iso(os.path.join(directory, name))}</lastmod></sitemap>\n"
+        for name in files
+    )
+    _write_atomic(
+        os.path.join(directory, "sitemap.xml"),
+        (
+            f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n'
+            f"{index}</sitemapindex>\n"
+        ).encode("utf-8"),
+    )
+
+    # وصل الأجزاء المضغوطة كما هي: gzip يسمح بعدة أعضاء في ملف واحد
+    parts = os.path.join(directory, "parts")
+    xml = [
+        _gzip(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0"><channel>\n'
+            f"<title>{escape(config['SITE_URL'])}</title>\n"
+        )
+    ]
+    xml += [_read(os.path.join(parts, f"feed-{s}.xml.gz")) for s in shards]
+    xml.append(_gzip("</channel></rss>\n"))
+    _write_atomic(os.path.join(directory, "feed.xml.gz"), b"".join(xml))
+
+    header = io.StringIO()
+    csv.DictWriter(header, FEED_FIELDS).writeheader()
+    rows = [_gzip(header.getvalue())]
+    rows += [_read(os.path.join(parts, f"feed-{s}.csv.gz")) for s in shards]
+    _write_atomic(os.path.join(directory, "feed.csv.gz"), b"".join(rows))
+
+
+def _mtime_iso(path):
+    return datetime.fromtimestamp(os.path.getmtime(path), tz=dt_timezone.utc).isoformat()
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# ==========================================
+# التوليد
+# ==========================================
+
+
+def generate(force=False, stdout=None):
+    """يعيد (عدد الأجزاء المولدة، عدد كل الأجزاء)"""
+    config = get_config()
+    directory = config["DIR"]
+    os.makedirs(os.path.join(directory, "parts"), exist_ok=True)
+    manifest_path = os.path.join(directory, "manifest.json")
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+
+    fingerprints = shard_fingerprints(config["SHARD_SIZE"])
+    taxonomy = taxonomy_fingerprint()
+    settings_key = f"{config['SITE_URL']}|{config['SHARD_SIZE']}"
+    if manifest.get("taxonomy") != taxonomy or manifest.get("settings") != settings_key:
+        force = True
+    previous = {} if force else manifest.get("shards", {})
+
+    changed = [shard for shard, fp in fingerprints.items() if previous.get(shard) != fp]
+    for shard in changed:
+        build_shard(config, int(shard))
+        if stdout is not None:
+            stdout.write(f"الجزء {shard}")
+
+    # الأجزاء التي لم يعد فيها منتجات
+    for shard in set(manifest.get("shards", {})) - set(fingerprints):
+        for name in (
+            f"sitemap-products-{shard}.xml.gz",
+            os.path.join("parts", f"feed-{shard}.xml.gz"),
+            os.path.join("parts", f"feed-{shard}.csv.gz"),
+        ):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+    build_static_sitemap(config)
+    shards = sorted(fingerprints, key=int)
+    build_index_and_feeds(config, shards)
+
+    manifest = {
+        "shards": fingerprints,
+        "taxonomy": taxonomy,
+        "settings": settings_key,
+        "generated_at": timezone.now().isoformat(),
+    }
+    _write_atomic(manifest_path, json.dumps(manifest, indent=2).encode())
+    return len(changed), len(fingerprints)
+
+
+def file_path(name):
+    """مسار ملف منشور (sitemap أو feed) أو None؛ ملفات parts/ وmanifest غير منشورة"""
+    if name == "manifest.json" or not all(c.isalnum() or c in "-_." for c in name):
+        return None
+    if name.startswith("."):
+        return None
+    path = os.path.join(get_config()["DIR"], name)
+    return path if os.path.isfile(path) else None
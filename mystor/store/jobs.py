@@ -0,0 +1,273 @@
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "MAX_ATTEMPTS": 5,
+    "BACKOFF_BASE": 10,  # ثوانٍ: 10، 20، 40 ... مع عشوائية بسيطة
+    "BACKOFF_MAX": 3600,
+    "LOCK_TIMEOUT": 600,  # مهمة "قيد التنفيذ" بلا نبضة أطول من هذا تعتبر عاملها متوقفاً
+    "HEARTBEAT_INTERVAL": 60,  # العامل يجدد locked_at لمهامه الجارية كل N ثانية
+    "RETENTION_DAYS": 7,  # حذف المهام المنتهية بعد هذه المدة
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "JOB_QUEUE", {})}
+
+
+# ==========================================
+# سجل المهام
+# ==========================================
+
+TASKS = {}
+
+
+def task(name=None):
+    """
+    تسجيل دالة كمهمة خلفية:
+
+        @task("recompute_ratings")
+        def recompute(product_ids): ...
+
+        recompute.enqueue(product_ids=[1, 2], dedup_key="ratings:1")
+    """
+
+    def decorator(func):
+        task_name = name or func.__name__
+        TASKS[task_name] = func
+        func.task_name = task_name
+        func.enqueue = lambda dedup_key=None, priority=0, run_at=None, **payload: (
+            enqueue(task_name, payload, priority, run_at, dedup_key)
+        )
+        return func
+
+    return decorator
+
+
+def enqueue(task_name, payload=None, priority=0, run_at=None, dedup_key=None):
+    """
+    إضافة مهمة إلى الطابور. إذا وُجدت مهمة نشطة بنفس dedup_key تُعاد بدلاً من التكرار.
+    عند الاستدعاء داخل معاملة تظهر المهمة للعمال بعد نهايتها فقط.
+    """
+    if task_name not in TASKS:
+        raise ValueError(f"مهمة غير مسجلة: {task_name}")
+    fields = {
+        "task": task_name,
+        "payload": payload or {},
+        "priority": priority,
+        "run_at": run_at or timezone.now(),
+        "dedup_key": dedup_key,
+        "max_attempts": get_config()["MAX_ATTEMPTS"],
+    }
+    if dedup_key is None:
+        return Job.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            return Job.objects.create(**fields)
+    except IntegrityError:
+        existing = Job.objects.filter(
+            dedup_key=dedup_key, status__in=["QUEUED", "RUNNING"]
+        ).first()
+        if existing is None:
+            # انتهت المهمة السابقة بين المحاولتين
+            return Job.objects.create(**fields)
+        return existing
+
+
+# ==========================================
+# حجز المهام وتنفيذها
+# ==========================================
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def _ready_jobs():
+    return Job.objects.filter(status="QUEUED", run_at__lte=timezone.now()).order_by(
+        "-priority", "run_at", "pk"
+    )
+
+
+def claim(worker, limit=1):
+    """
+    حجز حتى limit مهام جاهزة لهذا العامل.
+    - Postgres/MySQL: SELECT ... FOR UPDATE SKIP LOCKED فلا يتنافس العمال على نفس الصفوف.
+    - SQLite: تحديث شرطي (status=QUEUED) لكل صف؛ الكتابة في SQLite متسلسلة
+      فلا يحجز عاملان نفس المهمة، ومن يخسر ينتقل إلى المهمة التالية.
+    """
+    now = timezone.now()
+    claimed_fields = {
+        "status": "RUNNING",
+        "locked_by": worker,
+        "locked_at": now,
+        "attempts": F("attempts") + 1,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                _ready_jobs()
+                .select_for_update(skip_locked=True)
+                .values_list("pk", flat=True)[:limit]
+            )
+            Job.objects.filter(pk__in=ids).update(**claimed_fields)
+    else:
+        ids = []
+        for pk in _ready_jobs().values_list("pk", flat=True)[: limit * 4]:
+            if Job.objects.filter(pk=pk, status="QUEUED").update(**claimed_fields):
+                ids.append(pk)
+                if len(ids) == limit:
+                    break
+
+    return list(Job.objects.filter(pk__in=ids).order_by("-priority", "run_at", "pk"))
+
+
+def backoff_seconds(attempts, config=None):
+    config = config or get_config()
+    delay = config["BACKOFF_BASE"] * 2 ** max(attempts - 1, 0)
+    return min(delay, config["BACKOFF_MAX"]) * random.uniform(0.8, 1.2)
+
+
+def run_job(job):
+    """تنفيذ مهمة محجوزة وتسجيل نتيجتها. يعيد "done" أو "retry" أو "failed"."""
+    func = TASKS.get(job.task)
+    try:
+        if func is None:
+            raise LookupError(f"مهمة غير مسجلة: {job.task}")
+        func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("فشلت المهمة %s (محاولة %s)", job, job.attempts)
+        if func is not None and job.attempts < job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status="QUEUED",
+                run_at=timezone.now()
+                + timedelta(seconds=backoff_seconds(job.attempts)),
+                locked_by="",
+                locked_at=None,
+                last_error=error,
+            )
+            return "retry"
+        Job.objects.filter(pk=job.pk).update(
+            status="FAILED", finished_at=timezone.now(), last_error=error
+        )
+        return "failed"
+
+    Job.objects.filter(pk=job.pk).update(status="DONE", finished_at=timezone.now())
+    return "done"
+
+
+def heartbeat(workers):
+    """تجديد قفل المهام الجارية لهذه العمال حتى لا يعيدها requeue_stale وهي تعمل"""
+    if not workers:
+        return 0
+    return Job.objects.filter(status="RUNNING", locked_by__in=workers).update(
+        locked_at=timezone.now()
+    )
+
+
+def requeue_stale(config=None):
+    """
+    إعادة المهام التي توقف عاملها (لا نبضة منذ LOCK_TIMEOUT) إلى الطابور.
+    المحاولة محسوبة عند الحجز (claim)، فالمهمة التي استنفدت max_attempts تُعلَّم
+    فاشلة بدل أن تعود: مهمة تُسقط عاملها في كل مرة لا تدور في الطابور للأبد.
+    """
+    config = config or get_config()
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status="RUNNING", locked_at__lt=now - timedelta(seconds=config["LOCK_TIMEOUT"])
+    )
+    error = f"انتهت مهلة القفل ({config['LOCK_TIMEOUT']} ثانية) دون نبضة من العامل"
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status="FAILED", finished_at=now, last_error=error
+    )
+    requeued = 0
+    for job in stale.filter(attempts__lt=F("max_attempts")).only("pk", "attempts"):
+        requeued += Job.objects.filter(pk=job.pk, status="RUNNING").update(
+            status="QUEUED",
+            run_at=now + timedelta(seconds=backoff_seconds(job.attempts, config)),
+            locked_by="",
+            locked_at=None,
+            last_error=error,
+        )
+    if failed or requeued:
+        logger.warning("مهام متوقفة: أعيد %s وفشلت %s", requeued, failed)
+    return requeued + failed
+
+
+def purge_finished(config=None):
+    config = config or get_config()
+    horizon = timezone.now() - timedelta(days=config["RETENTION_DAYS"])
+    deleted, _ = Job.objects.filter(
+        status__in=["DONE", "FAILED"], finished_at__lt=horizon
+    ).delete()
+    return deleted
+
+
+# ==========================================
+# المقاييس
+# ==========================================
+
+
+def queue_stats():
+    """عدد المهام لكل حالة ومهمة وعمر أقدم مهمة جاهزة بالثواني"""
+    by_status = Counter()
+    by_task = {}
+    for row in Job.objects.values("task", "status").annotate(count=Count("pk")):
+        by_status[row["status"]] += row["count"]
+        by_task.setdefault(row["task"], {})[row["status"]] = row["count"]
+    oldest = _ready_jobs().aggregate(oldest=Min("run_at"))["oldest"]
+    return {
+        "by_status": dict(by_status),
+        "by_task": by_task,
+        "oldest_ready_seconds": (
+            round((timezone.now() - oldest).total_seconds(), 1) if oldest else 0
+        ),
+    }
+
+
+class WorkerMetrics:
+    """عدادات العامل الحالي: عدد المهام حسب النتيجة وزمن التنفيذ لكل مهمة"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.results = Counter()
+        self.durations = {}  # task -> [count, total_seconds, max_seconds]
+
+    def record(self, job, result, duration):
+        with self._lock:
+            self.results[result] += 1
+            stats = self.durations.setdefault(job.task, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "results": dict(self.results),
+                "tasks": {
+                    name: {
+                        "count": count,
+                        "avg_ms": round(total / count * 1000, 1),
+                        "max_ms": round(longest * 1000, 1),
+                    }
+                    for name, (count, total, longest) in self.durations.items()
+                },
+            }
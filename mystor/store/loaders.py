@@ -0,0 +1,95 @@
+from django.db.models import Case, IntegerField, Q, Subquery, Value, When
+
+from .models import Product, Specification
+from .reviews import reviews_page
+
+# عدد المنتجات ذات الصلة في صفحة المنتج
+RELATED_PRODUCTS_LIMIT = 4
+
+
+def product_struct(product):
+    """
+    تحويل المنتج إلى قاموس بسيط بنفس أسماء الحقول التي تستخدمها القوالب،
+    قابل للتخزين في الكاش ولا يسبب أي استعلام كسول عند العرض.
+    """
+    return {
+        "id": product.id,
+        "name": product.name,
+        "price": product.price,
+        "description": product.description,
+        "image": {"url": product.image.url} if product.image else None,
+        "stock": product.stock,
+        # المخزون غير المحجوز في السلال (store/reservations.py)
+        "available_stock": product.available_stock,
+        "is_available": product.is_available,
+        "sku": product.sku,
+        "features": product.features,
+        "category": (
+            {"id": product.category_id, "name": product.category.name}
+            if product.category_id
+            else None
+        ),
+        "brand": (
+            {"id": product.brand_id, "name": product.brand.name}
+            if product.brand_id
+            else None
+        ),
+        "average_rating": product.average_rating,
+        "reviews_count": product.rating_count,
+    }
+
+
+def load_product_details(product_id):
+    """
+    كل بيانات صفحة المنتج بثلاثة استعلامات فقط:
+    1. المنتج + المنتجات ذات الصلة (نفس الصنف) مع category و brand
+    2. المواصفات
+    3. الصفحة الأولى من التقييمات مع أسماء العملاء
+    يعيد قاموساً بسيطاً قابلاً للتخزين في الكاش، أو None إذا لم يوجد المنتج.
+    """
+    category_id = Product.objects.filter(pk=product_id).values("category_id")[:1]
+    rows = list(
+        Product.objects.select_related("category", "brand")
+        .filter(Q(pk=product_id) | Q(category_id=Subquery(category_id)))
+        .order_by(
+            # المنتج المطلوب أولاً ثم الأحدث من نفس الصنف
+            Case(
+                When(pk=product_id, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ),
+            "-id",
+        )[: RELATED_PRODUCTS_LIMIT + 1]
+    )
+    if not rows or rows[0].pk != product_id:
+        return None
+    product, related = rows[0], rows[1:]
+
+    specifications = list(
+        Specification.objects.filter(product_id=product_id)
+        .order_by("id")
+        .values("name", "value")
+    )
+
+    reviews, next_cursor = reviews_page(product_id)
+
+    return {
+        "product": product_struct(product),
+        "specifications": specifications,
+        "reviews": [
+            {
+                "customer_name": review.customer.name.strip(),
+                "rating": review.rating,
+                "comment": review.comment,
+                "review_date": review.review_date,
+            }
+            for review in reviews
+        ],
+        "reviews_next_cursor": next_cursor,
+        "review_summary": {
+            "avg_rating": product.average_rating,
+            "num_reviews": product.rating_count,
+            "histogram": product.rating_histogram,
+        },
+        "related_products": [product_struct(p) for p in related],
+    }
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.attributes import backfill
+
+
+class Command(BaseCommand):
+    help = "بناء فهرس المواصفات المنظمة (Attribute / ProductAttributeValue) من جدول المواصفات"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = backfill(batch_size=options["batch_size"], stdout=self.stdout)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"تمت فهرسة {total} مواصفة في {time.monotonic() - started:.1f} ثانية"
+            )
+        )
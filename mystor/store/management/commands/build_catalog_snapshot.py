@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import snapshot
+
+
+class Command(BaseCommand):
+    help = "بناء النسخة العمودية لصفحة المنتجات (NumPy) وتبديلها ذرياً"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="تطبيق المنتجات المتغيرة فقط (dirty.log) بدلاً من البناء الكامل",
+        )
+
+    def handle(self, *args, **options):
+        if snapshot.np is None:
+            raise CommandError("NumPy غير مثبت: pip install numpy")
+        if not snapshot.get_config()["ENABLED"]:
+            self.stdout.write(
+                self.style.WARNING("CATALOG_SNAPSHOT غير مفعلة: صفحة المنتجات لن تستخدم النسخة")
+            )
+        started = time.monotonic()
+        if options["incremental"]:
+            version = snapshot.apply_changes()
+        else:
+            version = snapshot.build_full()
+        self.stdout.write(
+            self.style.SUCCESS(f"النسخة {version} في {time.monotonic() - started:.2f} ثانية")
+        )
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.bulk import bulk_update_products
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "تعديل جماعي للمنتجات على دفعات: "
+        "--price-percent 10 --brand 3 أو --stock-delta 50 --category 2 أو --unavailable"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--category", type=int, action="append", help="معرف الصنف")
+        parser.add_argument("--brand", type=int, action="append", help="معرف الشركة")
+        parser.add_argument("--ids", help="معرفات المنتجات مفصولة بفواصل")
+        operation = parser.add_mutually_exclusive_group(required=True)
+        operation.add_argument("--price-percent", help="مثلاً 10 أو -15")
+        operation.add_argument("--price-delta", help="مبلغ يضاف للسعر (أو سالب)")
+        operation.add_argument("--stock-delta", type=int)
+        operation.add_argument("--available", action="store_true")
+        operation.add_argument("--unavailable", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="عرض عدد المنتجات المطابقة فقط"
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options["category"]:
+            products = products.filter(category_id__in=options["category"])
+        if options["brand"]:
+            products = products.filter(brand_id__in=options["brand"])
+        if options["ids"]:
+            try:
+                ids = [int(pk) for pk in options["ids"].split(",") if pk.strip()]
+            except ValueError as e:
+                raise CommandError("--ids يجب أن تكون أرقاماً مفصولة بفواصل") from e
+            products = products.filter(pk__in=ids)
+
+        if options["price_percent"] is not None:
+            operation, value = "price_percent", options["price_percent"]
+        elif options["price_delta"] is not None:
+            operation, value = "price_delta", options["price_delta"]
+        elif options["stock_delta"] is not None:
+            operation, value = "stock_delta", options["stock_delta"]
+        elif options["available"]:
+            operation, value = "set_available", None
+        else:
+            operation, value = "set_unavailable", None
+
+        if options["dry_run"]:
+            self.stdout.write(f"{products.count()} منتج مطابق")
+            return
+
+        started = time.monotonic()
+        try:
+            changed, skipped = bulk_update_products(
+                products, operation, value, chunk_size=options["chunk_size"], stdout=self.stdout
+            )
+        except (ValueError, ArithmeticError) as e:
+            raise CommandError(str(e)) from e
+        if skipped:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"تم تخطي {len(skipped)} منتج لأن مخزونها غير المحجوز لا يكفي: "
+                    + ",".join(str(pk) for pk in skipped)
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"تم تعديل {changed} منتج في {time.monotonic() - started:.1f} ثانية")
+        )
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.feeds import generate
+
+
+class Command(BaseCommand):
+    help = "توليد sitemap وfeed المنتجات (XML/CSV)، الأجزاء المتغيرة فقط"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="إعادة توليد كل الأجزاء")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        changed, total = generate(force=options["force"], stdout=self.stdout)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"تم توليد {changed} من {total} جزء في {time.monotonic() - started:.1f} ثانية"
+            )
+        )
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from store.session_purge import clear_checkpoint, purge_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "حذف الجلسات المنتهية وسلالها على دفعات صغيرة (بديل clearsessions الذي يحذف "
+        "كل شيء بأمر واحد ويقفل الجدول). يستأنف من آخر دفعة إذا توقف."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep", type=float, default=0.1, help="ثوانٍ بين الدفعات"
+        )
+        parser.add_argument(
+            "--max-batches", type=int, help="التوقف بعد هذا العدد من الدفعات (يُستأنف لاحقاً)"
+        )
+        parser.add_argument(
+            "--continuous",
+            action="store_true",
+            help="العمل باستمرار: جولة جديدة كل --interval ثانية",
+        )
+        parser.add_argument("--interval", type=float, default=300.0)
+        parser.add_argument(
+            "--restart", action="store_true", help="تجاهل نقطة الاستئناف والبدء من الأول"
+        )
+
+    def handle(self, *args, **options):
+        if options["restart"]:
+            clear_checkpoint()
+        while True:
+            started = time.monotonic()
+            sessions, carts, finished = purge_expired(
+                batch_size=options["batch_size"],
+                sleep=options["sleep"],
+                max_batches=options["max_batches"],
+                stdout=self.stdout,
+            )
+            elapsed = time.monotonic() - started
+            rate = sessions / elapsed if elapsed else 0
+            message = (
+                f"حُذفت {sessions} جلسة و{carts} سلة في {elapsed:.1f} ثانية "
+                f"({rate:.0f} جلسة/ثانية)"
+            )
+            if finished:
+                self.stdout.write(self.style.SUCCESS(message))
+            else:
+                self.stdout.write(self.style.WARNING(message + " - سيُستأنف في التشغيل التالي"))
+
+            if not options["continuous"]:
+                break
+            close_old_connections()
+            time.sleep(options["interval"])
@@ -0,0 +1,36 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.analytics import rebuild
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء جداول المبيعات المجمعة (ساعة/يوم) من الطلبات المكتملة"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--since", help="إعادة البناء من هذا التاريخ فقط (YYYY-MM-DD)"
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            try:
+                since = datetime.strptime(options["since"], "%Y-%m-%d").replace(
+                    tzinfo=timezone.utc
+                )
+            except ValueError as e:
+                raise CommandError("صيغة التاريخ يجب أن تكون YYYY-MM-DD") from e
+
+        started = time.monotonic()
+        total = rebuild(
+            since=since, chunk_size=options["chunk_size"], stdout=self.stdout
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"تم تجميع {total} طلب في {time.monotonic() - started:.1f} ثانية"
+            )
+        )
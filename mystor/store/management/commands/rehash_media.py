@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from store.media import rehash_media
+
+
+class Command(BaseCommand):
+    help = (
+        "إعادة تسمية صور المنتجات والعملاء القديمة بـ sha256 محتواها (store/storage.py) "
+        "وتحديث قاعدة البيانات. آمن للتكرار: الملفات المحوّلة تُتخطى."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument(
+            "--delete-originals",
+            action="store_true",
+            help="حذف الملف الأصلي وصوره المصغرة بعد تحديث قاعدة البيانات",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="العدّ فقط")
+
+    def handle(self, *args, **options):
+        stats = rehash_media(
+            workers=options["workers"],
+            delete_originals=options["delete_originals"],
+            dry_run=options["dry_run"],
+            stdout=self.stdout,
+        )
+        if options["dry_run"]:
+            self.stdout.write(f"{stats['rehashed']} ملف بحاجة لإعادة التسمية")
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{stats['rehashed']} ملف، {stats['rows']} صف محدث، "
+                f"{stats['missing']} مفقود، {stats['deleted']} محذوف"
+            )
+        )
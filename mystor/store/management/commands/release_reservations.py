@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from store.reservations import reconcile, release_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "تحرير حجوزات المخزون المنتهية على دفعات (store/reservations.py). "
+        "run_worker يفعل ذلك تلقائياً، وهذا الأمر للتشغيل اليدوي أو بدون عامل."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--continuous",
+            action="store_true",
+            help="العمل باستمرار: جولة جديدة كل --interval ثانية",
+        )
+        parser.add_argument("--interval", type=float, default=60.0)
+        parser.add_argument(
+            "--reconcile",
+            action="store_true",
+            help="إعادة حساب Product.reserved من جدول الحجوزات بعد التحرير",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired(batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"حُرر {released} حجز منتهٍ"))
+            if options["reconcile"]:
+                self.stdout.write(f"أعيد حساب الحجز لـ {reconcile()} منتج")
+
+            if not options["continuous"]:
+                break
+            close_old_connections()
+            time.sleep(options["interval"])
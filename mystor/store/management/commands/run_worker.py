@@ -0,0 +1,145 @@
+import json
+import logging
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from store.jobs import (
+    WorkerMetrics,
+    claim,
+    get_config,
+    heartbeat,
+    purge_finished,
+    queue_stats,
+    requeue_stale,
+    run_job,
+    worker_name,
+)
+
+logger = logging.getLogger("store.jobs")
+
+# أقصى انتظار بين المحاولات عند تكرار أخطاء قاعدة البيانات
+MAX_ERROR_BACKOFF = 60.0
+
+
+class Command(BaseCommand):
+    help = "تشغيل عامل طابور المهام الخلفية (بدون وسيط خارجي، الطابور في قاعدة البيانات)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=1)
+        parser.add_argument(
+            "--poll-interval", type=float, default=1.0, help="الانتظار عند فراغ الطابور"
+        )
+        parser.add_argument(
+            "--stats-interval", type=float, default=60.0, help="طباعة المقاييس كل N ثانية"
+        )
+        parser.add_argument(
+            "--burst", action="store_true", help="تنفيذ المهام الجاهزة ثم الخروج"
+        )
+        parser.add_argument(
+            "--stats", action="store_true", help="طباعة حالة الطابور والخروج"
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(json.dumps(queue_stats(), ensure_ascii=False, indent=2))
+            return
+
+        self.metrics = WorkerMetrics()
+        self.stop = threading.Event()
+        self.idle = set()
+        self.idle_lock = threading.Lock()
+        self.workers = set()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            # إنهاء المهام الحالية ثم الخروج
+            signal.signal(sig, lambda *_: self.stop.set())
+
+        config = get_config()
+        requeue_stale(config)
+        purge_finished(config)
+
+        concurrency = max(options["concurrency"], 1)
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(options["poll_interval"], options["burst"], concurrency),
+                daemon=True,
+            )
+            for _ in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"بدأ العامل بعدد {concurrency} thread")
+
+        last_stats = last_maintenance = last_heartbeat = time.monotonic()
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(0.2)
+            now = time.monotonic()
+            if now - last_heartbeat >= config["HEARTBEAT_INTERVAL"]:
+                # مهمة أطول من LOCK_TIMEOUT تبقى محجوزة ما دام عاملها حياً
+                with self.idle_lock:
+                    workers = list(self.workers)
+                try:
+                    heartbeat(workers)
+                except Exception:
+                    logger.exception("فشل تجديد قفل المهام الجارية")
+                last_heartbeat = now
+            if now - last_maintenance >= config["LOCK_TIMEOUT"] / 2:
+                requeue_stale(config)
+                purge_finished(config)
+                close_old_connections()
+                last_maintenance = now
+            if now - last_stats >= options["stats_interval"]:
+                self.print_stats()
+                last_stats = now
+        self.print_stats()
+
+    def work(self, poll_interval, burst, concurrency):
+        worker = worker_name()
+        with self.idle_lock:
+            self.workers.add(worker)
+        errors = 0
+        try:
+            while not self.stop.is_set():
+                try:
+                    busy = self.work_once(worker, burst, concurrency)
+                except Exception:
+                    # قاعدة بيانات مقفلة أو اتصال منقطع: لا يموت الـ thread بصمت،
+                    # بل يسجل الخطأ ويعيد المحاولة باتصال جديد بعد انتظار متزايد.
+                    # المهمة المحجوزة أثناء الخطأ يعيدها requeue_stale إلى الطابور
+                    errors += 1
+                    logger.exception("خطأ في العامل %s (مرة %s)", worker, errors)
+                    connections.close_all()
+                    self.stop.wait(min(poll_interval * 2**errors, MAX_ERROR_BACKOFF))
+                    continue
+                errors = 0
+                if not busy:
+                    self.stop.wait(poll_interval)
+        finally:
+            connections.close_all()
+
+    def work_once(self, worker, burst, concurrency):
+        """حجز المهام الجاهزة وتنفيذها. يعيد False إذا كان الطابور فارغاً"""
+        jobs = claim(worker)
+        if not jobs:
+            if burst:
+                # الخروج عندما تفرغ كل الـ threads من العمل
+                with self.idle_lock:
+                    self.idle.add(worker)
+                    if len(self.idle) == concurrency:
+                        self.stop.set()
+            return False
+        with self.idle_lock:
+            self.idle.discard(worker)
+        for job in jobs:
+            started = time.monotonic()
+            result = run_job(job)
+            self.metrics.record(job, result, time.monotonic() - started)
+        return True
+
+    def print_stats(self):
+        stats = {"worker": self.metrics.snapshot(), "queue": queue_stats()}
+        self.stdout.write(json.dumps(stats, ensure_ascii=False))
@@ -0,0 +1,109 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.sqlite import get_pragmas
+
+ROWS = 5000
+
+
+def _connect(path, pragmas):
+    # isolation_level=None: التحكم بالمعاملات يدوياً مثل Django في وضع autocommit
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def _worker(path, pragmas, role, seconds, begin, results):
+    conn = _connect(path, pragmas)
+    ops = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        key = random.randint(1, ROWS)
+        try:
+            if role == "reader":
+                conn.execute(
+                    "SELECT data FROM session WHERE id BETWEEN ? AND ?", (key, key + 20)
+                ).fetchall()
+            else:
+                # نفس نمط حفظ الجلسة: قراءة ثم كتابة داخل معاملة
+                conn.execute(begin)
+                conn.execute("SELECT data FROM session WHERE id = ?", (key,)).fetchone()
+                conn.execute(
+                    "UPDATE session SET data = ? WHERE id = ?", (os.urandom(64).hex(), key)
+                )
+                conn.execute("COMMIT")
+            ops += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+    conn.close()
+    results.put((role, ops, errors))
+
+
+def run_profile(pragmas, begin, readers, writers, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        conn = _connect(path, pragmas)
+        conn.execute("CREATE TABLE session (id INTEGER PRIMARY KEY, data TEXT)")
+        conn.executemany(
+            "INSERT INTO session (id, data) VALUES (?, ?)",
+            ((i, "x" * 128) for i in range(1, ROWS + 1)),
+        )
+        conn.close()
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=_worker, args=(path, pragmas, role, seconds, begin, results)
+            )
+            for role in ["reader"] * readers + ["writer"] * writers
+        ]
+        for process in processes:
+            process.start()
+        totals = {"reader": [0, 0], "writer": [0, 0]}
+        for _ in processes:
+            role, ops, errors = results.get()
+            totals[role][0] += ops
+            totals[role][1] += errors
+        for process in processes:
+            process.join()
+        return totals
+
+
+class Command(BaseCommand):
+    help = "قياس إنتاجية القراءة/الكتابة المتزامنة على SQLite قبل وبعد إعدادات SQLITE_TUNING"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=5)
+
+    def handle(self, *args, **options):
+        profiles = [
+            # الإعدادات الافتراضية: journal=DELETE و synchronous=FULL ومعاملات DEFERRED
+            ("default", {}, "BEGIN"),
+            ("tuned", get_pragmas(), "BEGIN IMMEDIATE"),
+        ]
+        seconds = options["seconds"]
+        self.stdout.write(
+            f"{options['readers']} قارئ + {options['writers']} كاتب لمدة {seconds} ثانية"
+        )
+        self.stdout.write(f"{'profile':<10}{'reads/s':>12}{'writes/s':>12}{'errors':>10}")
+        for name, pragmas, begin in profiles:
+            totals = run_profile(
+                pragmas, begin, options["readers"], options["writers"], seconds
+            )
+            self.stdout.write(
+                f"{name:<10}"
+                f"{totals['reader'][0] / seconds:>12.0f}"
+                f"{totals['writer'][0] / seconds:>12.0f}"
+                f"{totals['reader'][1] + totals['writer'][1]:>10}"
+            )
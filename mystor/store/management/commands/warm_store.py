@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from store.warmup import warm
+
+
+class Command(BaseCommand):
+    help = "تسخين الكاش بعد النشر: الأصناف، قوائم الصفحة الرئيسية، أكثر المنتجات مشاهدة وصفحات الكتالوج"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--budget", type=float, default=30.0, help="أقصى مدة بالثواني")
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--top", type=int, default=50, help="عدد المنتجات")
+        parser.add_argument(
+            "--no-pages", action="store_true", help="بدون عرض الصفحات (الكاش فقط)"
+        )
+
+    def handle(self, *args, **options):
+        report = warm(
+            budget=options["budget"],
+            workers=options["workers"],
+            top_products=options["top"],
+            pages=not options["no_pages"],
+        )
+        done = sum(group["done"] for group in report["groups"].values())
+        total = sum(group["total"] for group in report["groups"].values())
+        for name, group in report["groups"].items():
+            self.stdout.write(
+                f"{name}: {group['done']}/{group['total']}"
+                + (f" (فشل {group['failed']})" if group["failed"] else "")
+            )
+        for error in report["errors"][:10]:
+            self.stderr.write(error)
+        message = (
+            f"التغطية {done}/{total} ({done / total:.0%}) في {report['seconds']} ثانية"
+            if total
+            else "لا يوجد ما يُسخن"
+        )
+        if report["budget_exhausted"]:
+            self.stdout.write(self.style.WARNING(message + " - انتهت الميزانية"))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
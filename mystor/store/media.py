@@ -0,0 +1,87 @@
+"""نقل الوسائط القديمة (بأسمائها الأصلية) إلى أسماء مبنية على المحتوى: manage.py rehash_media"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db.models.functions import Now
+
+from .models import Customer, Product
+from .storage import ContentAddressedStorage, is_hashed_name
+from .tasks import image_variants, variant_name
+
+MEDIA_FIELDS = [(Product, "image"), (Customer, "avatar")]
+
+
+def _legacy_names(model, field):
+    return (
+        model.objects.exclude(**{f"{field}__isnull": True})
+        .exclude(**{field: ""})
+        .values_list(field, flat=True)
+        .distinct()
+        .iterator()
+    )
+
+
+def _copy(storage, source, target):
+    if storage.exists(target) or not storage.exists(source):
+        return
+    with storage.open(source, "rb") as file:
+        storage.save(target, file)
+
+
+def rehash_file(storage, name):
+    """يعيد الاسم الجديد أو None إذا كان الملف مفقوداً. الصور المصغرة تُنسخ للاسم الجديد"""
+    if not storage.exists(name):
+        return None
+    with storage.open(name, "rb") as file:
+        new_name = storage.save(name, file)
+    for label in image_variants():
+        _copy(storage, variant_name(name, label), variant_name(new_name, label))
+    return new_name
+
+
+def _delete_original(storage, name):
+    storage.delete(name)
+    for label in image_variants():
+        storage.delete(variant_name(name, label))
+
+
+def rehash_media(workers=4, delete_originals=False, dry_run=False, stdout=None):
+    """
+    حساب hash الملفات بالتوازي (قراءة القرص وsha256 يحرران الـ GIL) وتحديث الأسماء
+    في قاعدة البيانات بـ update() بدون post_save. يعيد قاموس الإحصاءات.
+    """
+    stats = {"rehashed": 0, "rows": 0, "missing": 0, "deleted": 0}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for model, field in MEDIA_FIELDS:
+            storage = model._meta.get_field(field).storage
+            if not isinstance(storage, ContentAddressedStorage):
+                continue
+            names = [
+                name
+                for name in _legacy_names(model, field)
+                if storage.is_content_addressed(name) and not is_hashed_name(name)
+            ]
+            if dry_run:
+                stats["rehashed"] += len(names)
+                continue
+
+            for name, new_name in zip(
+                names, executor.map(lambda n: rehash_file(storage, n), names)
+            ):
+                if new_name is None:
+                    stats["missing"] += 1
+                    if stdout:
+                        stdout.write(f"ملف مفقود: {name}")
+                    continue
+                stats["rehashed"] += 1
+                changes = {field: new_name}
+                if model is Product:
+                    # رابط الصورة في الـ feed تغير (feeds.py يعتمد على updated_at)
+                    changes["updated_at"] = Now()
+                stats["rows"] += model.objects.filter(**{field: name}).update(**changes)
+                if delete_originals and new_name != name:
+                    _delete_original(storage, name)
+                    stats["deleted"] += 1
+            if stdout:
+                stdout.write(f"{model._meta.verbose_name}: {len(names)} ملف")
+    return stats
@@ -0,0 +1,218 @@
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Order
+
+# حدود مدرجات الزمن بالثواني (نفس القيم الافتراضية في prometheus_client)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "store_requests_total": ("counter", "عدد الطلبات لكل view وطريقة وحالة"),
+    "store_request_duration_seconds": ("histogram", "زمن الطلب لكل view"),
+    "store_db_queries_total": ("counter", "عدد استعلامات قاعدة البيانات لكل view"),
+    "store_db_duration_seconds_total": ("counter", "زمن استعلامات قاعدة البيانات لكل view"),
+    "store_session_saves_total": ("counter", "عدد مرات حفظ الجلسات"),
+    "store_cart_mutations_total": ("counter", "تعديلات السلة حسب النوع"),
+    "store_orders_placed_total": ("counter", "عدد الطلبات المنشأة"),
+    "store_catalog_cache_events_total": ("counter", "أحداث كاش الكتالوج حسب النوع"),
+}
+
+
+def get_metrics_dir():
+    return getattr(settings, "METRICS_DIR", None) or os.path.join(
+        tempfile.gettempdir(), "mystor-metrics"
+    )
+
+
+class MetricsRegistry:
+    """
+    مقاييس هذه العملية في الذاكرة (تسجيل القيمة = زيادة في قاموس تحت قفل).
+    thread خلفي يكتبها كل FLUSH_INTERVAL ثانية إلى ملف خاص بالعملية في METRICS_DIR،
+    ونقطة /metrics تجمع ملفات كل عمال gunicorn.
+    ملاحظة: يجب تفريغ METRICS_DIR عند كل نشر (gunicorn.conf.py يفعل ذلك).
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, flush_interval=5.0):
+        self.buckets = tuple(buckets)
+        self.flush_interval = flush_interval
+        self._counters = {}  # (name, labels) -> float
+        self._histograms = {}  # (name, labels) -> [bucket counts..., +Inf, sum]
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        # مع preload_app قد يحدث fork والقفل مأخوذ في العملية الرئيسية
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._pid = None
+
+    # --- التسجيل ---
+
+    # _ensure_flusher قبل التسجيل: أول استدعاء في العملية (أو بعد fork) يفرغ القواميس
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self._ensure_flusher()
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect_left(self.buckets, value)
+        self._ensure_flusher()
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            histogram[index] += 1
+            histogram[-1] += value
+
+    # --- الكتابة إلى الملف ---
+
+    def _ensure_flusher(self):
+        # بعد fork (gunicorn preload) يحتاج كل عامل thread وملف خاصين به
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._started = int(time.time())
+            self._counters.clear()
+            self._histograms.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def path(self):
+        # pid + وقت البدء حتى لا يكتب عامل جديد فوق عدادات عامل قديم بنفس pid
+        return os.path.join(get_metrics_dir(), f"metrics-{self._pid}-{self._started}.json")
+
+    def snapshot(self):
+        from .cache import catalog_cache
+
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [
+                [name, list(labels), list(values)]
+                for (name, labels), values in self._histograms.items()
+            ]
+        for event, count in catalog_cache.stats().items():
+            counters.append(["store_catalog_cache_events_total", [["event", event]], count])
+        return {"buckets": self.buckets, "counters": counters, "histograms": histograms}
+
+    def flush(self):
+        if self._pid != os.getpid():
+            return
+        directory = get_metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, self.path())
+
+
+registry = MetricsRegistry(
+    buckets=getattr(settings, "METRICS_BUCKETS", DEFAULT_BUCKETS),
+    flush_interval=getattr(settings, "METRICS_FLUSH_INTERVAL", 5.0),
+)
+inc = registry.inc
+observe = registry.observe
+
+
+@receiver(post_save, sender=Session)
+def count_session_save(sender, **kwargs):
+    inc("store_session_saves_total")
+
+
+@receiver(post_save, sender=Order)
+def count_order(sender, created, **kwargs):
+    if created:
+        inc("store_orders_placed_total")
+
+
+# ==========================================
+# التجميع والتصدير بصيغة Prometheus
+# ==========================================
+
+
+def collect():
+    """مجموع المقاييس من ملفات كل العمليات (الحالية منها والمنتهية)"""
+    registry.flush()
+    counters, histograms, buckets = {}, {}, DEFAULT_BUCKETS
+    for path in glob.glob(os.path.join(get_metrics_dir(), "metrics-*.json")):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        buckets = tuple(data["buckets"])
+        for name, labels, value in data["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in data["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                total[i] += value
+    return counters, histograms, buckets
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus():
+    counters, histograms, buckets = collect()
+    lines = []
+    emitted = set()
+
+    def header(name):
+        if name not in emitted and name in HELP:
+            kind, text = HELP[name]
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+        emitted.add(name)
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name)
+        lines.append(f"{name}{_labels(labels)} {value:g}")
+
+    for (name, labels), values in sorted(histograms.items()):
+        header(name)
+        cumulative = 0
+        for bound, count in zip(buckets, values):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels, [('le', f'{bound:g}')])} {cumulative}")
+        cumulative += values[len(buckets)]
+        lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {cumulative}')
+        lines.append(f"{name}_sum{_labels(labels)} {values[-1]:g}")
+        lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+    return "\n".join(lines) + "\n"
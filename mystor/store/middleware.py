@@ -0,0 +1,277 @@
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection, connections
+from django.urls import Resolver404, resolve
+
+from . import metrics
+from .profiling import PROFILERS, save_profile
+from .profiling import get_config as profiling_config
+from .recently_viewed import COOKIE_NAME as RECENTLY_VIEWED_COOKIE
+from .recently_viewed import background_request, record_view
+from .resilience import db_health, page_cache, service_unavailable
+from .resilience import config as resilience_config
+from .routers import replica_alias, request_routing
+from .throttling import RateLimit, get_client_ip, too_many_requests
+
+
+class RateLimitMiddleware:
+    """
+    تحديد معدل الطلبات لكل مسار حسب RATE_LIMITS في الإعدادات.
+    يجب وضعه قبل SessionMiddleware حتى لا يلمس رد 429 الجلسة.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.methods = set(
+            getattr(settings, "RATE_LIMIT_METHODS", ["POST", "PUT", "PATCH", "DELETE"])
+        )
+        self.limits = {
+            url_name: RateLimit.from_config(url_name, conf)
+            for url_name, conf in getattr(settings, "RATE_LIMITS", {}).items()
+        }
+
+    def __call__(self, request):
+        if self.limits and request.method in self.methods:
+            try:
+                url_name = resolve(request.path_info).url_name
+            except Resolver404:
+                url_name = None
+            limit = self.limits.get(url_name)
+            if limit is not None:
+                allowed, retry_after = limit.hit(get_client_ip(request))
+                if not allowed:
+                    return too_many_requests(retry_after)
+        return self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    يفعّل القراءة من النسخة المتماثلة لطلبات القراءة، ويثبّت المستخدم على
+    الأساسية لمدة READ_YOUR_WRITES_SECONDS بعد أي كتابة (عبر كوكي) حتى يرى تغييراته.
+    """
+
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+    PIN_COOKIE_NAME = "db_pin"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, "READ_YOUR_WRITES_SECONDS", 5)
+
+    def _pinned(self, request):
+        try:
+            return float(request.COOKIES.get(self.PIN_COOKIE_NAME, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def __call__(self, request):
+        has_replica = replica_alias() is not None
+        safe = request.method in self.SAFE_METHODS
+        with request_routing(has_replica and safe and not self._pinned(request)) as wrote:
+            response = self.get_response(request)
+            if has_replica and (wrote() or not safe):
+                response.set_cookie(
+                    self.PIN_COOKIE_NAME,
+                    str(int(time.time() + self.pin_seconds)),
+                    max_age=self.pin_seconds,
+                    httponly=True,
+                    samesite="Lax",
+                )
+        return response
+
+
+class ResilienceMiddleware:
+    """
+    - Stale-While-Revalidate لصفحات الكتالوج: تُقدم آخر نسخة معروضة ويعيد بناءها
+      عامل واحد في الخلفية.
+    - الوضع المتدهور: عند بطء قاعدة البيانات أو كثرة أخطائها تُقدم صفحات الكتالوج
+      من الكاش، وطلبات القراءة الأخرى تمر عادياً، والكتابة تحصل على 503 سريع.
+    يوضع قبل SessionMiddleware حتى لا تلمس الردود المخزنة الجلسة أو قاعدة البيانات.
+
+    النسخ المخزنة عامة (بدون سلة أو مستخدم)، لذا تُخزن وتُقدم في الوضع العادي فقط
+    للزوار بدون كوكي جلسة أو "شاهدتها مؤخراً". في الوضع المتدهور تُقدم للجميع.
+    الكوكيز الخاصة بالزائر (شاهدتها مؤخراً) تُضاف للرد المخزن عند تقديمه.
+    """
+
+    SAFE_METHODS = ("GET", "HEAD")
+    EXEMPT_URL_NAMES = {"health_status", "metrics", "media_file"}
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.swr_views = set(resilience_config["SWR_VIEWS"])
+        self.fresh = resilience_config["FRESH_SECONDS"]
+        self.stale = resilience_config["STALE_SECONDS"]
+
+    def _generic_visitor(self, request):
+        return (
+            settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and RECENTLY_VIEWED_COOKIE not in request.COOKIES
+        )
+
+    def _cached_response(self, request, match, entry, state):
+        response = page_cache.response(entry, state)
+        # الصفحة المخزنة لا تمر عبر product_details: نحتسب المشاهدة ونضيف كوكي
+        # "شاهدتها مؤخراً" للزائر هنا
+        if match.url_name == "product_details":
+            record_view(request, response, match.kwargs["product_id"])
+        return response
+
+    def __call__(self, request):
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            match = None
+        url_name = match.url_name if match else None
+        # لـ MetricsMiddleware: الردود المخزنة لا تمر عبر الـ view
+        request.store_url_name = url_name
+        cacheable = url_name in self.swr_views and request.method in self.SAFE_METHODS
+
+        if db_health.is_degraded() and url_name not in self.EXEMPT_URL_NAMES:
+            if request.path_info.startswith("/admin/"):
+                return self._call_observed(request)
+            entry = page_cache.get(request) if cacheable else None
+            if entry is not None:
+                return self._cached_response(request, match, entry, "DEGRADED")
+            if request.method not in self.SAFE_METHODS:
+                # رفض الكتابة سريعاً، والقراءة غير المخزنة تمر
+                return service_unavailable()
+            return self._call_observed(request)
+
+        if cacheable and self._generic_visitor(request):
+            entry = page_cache.get(request)
+            if entry is not None:
+                age = page_cache.age(entry)
+                if age < self.fresh:
+                    return self._cached_response(request, match, entry, "HIT")
+                if age < self.fresh + self.stale:
+                    if page_cache.acquire_refresh(request):
+                        refresh = background_request(
+                            {**request.META, "wsgi.url_scheme": request.scheme}
+                        )
+                        threading.Thread(
+                            target=self._refresh, args=(refresh,), daemon=True
+                        ).start()
+                    return self._cached_response(request, match, entry, "STALE")
+
+        response = self._call_observed(request)
+        if cacheable:
+            self._maybe_store(request, response)
+        return response
+
+    def _call_observed(self, request):
+        with connection.execute_wrapper(db_health):
+            return self.get_response(request)
+
+    def _maybe_store(self, request, response):
+        if (
+            response.status_code == 200
+            and not response.streaming
+            and self._generic_visitor(request)
+            and not request.user.is_authenticated
+        ):
+            page_cache.store(request, response)
+
+    def _refresh(self, request):
+        """
+        إعادة بناء الصفحة في الخلفية بطلب مستقل من background_request (زائر عام بدون
+        جلسة، ولا تُحتسب مشاهدة)
+        """
+        try:
+            response = self._call_observed(request)
+            self._maybe_store(request, response)
+        finally:
+            page_cache.release_refresh(request)
+            connections.close_all()
+
+
+class ProfilingMiddleware:
+    """
+    قياس أداء الطلب (الـ view + عرض القالب) عند الطلب من الموظفين
+    (?_profile=1 أو الترويسة X-Profile) أو لعينة عشوائية من الطلبات حسب SAMPLE_RATE.
+    يوضع آخر القائمة. النتائج في لوحة التحكم: ProfileRecord.
+    """
+
+    def __init__(self, get_response):
+        self.config = profiling_config()
+        if not self.config["ENABLED"]:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = self.config["SAMPLE_RATE"]
+
+    def _requested_mode(self, request):
+        requested = request.GET.get(self.config["TRIGGER_PARAM"]) or request.META.get(
+            self.config["TRIGGER_HEADER"]
+        )
+        if requested and request.user.is_staff:
+            return requested if requested in PROFILERS else self.config["MODE"]
+        if self.sample_rate and random.random() < self.sample_rate:
+            return self.config["MODE"]
+        return None
+
+    def __call__(self, request):
+        mode = self._requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with PROFILERS[mode](self.config) as run:
+            response = self.get_response(request)
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        duration = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        record = save_profile(
+            request, response, run, duration, match.url_name if match else None
+        )
+        if request.user.is_staff:
+            response["X-Profile-Id"] = str(record.pk)
+        return response
+
+
+class MetricsMiddleware:
+    """
+    عدد الطلبات وزمنها وزمن استعلامات قاعدة البيانات لكل url_name.
+    يوضع قبل ResilienceMiddleware حتى تُحتسب الصفحات المقدمة من الكاش أيضاً.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db = [0, 0.0]
+
+        def observe_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db[0] += 1
+                db[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        # على كل الاتصالات: القراءة قد تذهب للنسخة المتماثلة (ReplicaRoutingMiddleware)
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(observe_query))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        view = match.url_name if match else getattr(request, "store_url_name", None)
+        view = view or "<unresolved>"
+        metrics.inc(
+            "store_requests_total",
+            view=view,
+            method=request.method,
+            status=response.status_code,
+        )
+        metrics.observe("store_request_duration_seconds", duration, view=view)
+        if db[0]:
+            metrics.inc("store_db_queries_total", db[0], view=view)
+            metrics.inc("store_db_duration_seconds_total", db[1], view=view)
+        return response
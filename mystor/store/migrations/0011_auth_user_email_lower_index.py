@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('store', '0010_category_parent'),
+    ]
+
+    operations = [
+        # فهرس وظيفي على lower(email) يخدم EmailOrUsernameBackend
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS store_auth_user_email_lower_idx ON auth_user (lower(email));',
+            reverse_sql='DROP INDEX IF EXISTS store_auth_user_email_lower_idx;',
+        ),
+    ]
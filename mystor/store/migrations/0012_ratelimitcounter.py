@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_auth_user_email_lower_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitCounter',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('value', models.FloatField(default=0)),
+                ('state', models.JSONField(blank=True, null=True)),
+                ('expires_at', models.FloatField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'عداد تحديد المعدل',
+                'verbose_name_plural': 'عدادات تحديد المعدل',
+            },
+        ),
+    ]
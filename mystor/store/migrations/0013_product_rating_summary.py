@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:15
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_summary(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    Review = apps.get_model('store', 'Review')
+    rows = Review.objects.values('product_id').annotate(n=Count('id'), total=Sum('rating'))
+    for row in rows.iterator():
+        Product.objects.filter(pk=row['product_id']).update(
+            rating_count=row['n'], rating_sum=row['total'] or 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_ratelimitcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='عدد التقييمات'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='مجموع التقييمات'),
+        ),
+        migrations.RunPython(backfill_rating_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:16
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_rating_histogram(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    Review = apps.get_model('store', 'Review')
+    star_counts = {f'stars_{n}': Count('id', filter=Q(rating=n)) for n in range(1, 6)}
+    rows = Review.objects.values('product_id').annotate(**star_counts)
+    for row in rows.iterator():
+        Product.objects.filter(pk=row.pop('product_id')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_product_rating_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stars_1',
+            field=models.PositiveIntegerField(default=0, verbose_name='تقييمات نجمة واحدة'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stars_2',
+            field=models.PositiveIntegerField(default=0, verbose_name='تقييمات نجمتين'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stars_3',
+            field=models.PositiveIntegerField(default=0, verbose_name='تقييمات 3 نجوم'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stars_4',
+            field=models.PositiveIntegerField(default=0, verbose_name='تقييمات 4 نجوم'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stars_5',
+            field=models.PositiveIntegerField(default=0, verbose_name='تقييمات 5 نجوم'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', '-review_date', '-id'], name='review_product_date_idx'),
+        ),
+        migrations.RunPython(backfill_rating_histogram, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_product_rating_histogram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Attribute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='اسم الخاصية')),
+                ('slug', models.SlugField(allow_unicode=True, max_length=255, unique=True, verbose_name='المعرّف')),
+                ('kind', models.CharField(choices=[('NUMERIC', 'رقمي'), ('ENUM', 'قائمة قيم'), ('TEXT', 'نص حر')], max_length=10, verbose_name='النوع')),
+                ('unit', models.CharField(blank=True, default='', max_length=20, verbose_name='الوحدة')),
+            ],
+            options={
+                'verbose_name': 'خاصية',
+                'verbose_name_plural': 'الخصائص',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductAttributeValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numeric_value', models.FloatField(blank=True, null=True)),
+                ('enum_value', models.CharField(blank=True, max_length=255, null=True)),
+                ('attribute', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='store.attribute')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attribute_values', to='store.product')),
+                ('specification', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='typed_value', to='store.specification')),
+            ],
+            options={
+                'verbose_name': 'قيمة خاصية',
+                'verbose_name_plural': 'قيم الخصائص',
+                'indexes': [models.Index(fields=['attribute', 'numeric_value', 'product'], name='attr_numeric_idx'), models.Index(fields=['attribute', 'enum_value', 'product'], name='attr_enum_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_typed_attributes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='view_count',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, verbose_name='عدد المشاهدات'),
+        ),
+    ]
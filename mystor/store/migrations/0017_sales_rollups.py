@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0016_product_view_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('HOUR', 'ساعة'), ('DAY', 'يوم')], max_length=4, verbose_name='الدقة')),
+                ('period_start', models.DateTimeField(verbose_name='بداية الفترة')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='الإيراد')),
+                ('units', models.IntegerField(default=0, verbose_name='الوحدات')),
+                ('orders', models.IntegerField(default=0, verbose_name='الطلبات')),
+            ],
+            options={
+                'verbose_name': 'ملخص المبيعات',
+                'verbose_name_plural': 'تقارير المبيعات',
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'period_start'), name='sales_rollup_period_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('HOUR', 'ساعة'), ('DAY', 'يوم')], max_length=4, verbose_name='الدقة')),
+                ('period_start', models.DateTimeField(verbose_name='بداية الفترة')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='الإيراد')),
+                ('units', models.IntegerField(default=0, verbose_name='الوحدات')),
+                ('orders', models.IntegerField(default=0, verbose_name='الطلبات')),
+                ('brand', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.brand')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='store.product')),
+            ],
+            options={
+                'verbose_name': 'مبيعات منتج',
+                'verbose_name_plural': 'مبيعات المنتجات',
+                'indexes': [models.Index(fields=['granularity', 'category', 'period_start'], name='sales_rollup_category_idx'), models.Index(fields=['granularity', 'brand', 'period_start'], name='sales_rollup_brand_idx')],
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'period_start', 'product'), name='product_sales_rollup_uniq')],
+            },
+        ),
+    ]
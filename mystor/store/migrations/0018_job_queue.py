@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0017_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=100, verbose_name='المهمة')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='المعاملات')),
+                ('priority', models.SmallIntegerField(default=0, verbose_name='الأولوية')),
+                ('status', models.CharField(choices=[('QUEUED', 'في الانتظار'), ('RUNNING', 'قيد التنفيذ'), ('DONE', 'منتهية'), ('FAILED', 'فشلت')], default='QUEUED', max_length=10, verbose_name='الحالة')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='المحاولات')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5, verbose_name='أقصى عدد محاولات')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='موعد التنفيذ')),
+                ('dedup_key', models.CharField(blank=True, max_length=200, null=True)),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'مهمة خلفية',
+                'verbose_name_plural': 'المهام الخلفية',
+                'indexes': [models.Index(fields=['status', '-priority', 'run_at'], name='job_claim_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['QUEUED', 'RUNNING'])), fields=('dedup_key',), name='job_active_dedup_uniq')],
+            },
+        ),
+    ]
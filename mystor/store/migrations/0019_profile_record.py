@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0018_job_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('path', models.CharField(max_length=500, verbose_name='المسار')),
+                ('method', models.CharField(max_length=10)),
+                ('url_name', models.CharField(blank=True, max_length=100)),
+                ('mode', models.CharField(max_length=20, verbose_name='النوع')),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration_ms', models.FloatField(verbose_name='المدة (ms)')),
+                ('pstats', models.BinaryField(blank=True, null=True)),
+                ('collapsed', models.TextField(blank=True)),
+                ('summary', models.TextField(blank=True, verbose_name='الملخص')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'قياس أداء',
+                'verbose_name_plural': 'قياسات الأداء',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0021_admin_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('PRICE_DROP', 'انخفاض السعر'), ('BACK_IN_STOCK', 'عاد إلى المخزون')], max_length=20, verbose_name='النوع')),
+                ('old_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='السعر السابق')),
+                ('new_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='السعر الجديد')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('fanned_out_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'تغيير منتج',
+                'verbose_name_plural': 'تغييرات المنتجات (تنبيهات المفضلة)',
+            },
+        ),
+        migrations.CreateModel(
+            name='WishlistNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='wishlist',
+            index=models.Index(fields=['product', 'user'], name='wishlist_product_user_idx'),
+        ),
+        migrations.AddField(
+            model_name='productchangeevent',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.product', verbose_name='المنتج'),
+        ),
+        migrations.AddField(
+            model_name='wishlistnotification',
+            name='event',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.productchangeevent'),
+        ),
+        migrations.AddField(
+            model_name='wishlistnotification',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='wishlistnotification',
+            index=models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['user'], name='wishlist_notification_pending'),
+        ),
+        migrations.AddConstraint(
+            model_name='wishlistnotification',
+            constraint=models.UniqueConstraint(fields=('user', 'event'), name='wishlist_notification_uniq'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0022_wishlist_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reserved',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='الكمية المحجوزة'),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(max_length=40)),
+                ('quantity', models.PositiveIntegerField(verbose_name='الكمية')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='ينتهي في')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.product', verbose_name='المنتج')),
+            ],
+            options={
+                'verbose_name': 'حجز مخزون',
+                'verbose_name_plural': 'حجوزات المخزون',
+                'constraints': [models.UniqueConstraint(fields=('session_key', 'product'), name='stock_reservation_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-19 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0023_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='stockreservation',
+            name='stock_reservation_uniq',
+        ),
+        migrations.RenameField(
+            model_name='stockreservation',
+            old_name='session_key',
+            new_name='cart_id',
+        ),
+        migrations.AddConstraint(
+            model_name='stockreservation',
+            constraint=models.UniqueConstraint(fields=('cart_id', 'product'), name='stock_reservation_uniq'),
+        ),
+    ]
@@ -1,11 +1,11 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Avg, Count
 from django.contrib.sessions.models import Session
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
+from django.utils import timezone
 
 
 class Category(models.Model):
@@ -61,6 +61,8 @@ class Product(models.Model):
     stock = models.IntegerField(
         "الكمية في المخزون", default=0, validators=[MinValueValidator(0)]
     )
+    # مجموع الكميات المحجوزة في السلال (store/reservations.py). المتاح = stock - reserved
+    reserved = models.PositiveIntegerField("الكمية المحجوزة", default=0, editable=False)
 
     features = models.JSONField(
         blank=True,
@@ -81,6 +83,23 @@ class Product(models.Model):
         Brand, on_delete=models.SET_NULL, null=True, blank=True, related_name="products"
     )
 
+    # ملخص التقييمات يُحدَّث تدريجياً مع كل تقييم (store/reviews.py) بدلاً من Avg/Count
+    rating_count = models.PositiveIntegerField("عدد التقييمات", default=0)
+    rating_sum = models.PositiveIntegerField("مجموع التقييمات", default=0)
+    # عدد المشاهدات لترتيب الأكثر شعبية (يُكتب على دفعات من store/recently_viewed.py)
+    view_count = models.PositiveBigIntegerField("عدد المشاهدات", default=0, db_index=True)
+
+    # توزيع التقييمات حسب عدد النجوم (1 إلى 5)
+    stars_1 = models.PositiveIntegerField("تقييمات نجمة واحدة", default=0)
+    stars_2 = models.PositiveIntegerField("تقييمات نجمتين", default=0)
+    stars_3 = models.PositiveIntegerField("تقييمات 3 نجوم", default=0)
+    stars_4 = models.PositiveIntegerField("تقييمات 4 نجوم", default=0)
+    stars_5 = models.PositiveIntegerField("تقييمات 5 نجوم", default=0)
+
+    # آخر تعديل (لتحديث ملفات sitemap والـ feed المتغيرة فقط). التحديثات الجماعية
+    # بـ update() يجب أن تضبطه بنفسها
+    updated_at = models.DateTimeField("آخر تعديل", auto_now=True, db_index=True)
+
     class Meta:
         verbose_name = "منتج"
         verbose_name_plural = "المنتجات"
@@ -88,26 +107,70 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self._save_reserved = "reserved" in (kwargs.get("update_fields") or ())
+        super().save(*args, **kwargs)
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # reserved يتغير فقط بتحديثات شرطية (store/reservations.py): الحفظ العادي
+        # بقيمة محملة قديمة كان سيلغي حجوزات تمت بعد تحميل المنتج.
+        # يُستبعد من UPDATE فقط، فالحفظ بعد حذف الصف (أو نسخ المنتج) يبقى INSERT عادياً
+        if not getattr(self, "_save_reserved", False):
+            values = [value for value in values if value[0].name != "reserved"]
+        return super()._do_update(
+            base_qs, using, pk_val, values, update_fields, forced_update
+        )
+
+    # الحقول التي تراقبها تنبيهات المفضلة (store/notifications.py)
+    WATCHED_FIELDS = ("price", "stock", "is_available")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # القيم كما حُمّلت من القاعدة، لاكتشاف انخفاض السعر أو عودة المخزون عند الحفظ
+        instance._loaded_watched = {
+            field: getattr(instance, field)
+            for field in cls.WATCHED_FIELDS
+            if field in field_names
+        }
+        if "image" in field_names:
+            # لتوليد الصور المصغرة فقط عند تغيير الصورة (tasks.enqueue_image_variants)
+            instance._loaded_image = instance.image.name
+        return instance
+
+    @property
+    def available_stock(self):
+        """المخزون غير المحجوز في سلال أخرى"""
+        return max(self.stock - self.reserved, 0)
+
     @property
     def average_rating(self):
         """
-        يحسب ويعيد متوسط تقييم المنتج.
+        يعيد متوسط تقييم المنتج من الملخص المخزن بدون أي استعلام.
         يعيد 0.0 إذا لم يكن هناك تقييمات.
         """
-        # .aggregate() تعيد قاموسًا، لذلك يجب أن نحصل على القيمة منه
-        reviews_summary = self.reviews.aggregate(average=Avg("rating"))
-        avg = reviews_summary.get("average", 0.0)
-        # التأكد من أن القيمة ليست None
-        if avg is None:
+        if not self.rating_count:
             return 0.0
-        return avg
+        return self.rating_sum / self.rating_count
 
     @property
     def reviews_count(self):
         """
-        يحسب ويعيد العدد الإجمالي لتقييمات المنتج.
+        يعيد العدد الإجمالي لتقييمات المنتج من الملخص المخزن.
         """
-        return self.reviews.count()
+        return self.rating_count
+
+    @property
+    def rating_histogram(self):
+        """
+        توزيع التقييمات من 5 نجوم إلى نجمة واحدة مع النسبة المئوية لكل منها.
+        """
+        histogram = []
+        for stars in range(5, 0, -1):
+            count = getattr(self, f"stars_{stars}")
+            percent = round(count * 100 / self.rating_count) if self.rating_count else 0
+            histogram.append({"stars": stars, "count": count, "percent": percent})
+        return histogram
 
 
 # ---
@@ -123,6 +186,10 @@ class Wishlist(models.Model):
             "user",
             "product",
         )  # لمنع تكرار نفس المنتج في المفضلة لنفس المستخدم
+        indexes = [
+            # المهتمون بمنتج مرتبين بالمستخدم (توزيع التنبيهات على دفعات)
+            models.Index(fields=["product", "user"], name="wishlist_product_user_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.product.name}"
@@ -149,6 +216,14 @@ class Customer(models.Model):
         "الصورة الشخصية", upload_to="customers/", blank=True, null=True
     )  # إضافة الصورة
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # يُحفظ العميل مع كل حفظ للمستخدم (تسجيل الدخول): الصور المصغرة عند تغيير الصورة فقط
+        if "avatar" in field_names:
+            instance._loaded_avatar = instance.avatar.name
+        return instance
+
     def __str__(self):
         return self.name
 
@@ -204,10 +279,23 @@ class Order(models.Model):
     class Meta:
         verbose_name = "طلب"
         verbose_name_plural = "الطلبات"
+        indexes = [
+            # فلترة الحالة مع التاريخ (لوحة التحكم والتقارير) والتنقل بالتاريخ
+            models.Index(fields=["status", "-order_date"], name="order_status_date_idx"),
+            models.Index(fields=["-order_date"], name="order_date_idx"),
+        ]
 
     def __str__(self):
         return f"طلب رقم #{self.id} للعميل {self.customer.name if self.customer else 'محذوف'}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # الحالة كما حُمّلت من القاعدة، لمعرفة انتقال الطلب إلى/من "مكتمل" عند الحفظ
+        if "status" in field_names:
+            instance._loaded_status = instance.status
+        return instance
+
 
 # ---
 
@@ -276,11 +364,33 @@ class Review(models.Model):
         verbose_name = "تقييم"
         verbose_name_plural = "التقييمات"
         unique_together = ("product", "customer")  # ضمان تقييم واحد لكل عميل ومنتج
+        indexes = [
+            # ترقيم التقييمات بالمؤشر (review_date, id) لكل منتج
+            models.Index(
+                fields=["product", "-review_date", "-id"],
+                name="review_product_date_idx",
+            ),
+            # التنقل بالتاريخ في لوحة التحكم
+            models.Index(fields=["-review_date"], name="review_date_idx"),
+        ]
 
     def __str__(self):
         return f"تقييم {self.rating} نجوم للمنتج {self.product.name}"
 
 
+@receiver(post_delete, sender=Review)
+def remove_review_from_summary(sender, instance, **kwargs):
+    # الحذف (من لوحة التحكم أو بالتتالي) يخصم التقييم من ملخص المنتج
+    stars_field = f"stars_{instance.rating}"
+    Product.objects.filter(
+        pk=instance.product_id, rating_count__gt=0, **{f"{stars_field}__gt": 0}
+    ).update(
+        rating_count=models.F("rating_count") - 1,
+        rating_sum=models.F("rating_sum") - instance.rating,
+        **{stars_field: models.F(stars_field) - 1},
+    )
+
+
 class Cart(models.Model):
     items = models.JSONField(default=dict)
     session = models.ForeignKey(Session, on_delete=models.CASCADE)
@@ -330,6 +440,332 @@ class InventoryMovement(models.Model):
     class Meta:
         verbose_name = "حركة مخزون"
         verbose_name_plural = "المخزون"
+        indexes = [
+            models.Index(fields=["-movement_date"], name="inventory_date_idx"),
+        ]
 
     def __str__(self):
         return f"{self.movement_type} {self.quantity} من {self.product.name}"
+
+
+# ---
+
+
+class RateLimitCounter(models.Model):
+    """عدادات تحديد المعدل عند استخدام DatabaseStore (بدون Redis/Memcached)"""
+
+    key = models.CharField(max_length=255, primary_key=True)
+    value = models.FloatField(default=0)
+    state = models.JSONField(null=True, blank=True)
+    expires_at = models.FloatField(db_index=True)
+
+    class Meta:
+        verbose_name = "عداد تحديد المعدل"
+        verbose_name_plural = "عدادات تحديد المعدل"
+
+    def __str__(self):
+        return self.key
+
+
+# -----------------------------------------------------------------------------
+# 4. فهرس المواصفات المنظمة (Typed Attributes)
+# -----------------------------------------------------------------------------
+
+
+class Attribute(models.Model):
+    """قاموس موحد لأسماء المواصفات مع نوع القيمة ووحدتها الموحدة"""
+
+    KIND_CHOICES = [
+        ("NUMERIC", "رقمي"),
+        ("ENUM", "قائمة قيم"),
+        ("TEXT", "نص حر"),
+    ]
+
+    name = models.CharField("اسم الخاصية", max_length=255)
+    slug = models.SlugField(
+        "المعرّف", max_length=255, unique=True, allow_unicode=True
+    )
+    kind = models.CharField("النوع", max_length=10, choices=KIND_CHOICES)
+    unit = models.CharField("الوحدة", max_length=20, blank=True, default="")
+
+    class Meta:
+        verbose_name = "خاصية"
+        verbose_name_plural = "الخصائص"
+
+    def __str__(self):
+        return f"{self.name} ({self.unit})" if self.unit else self.name
+
+
+class ProductAttributeValue(models.Model):
+    """القيمة المنظمة لكل مواصفة، تُبنى من Specification وتُحدّث عند حفظها"""
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="attribute_values"
+    )
+    attribute = models.ForeignKey(
+        Attribute, on_delete=models.CASCADE, related_name="values"
+    )
+    specification = models.OneToOneField(
+        Specification, on_delete=models.CASCADE, related_name="typed_value"
+    )
+    # القيمة الرقمية بالوحدة الموحدة للخاصية (مثلاً GB)
+    numeric_value = models.FloatField(null=True, blank=True)
+    # القيمة النصية بعد التوحيد (أحرف صغيرة ومسافات مفردة)
+    enum_value = models.CharField(max_length=255, null=True, blank=True)
+
+    class Meta:
+        verbose_name = "قيمة خاصية"
+        verbose_name_plural = "قيم الخصائص"
+        indexes = [
+            models.Index(
+                fields=["attribute", "numeric_value", "product"],
+                name="attr_numeric_idx",
+            ),
+            models.Index(
+                fields=["attribute", "enum_value", "product"],
+                name="attr_enum_idx",
+            ),
+        ]
+
+    def __str__(self):
+        value = self.numeric_value if self.numeric_value is not None else self.enum_value
+        return f"{self.attribute_id}: {value}"
+
+
+@receiver(post_save, sender=Specification)
+def sync_specification_value(sender, instance, raw=False, **kwargs):
+    # إبقاء الفهرس المنظم متزامناً مع المواصفة (الحذف يتم بالتتالي)
+    if raw:
+        return
+    from .attributes import sync_specification
+
+    sync_specification(instance)
+
+
+# -----------------------------------------------------------------------------
+# 5. جداول المبيعات المجمعة (Rollups) للتقارير
+# -----------------------------------------------------------------------------
+
+ROLLUP_GRANULARITY_CHOICES = [
+    ("HOUR", "ساعة"),
+    ("DAY", "يوم"),
+]
+
+
+class SalesRollup(models.Model):
+    """إجمالي المبيعات لكل ساعة/يوم (الطلبات المكتملة فقط)"""
+
+    granularity = models.CharField(
+        "الدقة", max_length=4, choices=ROLLUP_GRANULARITY_CHOICES
+    )
+    period_start = models.DateTimeField("بداية الفترة")
+    revenue = models.DecimalField("الإيراد", max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField("الوحدات", default=0)
+    orders = models.IntegerField("الطلبات", default=0)
+
+    class Meta:
+        verbose_name = "ملخص المبيعات"
+        verbose_name_plural = "تقارير المبيعات"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularity", "period_start"], name="sales_rollup_period_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.period_start:%Y-%m-%d %H:%M}"
+
+
+class ProductSalesRollup(models.Model):
+    """المبيعات لكل منتج في كل ساعة/يوم، مع الصنف والشركة لتجميع التقارير حسبهما"""
+
+    granularity = models.CharField(
+        "الدقة", max_length=4, choices=ROLLUP_GRANULARITY_CHOICES
+    )
+    period_start = models.DateTimeField("بداية الفترة")
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="sales_rollups"
+    )
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    brand = models.ForeignKey(Brand, on_delete=models.SET_NULL, null=True, related_name="+")
+    revenue = models.DecimalField("الإيراد", max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField("الوحدات", default=0)
+    orders = models.IntegerField("الطلبات", default=0)
+
+    class Meta:
+        verbose_name = "مبيعات منتج"
+        verbose_name_plural = "مبيعات المنتجات"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularity", "period_start", "product"],
+                name="product_sales_rollup_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["granularity", "category", "period_start"],
+                name="sales_rollup_category_idx",
+            ),
+            models.Index(
+                fields=["granularity", "brand", "period_start"],
+                name="sales_rollup_brand_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.granularity} {self.period_start:%Y-%m-%d %H:%M}"
+
+
+# -----------------------------------------------------------------------------
+# 6. طابور المهام الخلفية (store/jobs.py + manage.py run_worker)
+# -----------------------------------------------------------------------------
+
+
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ("QUEUED", "في الانتظار"),
+        ("RUNNING", "قيد التنفيذ"),
+        ("DONE", "منتهية"),
+        ("FAILED", "فشلت"),
+    ]
+
+    task = models.CharField("المهمة", max_length=100)
+    payload = models.JSONField("المعاملات", default=dict, blank=True)
+    priority = models.SmallIntegerField("الأولوية", default=0)  # الأكبر أولاً
+    status = models.CharField(
+        "الحالة", max_length=10, choices=STATUS_CHOICES, default="QUEUED"
+    )
+    attempts = models.PositiveSmallIntegerField("المحاولات", default=0)
+    max_attempts = models.PositiveSmallIntegerField("أقصى عدد محاولات", default=5)
+    run_at = models.DateTimeField("موعد التنفيذ", default=timezone.now)
+    # مهمة نشطة واحدة فقط لكل مفتاح (في الانتظار أو قيد التنفيذ)
+    dedup_key = models.CharField(max_length=200, null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "مهمة خلفية"
+        verbose_name_plural = "المهام الخلفية"
+        indexes = [
+            models.Index(
+                fields=["status", "-priority", "run_at"], name="job_claim_idx"
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedup_key"],
+                condition=models.Q(status__in=["QUEUED", "RUNNING"]),
+                name="job_active_dedup_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+# -----------------------------------------------------------------------------
+# 7. نتائج قياس أداء الطلبات (store/profiling.py)
+# -----------------------------------------------------------------------------
+
+
+class ProfileRecord(models.Model):
+    created_at = models.DateTimeField(auto_now_add=True)
+    path = models.CharField("المسار", max_length=500)
+    method = models.CharField(max_length=10)
+    url_name = models.CharField(max_length=100, blank=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    mode = models.CharField("النوع", max_length=20)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField("المدة (ms)")
+    pstats = models.BinaryField(null=True, blank=True)
+    collapsed = models.TextField(blank=True)  # صيغة flamegraph: "a;b;c count"
+    summary = models.TextField("الملخص", blank=True)
+
+    class Meta:
+        verbose_name = "قياس أداء"
+        verbose_name_plural = "قياسات الأداء"
+        ordering = ["-id"]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f}ms)"
+
+
+# -----------------------------------------------------------------------------
+# 8. تنبيهات المفضلة: انخفاض السعر وعودة المخزون (store/notifications.py)
+# -----------------------------------------------------------------------------
+
+
+class ProductChangeEvent(models.Model):
+    KIND_CHOICES = [
+        ("PRICE_DROP", "انخفاض السعر"),
+        ("BACK_IN_STOCK", "عاد إلى المخزون"),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="المنتج")
+    kind = models.CharField("النوع", max_length=20, choices=KIND_CHOICES)
+    old_price = models.DecimalField("السعر السابق", max_digits=10, decimal_places=2)
+    new_price = models.DecimalField("السعر الجديد", max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # وقت إنشاء تنبيهات كل المهتمين بالمنتج
+    fanned_out_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "تغيير منتج"
+        verbose_name_plural = "تغييرات المنتجات (تنبيهات المفضلة)"
+
+    def __str__(self):
+        return f"{self.product_id} {self.kind} {self.old_price} -> {self.new_price}"
+
+
+class WishlistNotification(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    event = models.ForeignKey(ProductChangeEvent, on_delete=models.CASCADE)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # إعادة تشغيل مهمة التوزيع لا تكرر التنبيه
+            models.UniqueConstraint(fields=["user", "event"], name="wishlist_notification_uniq"),
+        ]
+        indexes = [
+            # التنبيهات غير المرسلة مرتبة بالمستخدم (رسالة واحدة لكل مستخدم)
+            models.Index(
+                fields=["user"],
+                condition=models.Q(sent_at__isnull=True),
+                name="wishlist_notification_pending",
+            ),
+        ]
+
+
+# -----------------------------------------------------------------------------
+# 9. حجز المخزون للسلال لمدة محدودة (store/reservations.py)
+# -----------------------------------------------------------------------------
+
+
+class StockReservation(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="المنتج")
+    # معرف السلة في الجلسة (reservations.get_cart_id)، ثابت عند تسجيل الدخول
+    cart_id = models.CharField(max_length=40)
+    quantity = models.PositiveIntegerField("الكمية")
+    expires_at = models.DateTimeField("ينتهي في", db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "حجز مخزون"
+        verbose_name_plural = "حجوزات المخزون"
+        constraints = [
+            # سطر واحد لكل منتج في كل سلة (ويخدم البحث بحجوزات السلة)
+            models.UniqueConstraint(
+                fields=["cart_id", "product"], name="stock_reservation_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} x{self.quantity} ({self.cart_id[:8]})"
@@ -0,0 +1,249 @@
+"""
+تنبيهات المفضلة عند انخفاض السعر أو عودة المنتج إلى المخزون:
+
+1. اكتشاف التغيير: عند حفظ المنتج (post_save مع القيم المحملة في Product.from_db)
+   أو من التعديلات الجماعية (bulk.py) يُسجل ProductChangeEvent لكل منتج في مفضلة أحد.
+2. التوزيع (wishlist_fanout): صف WishlistNotification لكل مهتم، على دفعات مرتبة
+   بالمستخدم فلا يُحمّل 100 ألف مستخدم دفعة واحدة.
+3. الملخص (wishlist_digests): بعد DIGEST_DELAY رسالة واحدة لكل مستخدم تجمع كل
+   تغييرات منتجاته، عبر BACKEND القابل للاستبدال.
+"""
+
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import feeds
+from .jobs import task
+from .models import Product, ProductChangeEvent, Wishlist, WishlistNotification
+
+DEFAULTS = {
+    "ENABLED": True,
+    "BACKEND": "store.notifications.EmailDigestBackend",
+    # التغييرات خلال هذه المدة تُجمع في رسالة واحدة لكل مستخدم
+    "DIGEST_DELAY": 300,
+    "CHUNK_SIZE": 1000,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "WISHLIST_NOTIFICATIONS", {})}
+
+
+# ==========================================
+# اكتشاف التغيير
+# ==========================================
+
+
+def _purchasable(stock, is_available):
+    return is_available and stock > 0
+
+
+def change_kind(old, new):
+    """old/new: (price, stock, is_available). يعيد نوع الحدث أو None"""
+    if not _purchasable(*new[1:]):
+        return None
+    if not _purchasable(*old[1:]):
+        return "BACK_IN_STOCK"
+    if new[0] < old[0]:
+        return "PRICE_DROP"
+    return None
+
+
+def watched_state(product_ids):
+    """{pk: (price, stock, is_available)} للمنتجات الموجودة في مفضلة أحد فقط"""
+    return {
+        pk: state
+        for pk, *state in Product.objects.filter(
+            pk__in=product_ids, wishlist__isnull=False
+        )
+        .distinct()
+        .values_list("pk", *Product.WATCHED_FIELDS)
+    }
+
+
+def record_changes(before, after):
+    """
+    تسجيل حدث لكل منتج تغير بين حالتين (من watched_state) وجدولة توزيعه
+    بعد نهاية المعاملة. يعيد الأحداث المسجلة.
+    """
+    if not get_config()["ENABLED"]:
+        return []
+    events = []
+    for pk, old in before.items():
+        new = after.get(pk)
+        kind = change_kind(old, new) if new else None
+        if kind:
+            events.append(
+                ProductChangeEvent(
+                    product_id=pk, kind=kind, old_price=old[0], new_price=new[0]
+                )
+            )
+    if not events:
+        return []
+    events = ProductChangeEvent.objects.bulk_create(events)
+    event_ids = [event.pk for event in events]
+    transaction.on_commit(
+        lambda: [
+            fan_out.enqueue(event_id=pk, dedup_key=f"wishlist_fanout:{pk}")
+            for pk in event_ids
+        ]
+    )
+    return events
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, raw=False, **kwargs):
+    loaded = getattr(instance, "_loaded_watched", None)
+    if raw or not (created or loaded and len(loaded) == len(Product.WATCHED_FIELDS)):
+        # منتج حُمّل بحقول مؤجلة: لا نقرأها حتى لا نضيف استعلامات
+        return
+    current = {field: getattr(instance, field) for field in Product.WATCHED_FIELDS}
+    instance._loaded_watched = current
+    if created:
+        return
+    old = tuple(loaded[field] for field in Product.WATCHED_FIELDS)
+    new = tuple(current[field] for field in Product.WATCHED_FIELDS)
+    if change_kind(old, new) and Wishlist.objects.filter(product_id=instance.pk).exists():
+        record_changes({instance.pk: old}, {instance.pk: new})
+
+
+# ==========================================
+# التوزيع على المهتمين
+# ==========================================
+
+
+def _digest_window(delay):
+    """رقم نافذة التجميع الحالية وموعد نهايتها: كل تغييراتها تصل في رسالة واحدة"""
+    window = int(time.time() // delay)
+    return window, datetime.fromtimestamp((window + 1) * delay, tz=dt_timezone.utc)
+
+
+def schedule_digests():
+    window, run_at = _digest_window(max(get_config()["DIGEST_DELAY"], 1))
+    # مفتاح لكل نافذة: مهمة النافذة السابقة أثناء تنفيذها لا تبتلع تغييرات هذه النافذة
+    send_digests.enqueue(dedup_key=f"wishlist_digests:{window}", run_at=run_at)
+
+
+@task("wishlist_fanout")
+def fan_out(event_id):
+    event = ProductChangeEvent.objects.filter(
+        pk=event_id, fanned_out_at__isnull=True
+    ).first()
+    if event is None:
+        return
+    chunk_size = get_config()["CHUNK_SIZE"]
+    user_ids = (
+        Wishlist.objects.filter(product_id=event.product_id)
+        .order_by("user_id")
+        .values_list("user_id", flat=True)
+    )
+    last_user = 0
+    while True:
+        chunk = list(user_ids.filter(user_id__gt=last_user)[:chunk_size])
+        if not chunk:
+            break
+        WishlistNotification.objects.bulk_create(
+            [WishlistNotification(user_id=uid, event_id=event.pk) for uid in chunk],
+            ignore_conflicts=True,
+        )
+        last_user = chunk[-1]
+    ProductChangeEvent.objects.filter(pk=event.pk).update(fanned_out_at=timezone.now())
+    schedule_digests()
+
+
+# ==========================================
+# الملخص لكل مستخدم
+# ==========================================
+
+
+def coalesce(notifications):
+    """
+    عدة تغييرات لنفس المنتج تصبح سطراً واحداً: السعر قبل أول تغيير والسعر الحالي.
+    التغييرات التي انعكست قبل الإرسال (عاد السعر أو نفد المخزون) تُحذف.
+    """
+    items = {}
+    for notification in notifications:
+        event = notification.event
+        item = items.setdefault(
+            event.product_id,
+            {"product": event.product, "kinds": set(), "old_price": event.old_price},
+        )
+        item["kinds"].add(event.kind)
+    result = []
+    for item in items.values():
+        product = item["product"]
+        if not _purchasable(product.stock, product.is_available):
+            continue
+        item["new_price"] = product.price
+        if item["kinds"] == {"PRICE_DROP"} and product.price >= item["old_price"]:
+            continue
+        result.append(item)
+    return result
+
+
+@task("wishlist_digests")
+def send_digests():
+    config = get_config()
+    backend = import_string(config["BACKEND"])()
+    pending = WishlistNotification.objects.filter(sent_at__isnull=True)
+    user_ids = pending.order_by("user_id").values_list("user_id", flat=True).distinct()
+    last_user = 0
+    while True:
+        chunk = list(user_ids.filter(user_id__gt=last_user)[: config["CHUNK_SIZE"]])
+        if not chunk:
+            break
+        rows = list(
+            pending.filter(user_id__in=chunk)
+            .select_related("user", "event__product")
+            .order_by("user_id", "event_id")
+        )
+        digests = {}
+        for row in rows:
+            digests.setdefault(row.user_id, (row.user, []))[1].append(row)
+        backend.send(
+            [(user, coalesce(notifications)) for user, notifications in digests.values()]
+        )
+        # تُعلَّم بعد الإرسال: عند انقطاع العامل قد تتكرر رسائل دفعة واحدة فقط
+        WishlistNotification.objects.filter(pk__in=[row.pk for row in rows]).update(
+            sent_at=timezone.now()
+        )
+        last_user = chunk[-1]
+
+
+class EmailDigestBackend:
+    """رسالة بريد لكل مستخدم عبر EMAIL_BACKEND (console في التطوير، locmem في الاختبارات)"""
+
+    subject = "تحديثات على منتجات في مفضلتك"
+
+    def render(self, user, items):
+        site_url = feeds.get_config()["SITE_URL"].rstrip("/")
+        lines = []
+        for item in items:
+            product = item["product"]
+            url = site_url + reverse("product_details", args=[product.pk])
+            if "BACK_IN_STOCK" in item["kinds"]:
+                status = "عاد إلى المخزون"
+            else:
+                status = f"انخفض السعر من {item['old_price']} إلى {item['new_price']}"
+            lines.append(f"- {product.name}: {status}\n  {url}")
+        return "\n".join(["مرحباً،", "", *lines])
+
+    def send(self, digests):
+        messages = [
+            EmailMessage(self.subject, self.render(user, items), to=[user.email])
+            for user, items in digests
+            if user.email and items
+        ]
+        if messages:
+            with get_connection() as connection:
+                connection.send_messages(messages)
+        return len(messages)
@@ -0,0 +1,128 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+
+from django.conf import settings
+
+DEFAULTS = {
+    "ENABLED": False,  # عند التعطيل لا يُضاف الـ middleware إطلاقاً (بدون أي كلفة)
+    "MODE": "cprofile",  # "cprofile" أو "sampling"
+    "SAMPLE_RATE": 0.0,  # نسبة الطلبات العادية التي تُقاس تلقائياً (0.001 = طلب من كل ألف)
+    "TRIGGER_PARAM": "_profile",  # للموظفين: ?_profile=1 أو ?_profile=sampling
+    "TRIGGER_HEADER": "HTTP_X_PROFILE",  # للموظفين: الترويسة X-Profile
+    "SAMPLING_INTERVAL": 0.005,  # ثوانٍ بين العينات في وضع sampling
+    "MAX_RECORDS": 500,  # أقدم النتائج تُحذف بعد هذا العدد
+    "SUMMARY_LINES": 40,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "PROFILING", {})}
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+class CProfileRun:
+    """cProfile حول الطلب: نتيجة pstats كاملة مع ملخص نصي"""
+
+    mode = "cprofile"
+
+    def __init__(self, config):
+        self.config = config
+        self.profiler = cProfile.Profile()
+
+    def __enter__(self):
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.disable()
+
+    def results(self):
+        summary = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=summary)
+        stats.sort_stats("cumulative").print_stats(self.config["SUMMARY_LINES"])
+        return {
+            # نفس صيغة pstats.dump_stats: تُفتح بـ pstats.Stats(path) أو snakeviz
+            "pstats": marshal.dumps(stats.stats),
+            "collapsed": "",
+            "summary": summary.getvalue(),
+        }
+
+
+class SamplingRun:
+    """
+    عينات دورية لمكدس thread الطلب من thread آخر (sys._current_frames).
+    أقل تأثيراً على زمن الطلب من cProfile والنتيجة مكدسات مجمعة (collapsed)
+    يمكن تمريرها مباشرة إلى flamegraph.pl أو speedscope.
+    """
+
+    mode = "sampling"
+
+    def __init__(self, config):
+        self.interval = config["SAMPLING_INTERVAL"]
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._target = threading.get_ident()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def results(self):
+        collapsed = "\n".join(f"{stack} {count}" for stack, count in self.stacks.items())
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        summary = [f"{self.samples} عينة كل {self.interval * 1000:g}ms"]
+        for label, count in leaves.most_common(40):
+            summary.append(f"{count:6d}  {count / self.samples:6.1%}  {label}")
+        return {"pstats": None, "collapsed": collapsed, "summary": "\n".join(summary)}
+
+
+PROFILERS = {"cprofile": CProfileRun, "sampling": SamplingRun}
+
+
+def save_profile(request, response, run, duration, url_name):
+    from .models import ProfileRecord
+
+    user = getattr(request, "user", None)
+    record = ProfileRecord.objects.create(
+        path=request.get_full_path()[:500],
+        method=request.method,
+        url_name=url_name or "",
+        user=user if user is not None and user.is_authenticated else None,
+        mode=run.mode,
+        status_code=response.status_code,
+        duration_ms=round(duration * 1000, 2),
+        **run.results(),
+    )
+    max_records = get_config()["MAX_RECORDS"]
+    ProfileRecord.objects.filter(pk__lte=record.pk - max_records).delete()
+    return record
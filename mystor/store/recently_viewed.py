@@ -0,0 +1,134 @@
+import atexit
+import io
+import os
+import threading
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.db.models import F
+
+from .models import Product
+
+COOKIE_NAME = "recently_viewed"
+COOKIE_SALT = "store.recently_viewed"
+COOKIE_MAX_AGE = 60 * 60 * 24 * 30
+
+
+def is_background_render(request):
+    """
+    طلب يعرض الصفحة لتخزينها وليس لزائر حقيقي (ResilienceMiddleware._refresh
+    وwarmup.py): لا تُحتسب مشاهدة ولا تُنشأ جلسة.
+    """
+    return getattr(request, "store_background_render", False)
+
+
+def background_request(environ):
+    """
+    طلب GET جديد بدون كوكيز ولا جسم لعرض الصفحة في الخلفية. مستقل عن طلب الزائر:
+    الـ thread الخلفي لا يغير طلباً ما زال الـ thread الرئيسي يستخدمه.
+    """
+    environ = {
+        key: value
+        for key, value in environ.items()
+        if key not in ("HTTP_COOKIE", "CONTENT_LENGTH", "CONTENT_TYPE")
+    }
+    environ.update({"REQUEST_METHOD": "GET", "wsgi.input": io.BytesIO()})
+    environ.setdefault("wsgi.url_scheme", "http")
+    request = WSGIRequest(environ)
+    request.store_background_render = True
+    return request
+
+
+def recent_limit():
+    return getattr(settings, "RECENTLY_VIEWED_MAX", 12)
+
+
+def get_recent_ids(request):
+    """أرقام المنتجات من الكوكي الموقّعة، الأحدث أولاً"""
+    raw = request.get_signed_cookie(COOKIE_NAME, default="", salt=COOKIE_SALT)
+    return [int(part) for part in raw.split(".") if part.isdigit()][: recent_limit()]
+
+
+def record_view(request, response, product_id):
+    """
+    تسجيل مشاهدة منتج: قائمة محدودة في كوكي موقّعة (بدون أي كتابة في قاعدة البيانات)،
+    وزيادة عداد المشاهدات في الذاكرة ليُكتب لاحقاً على دفعات.
+    العرض في الخلفية (تحديث الكاش أو التسخين) ليس مشاهدة حقيقية فلا يُسجل.
+    """
+    if is_background_render(request):
+        return
+    recent = deque(
+        (pid for pid in get_recent_ids(request) if pid != product_id),
+        maxlen=recent_limit(),
+    )
+    recent.appendleft(product_id)
+    response.set_signed_cookie(
+        COOKIE_NAME,
+        ".".join(str(pid) for pid in recent),
+        salt=COOKIE_SALT,
+        max_age=COOKIE_MAX_AGE,
+        httponly=True,
+        samesite="Lax",
+    )
+    view_counter.add(product_id)
+
+
+def recent_products(request, exclude=None):
+    """المنتجات التي شاهدها الزائر مؤخراً باستعلام id__in واحد وبنفس الترتيب المحفوظ"""
+    ids = [pid for pid in get_recent_ids(request) if pid != exclude]
+    if not ids:
+        return []
+    by_id = Product.objects.in_bulk(ids)
+    return [by_id[pid] for pid in ids if pid in by_id]
+
+
+class ViewCounter:
+    """
+    تجميع مشاهدات المنتجات في الذاكرة وكتابتها كل flush_interval ثانية
+    من thread خلفي، حتى لا يكتب كل طلب في قاعدة البيانات.
+    """
+
+    def __init__(self, flush_interval=10.0):
+        self.flush_interval = flush_interval
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        # مع preload_app: thread العملية الرئيسية لا ينتقل للعمال بعد fork، فكل عامل
+        # يبدأ thread الكتابة الخاص به ولا يكرر مشاهدات العملية الرئيسية
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, product_id, count=1):
+        with self._lock:
+            self._counts[product_id] += count
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="view-counter", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        for product_id, count in counts.items():
+            Product.objects.filter(pk=product_id).update(
+                view_count=F("view_count") + count
+            )
+
+    def _run(self):
+        stop = threading.Event()
+        while not stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            finally:
+                connections.close_all()
+
+
+view_counter = ViewCounter(getattr(settings, "VIEW_COUNTER_FLUSH_INTERVAL", 10.0))
@@ -0,0 +1,242 @@
+"""
+حجز المخزون عند الإضافة للسلة لمدة TTL ثانية (اختياري: STOCK_RESERVATIONS["ENABLED"]).
+
+- Product.reserved عداد للكميات المحجوزة، والمتاح = stock - reserved.
+- الحجز تحديث شرطي واحد على صف المنتج:
+      UPDATE product SET reserved = reserved + q WHERE id = ? AND stock >= reserved + q
+  فلا يُحجز أكثر من المخزون مهما تزامنت الطلبات على نفس المنتج.
+- الحجوزات المنتهية تُحرر على دفعات (مهمة release_reservations أو manage.py
+  release_reservations)، ومباشرة لنفس المنتج إذا فشل حجز بسببها.
+- الحجز مربوط بمعرف السلة (cart_id في الجلسة) وليس session_key: تسجيل الدخول
+  يغير session_key (cycle_key) ويحتفظ ببيانات الجلسة ومنها السلة ومعرفها.
+"""
+
+import uuid
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_out
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .catalog import invalidate_on_commit
+from .jobs import task
+from .models import Product, StockReservation
+
+DEFAULTS = {
+    "ENABLED": False,
+    "TTL": 900,  # مدة الحجز بالثواني، وتتجدد مع كل إضافة أو عرض للسلة
+    "BATCH_SIZE": 500,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "STOCK_RESERVATIONS", {})}
+
+
+def enabled():
+    return get_config()["ENABLED"]
+
+
+class InsufficientStock(ValueError):
+    pass
+
+
+CART_ID_KEY = "cart_id"
+
+
+def get_cart_id(request):
+    """معرف سلة الجلسة (يُنشأ عند أول حجز ويبقى بعد تسجيل الدخول)"""
+    cart_id = request.session.get(CART_ID_KEY)
+    if cart_id is None:
+        cart_id = request.session[CART_ID_KEY] = uuid.uuid4().hex
+    return cart_id
+
+
+def _schedule_release(expires_at):
+    """مهمة تحرير واحدة لكل دقيقة تنتهي فيها حجوزات"""
+    minute = int(expires_at.timestamp() // 60) + 1
+    run_at = datetime.fromtimestamp(minute * 60, tz=dt_timezone.utc)
+    transaction.on_commit(
+        lambda: release_expired_task.enqueue(
+            dedup_key=f"release_reservations:{minute}", run_at=run_at
+        )
+    )
+
+
+def _take(product_id, quantity):
+    taken = Product.objects.filter(
+        pk=product_id, stock__gte=F("reserved") + quantity
+    ).update(reserved=F("reserved") + quantity)
+    if taken and Product.objects.filter(pk=product_id, stock=F("reserved")).exists():
+        # نفد المتاح: صفحة المنتج المخزنة في الكاش تعرضه غير متوفر
+        invalidate_on_commit([product_id])
+    return taken
+
+
+def _give_back(product_id, quantity):
+    # الحد الأدنى صفر: تحرير مكرر (أو عداد أعاده reconcile) لا يجعل reserved سالباً
+    Product.objects.filter(pk=product_id).update(
+        reserved=Greatest(F("reserved") - quantity, 0)
+    )
+    if Product.objects.filter(pk=product_id, stock=F("reserved") + quantity).exists():
+        # كان المتاح صفراً قبل التحرير
+        invalidate_on_commit([product_id])
+
+
+def reserve(product_id, cart_id, quantity):
+    """
+    حجز quantity إضافية من المنتج لسلة cart_id وتجديد مدة حجزها.
+    يرفع InsufficientStock إذا لم يكفِ المخزون غير المحجوز.
+    """
+    if quantity <= 0:
+        return
+    expires_at = timezone.now() + timedelta(seconds=get_config()["TTL"])
+    with transaction.atomic():
+        if not _take(product_id, quantity):
+            # ربما تشغل حجوزات منتهية لم تُحرر بعد المخزون المطلوب
+            release_expired(product_id=product_id)
+            if not _take(product_id, quantity):
+                raise InsufficientStock("الكمية المطلوبة غير متوفرة في المخزون")
+
+        lookup = {"product_id": product_id, "cart_id": cart_id}
+        changes = {"quantity": F("quantity") + quantity, "expires_at": expires_at}
+        if not StockReservation.objects.filter(**lookup).update(**changes):
+            try:
+                with transaction.atomic():
+                    StockReservation.objects.create(
+                        **lookup, quantity=quantity, expires_at=expires_at
+                    )
+            except IntegrityError:
+                # طلب آخر من نفس السلة أنشأ السطر في نفس اللحظة
+                StockReservation.objects.filter(**lookup).update(**changes)
+        _schedule_release(expires_at)
+
+
+def release(product_id, cart_id, quantity=None):
+    """تحرير الحجز كله (quantity=None) أو جزء منه. يعيد الكمية المحررة"""
+    with transaction.atomic():
+        reservation = (
+            StockReservation.objects.select_for_update()
+            .filter(product_id=product_id, cart_id=cart_id)
+            .first()
+        )
+        if reservation is None:
+            return 0
+        if quantity is None or quantity >= reservation.quantity:
+            quantity = reservation.quantity
+            reservation.delete()
+        else:
+            StockReservation.objects.filter(pk=reservation.pk).update(
+                quantity=F("quantity") - quantity
+            )
+        _give_back(product_id, quantity)
+        return quantity
+
+
+def release_cart(cart_id):
+    """تحرير كل حجوزات السلة. يعيد عدد المنتجات المحررة"""
+    product_ids = StockReservation.objects.filter(cart_id=cart_id).values_list(
+        "product_id", flat=True
+    )
+    return sum(1 for product_id in list(product_ids) if release(product_id, cart_id))
+
+
+def restore_cart(cart_id, cart):
+    """
+    مطابقة سلة الجلسة مع حجوزاتها عند قراءتها: الحجز المنتهي (أو المحرر) يُعاد
+    حجزه إن توفر المخزون، وإلا يُحذف المنتج من السلة.
+    يعيد (السلة بعد المطابقة، معرفات المنتجات المحذوفة).
+    """
+    now = timezone.now()
+    for product_id in StockReservation.objects.filter(
+        cart_id=cart_id, expires_at__lte=now
+    ).values_list("product_id", flat=True):
+        release(product_id, cart_id)
+    held = dict(
+        StockReservation.objects.filter(cart_id=cart_id).values_list("product_id", "quantity")
+    )
+
+    restored, dropped = {}, []
+    for key, quantity in cart.items():
+        if not str(key).isdigit():
+            continue
+        product_id, quantity = int(key), int(quantity)
+        try:
+            reserve(product_id, cart_id, quantity - held.get(product_id, 0))
+        except InsufficientStock:
+            release(product_id, cart_id)
+            dropped.append(key)
+            continue
+        restored[key] = quantity
+    touch(cart_id)
+    return restored, dropped
+
+
+def touch(cart_id):
+    """تجديد مدة كل حجوزات السلة (عند عرضها)"""
+    expires_at = timezone.now() + timedelta(seconds=get_config()["TTL"])
+    if StockReservation.objects.filter(cart_id=cart_id).update(expires_at=expires_at):
+        _schedule_release(expires_at)
+
+
+@receiver(user_logged_out)
+def release_on_logout(sender, request, **kwargs):
+    # logout() يمسح الجلسة ومعها السلة: لا داعي لانتظار انتهاء الحجز
+    cart_id = request.session.get(CART_ID_KEY) if request is not None else None
+    if cart_id and enabled():
+        release_cart(cart_id)
+
+
+def release_expired(batch_size=None, product_id=None):
+    """
+    تحرير الحجوزات المنتهية على دفعات مرتبة بوقت الانتهاء: كل دفعة في معاملة قصيرة
+    بحذف واحد وتحديث واحد لكل منتج في الدفعة. يعيد عدد الحجوزات المحررة.
+    """
+    batch_size = batch_size or get_config()["BATCH_SIZE"]
+    released = 0
+    while True:
+        with transaction.atomic():
+            expired = StockReservation.objects.filter(expires_at__lte=timezone.now())
+            if product_id is not None:
+                expired = expired.filter(product_id=product_id)
+            expired = expired.order_by("expires_at").select_for_update(
+                skip_locked=connection.features.has_select_for_update_skip_locked
+            )
+            rows = list(expired.values_list("pk", "product_id", "quantity")[:batch_size])
+            if not rows:
+                break
+            StockReservation.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+            totals = Counter()
+            for _, pid, quantity in rows:
+                totals[pid] += quantity
+            for pid, quantity in totals.items():
+                _give_back(pid, quantity)
+        released += len(rows)
+        if len(rows) < batch_size:
+            break
+    return released
+
+
+def reconcile():
+    """إعادة حساب Product.reserved من جدول الحجوزات (للإصلاح إذا انحرف العداد)"""
+    total = (
+        StockReservation.objects.filter(product=OuterRef("pk"))
+        .values("product")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    # تحديث واحد: مجموع كل منتج يُحسب في نفس الجملة فلا يتعارض مع حجز متزامن
+    return Product.objects.filter(
+        Q(reserved__gt=0) | Q(pk__in=StockReservation.objects.values("product_id"))
+    ).update(reserved=Coalesce(Subquery(total), 0))
+
+
+@task("release_reservations")
+def release_expired_task():
+    release_expired()
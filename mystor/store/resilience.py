@@ -0,0 +1,193 @@
+import hashlib
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError
+from django.http import HttpResponse, JsonResponse
+
+DEFAULTS = {
+    # صفحات الكتالوج التي يمكن تقديمها من آخر نسخة معروضة
+    "SWR_VIEWS": ["index", "products", "product_details"],
+    "CACHE_ALIAS": "shared",
+    "FRESH_SECONDS": 30,  # تُقدم مباشرة بدون تحديث
+    "STALE_SECONDS": 600,  # بعد FRESH تُقدم قديمة مع تحديث واحد في الخلفية
+    # عتبات الوضع المتدهور (متوسط زمن الاستعلام ونسبة الأخطاء خلال النافذة)
+    "LATENCY_MS": 500,
+    "ERROR_RATE": 0.2,
+    "MIN_SAMPLES": 20,
+    "WINDOW_SECONDS": 30,
+    "COOLDOWN_SECONDS": 30,  # مدة البقاء في الوضع المتدهور قبل إعادة المحاولة
+    "FORCE_MODE": None,  # "normal" أو "degraded" للتجارب اليدوية
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "RESILIENCE", {})}
+
+
+class DatabaseHealth:
+    """
+    مراقبة زمن استعلامات قاعدة البيانات ونسبة أخطائها (لكل عامل).
+    عند تجاوز العتبات ينتقل الموقع إلى الوضع المتدهور لمدة COOLDOWN_SECONDS.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._samples = deque()  # (الوقت، المدة بالثواني، خطأ؟)
+        self._total_duration = 0.0
+        self._errors = 0
+        self._lock = threading.Lock()
+        self.degraded_since = None
+        self.last_reason = ""
+
+    def __call__(self, execute, sql, params, many, context):
+        """يُستخدم مع connection.execute_wrapper"""
+        started = time.perf_counter()
+        failed = False
+        try:
+            return execute(sql, params, many, context)
+        except DatabaseError:
+            failed = True
+            raise
+        finally:
+            self.record(time.perf_counter() - started, failed)
+
+    def _prune(self, now):
+        horizon = now - self.config["WINDOW_SECONDS"]
+        while self._samples and self._samples[0][0] < horizon:
+            _, duration, failed = self._samples.popleft()
+            self._total_duration -= duration
+            self._errors -= failed
+
+    def record(self, duration, failed=False):
+        now = time.time()
+        with self._lock:
+            self._samples.append((now, duration, failed))
+            self._total_duration += duration
+            self._errors += failed
+            self._prune(now)
+            if self.degraded_since is None:
+                reason = self._breach()
+                if reason:
+                    self.degraded_since = now
+                    self.last_reason = reason
+
+    def _breach(self):
+        count = len(self._samples)
+        if count < self.config["MIN_SAMPLES"]:
+            return ""
+        avg_ms = self._total_duration / count * 1000
+        if avg_ms >= self.config["LATENCY_MS"]:
+            return f"latency {avg_ms:.0f}ms"
+        error_rate = self._errors / count
+        if error_rate >= self.config["ERROR_RATE"]:
+            return f"error rate {error_rate:.0%}"
+        return ""
+
+    def is_degraded(self):
+        forced = self.config["FORCE_MODE"]
+        if forced:
+            return forced == "degraded"
+        with self._lock:
+            if self.degraded_since is None:
+                return False
+            if time.time() - self.degraded_since >= self.config["COOLDOWN_SECONDS"]:
+                # نهاية فترة التهدئة: نبدأ بنافذة جديدة ونعيد القياس
+                self.degraded_since = None
+                self._samples.clear()
+                self._total_duration = 0.0
+                self._errors = 0
+                return False
+            return True
+
+    def state(self):
+        """الحالة الحالية للعرض في api/health/"""
+        degraded = self.is_degraded()
+        with self._lock:
+            self._prune(time.time())
+            count = len(self._samples)
+            return {
+                "mode": "degraded" if degraded else "normal",
+                "reason": self.last_reason if degraded else "",
+                "degraded_since": self.degraded_since,
+                "samples": count,
+                "avg_latency_ms": round(self._total_duration / count * 1000, 2)
+                if count
+                else 0,
+                "error_rate": round(self._errors / count, 4) if count else 0,
+                "thresholds": {
+                    key: self.config[key]
+                    for key in (
+                        "LATENCY_MS",
+                        "ERROR_RATE",
+                        "MIN_SAMPLES",
+                        "WINDOW_SECONDS",
+                        "COOLDOWN_SECONDS",
+                    )
+                },
+            }
+
+
+class PageCache:
+    """آخر نسخة ناجحة من صفحات الكتالوج في الكاش المشترك"""
+
+    def __init__(self, config):
+        self.config = config
+
+    @property
+    def cache(self):
+        return caches[self.config["CACHE_ALIAS"]]
+
+    def key(self, request):
+        digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f"page:{digest}"
+
+    def get(self, request):
+        return self.cache.get(self.key(request))
+
+    def store(self, request, response):
+        entry = {
+            "content": response.content,
+            "content_type": response["Content-Type"],
+            "stored_at": time.time(),
+        }
+        timeout = self.config["FRESH_SECONDS"] + self.config["STALE_SECONDS"]
+        # في الوضع المتدهور نحتاج النسخة حتى بعد نافذة stale، لذا نحتفظ بها أطول
+        self.cache.set(self.key(request), entry, timeout * 10)
+
+    def age(self, entry):
+        return time.time() - entry["stored_at"]
+
+    def acquire_refresh(self, request):
+        """قفل التحديث: عامل واحد فقط يعيد بناء الصفحة"""
+        return self.cache.add(f"{self.key(request)}:refresh", 1, 30)
+
+    def release_refresh(self, request):
+        self.cache.delete(f"{self.key(request)}:refresh")
+
+    @staticmethod
+    def response(entry, state):
+        response = HttpResponse(entry["content"], content_type=entry["content_type"])
+        response["X-Page-Cache"] = state
+        return response
+
+
+def service_unavailable():
+    """رد سريع في الوضع المتدهور لا يلمس الجلسة ولا قاعدة البيانات"""
+    response = JsonResponse(
+        {
+            "status": "error",
+            "message": "الخدمة مشغولة حالياً، يرجى المحاولة بعد قليل",
+        },
+        status=503,
+    )
+    response["Retry-After"] = str(get_config()["COOLDOWN_SECONDS"])
+    return response
+
+
+config = get_config()
+db_health = DatabaseHealth(config)
+page_cache = PageCache(config)
@@ -0,0 +1,246 @@
+import atexit
+import base64
+import threading
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .models import Product, Review
+
+
+def save_reviews(entries):
+    """
+    حفظ دفعة من التقييمات (UPSERT على القيد الفريد product + customer)
+    وتحديث ملخص التقييمات لكل منتج في نفس المعاملة.
+    entries: قائمة قواميس فيها product_id, customer_id, rating, comment
+    """
+    # نفس العميل ونفس المنتج داخل الدفعة: آخر تقييم هو المعتمد
+    latest = {}
+    for entry in entries:
+        latest[(entry["product_id"], entry["customer_id"])] = entry
+    if not latest:
+        return
+
+    product_ids = sorted({pid for pid, _ in latest})
+    customer_ids = {cid for _, cid in latest}
+
+    with transaction.atomic():
+        # قفل صفوف المنتجات بترتيب ثابت حتى لا يُحتسب نفس التقييم مرتين عند التزامن
+        list(
+            Product.objects.select_for_update()
+            .filter(pk__in=product_ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+        previous = {
+            (pid, cid): rating
+            for pid, cid, rating in Review.objects.filter(
+                product_id__in=product_ids, customer_id__in=customer_ids
+            ).values_list("product_id", "customer_id", "rating")
+            if (pid, cid) in latest
+        }
+
+        Review.objects.bulk_create(
+            [
+                Review(
+                    product_id=pid,
+                    customer_id=cid,
+                    rating=entry["rating"],
+                    comment=entry.get("comment", ""),
+                )
+                for (pid, cid), entry in latest.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["product", "customer"],
+            update_fields=["rating", "comment"],
+        )
+
+        deltas = {}
+        for key, entry in latest.items():
+            product_deltas = deltas.setdefault(key[0], {})
+            rating = entry["rating"]
+            old_rating = previous.get(key)
+            if old_rating is None:
+                _add(product_deltas, "rating_count", 1)
+            else:
+                _add(product_deltas, "rating_sum", -old_rating)
+                _add(product_deltas, f"stars_{old_rating}", -1)
+            _add(product_deltas, "rating_sum", rating)
+            _add(product_deltas, f"stars_{rating}", 1)
+
+        for pid, product_deltas in deltas.items():
+            changes = {
+                field: F(field) + delta
+                for field, delta in product_deltas.items()
+                if delta
+            }
+            if changes:
+                # updated_at: تقييمات صفحة المنتج تغيرت (lastmod في sitemap، feeds.py)
+                Product.objects.filter(pk=pid).update(**changes, updated_at=Now())
+
+        # ملخص المنتج والصفحة الأولى من التقييمات تغيرت
+        from .catalog import invalidate_on_commit
+
+        invalidate_on_commit(deltas)
+
+
+def _add(deltas, field, value):
+    deltas[field] = deltas.get(field, 0) + value
+
+
+def recompute_ratings(product_ids=None):
+    """إعادة بناء ملخص وتوزيع التقييمات من جدول Review (للإصلاح أو بعد تعديلات لوحة التحكم)"""
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    star_counts = {
+        f"stars_{stars}": Count("id", filter=Q(rating=stars)) for stars in range(1, 6)
+    }
+    summary = {
+        row.pop("product_id"): row
+        for row in Review.objects.filter(product__in=products)
+        .values("product_id")
+        .annotate(rating_count=Count("id"), rating_sum=Sum("rating"), **star_counts)
+    }
+    empty = dict.fromkeys(["rating_count", "rating_sum", *star_counts], 0)
+    for pid in products.values_list("pk", flat=True).iterator():
+        values = summary.get(pid, empty)
+        # الكتابة فقط إذا اختلف الملخص، فلا يتغير updated_at للمنتجات السليمة
+        Product.objects.filter(pk=pid).exclude(**values).update(
+            **values, updated_at=Now()
+        )
+
+
+class ReviewBuffer:
+    """
+    تجميع التقييمات في الذاكرة وكتابتها كدفعة واحدة عند امتلاء الحجم أو مرور المهلة.
+    ملاحظة: التقييمات غير المكتوبة تضيع إذا توقفت العملية بشكل مفاجئ.
+    """
+
+    def __init__(self, max_size=50, max_delay=2.0):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def _take(self):
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def add(self, entry):
+        batch = None
+        with self._lock:
+            self._pending.append(entry)
+            if len(self._pending) >= self.max_size:
+                batch = self._take()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            save_reviews(batch)
+
+    def flush(self):
+        with self._lock:
+            batch = self._take()
+        if batch:
+            save_reviews(batch)
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            # اتصالات قاعدة البيانات خاصة بكل thread
+            connections.close_all()
+
+
+_buffer = None
+
+
+def _get_buffer():
+    global _buffer
+    if _buffer is None:
+        _buffer = ReviewBuffer(**getattr(settings, "REVIEW_BUFFER", {}))
+        atexit.register(_buffer.flush)
+    return _buffer
+
+
+def submit_review(product_id, customer_id, rating, comment=""):
+    """
+    نقطة الكتابة الوحيدة للتقييمات.
+    REVIEW_WRITE_MODE = "buffered" يجمع التقييمات في دفعات، وإلا تُكتب فوراً.
+    """
+    if not 1 <= rating <= 5:
+        raise ValueError("التقييم يجب أن يكون بين 1 و 5")
+
+    entry = {
+        "product_id": product_id,
+        "customer_id": customer_id,
+        "rating": rating,
+        "comment": comment,
+    }
+    if getattr(settings, "REVIEW_WRITE_MODE", "sync") == "buffered":
+        _get_buffer().add(entry)
+    else:
+        save_reviews([entry])
+    return timezone.now()
+
+
+# ==========================================
+# ترقيم التقييمات بالمؤشر (Cursor Pagination)
+# ==========================================
+
+
+def encode_cursor(review):
+    raw = f"{review.review_date.isoformat()}|{review.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """يعيد (review_date, id) أو يرفع ValueError إذا كان المؤشر غير صالح"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date_part, pk_part = raw.rsplit("|", 1)
+        return datetime.fromisoformat(date_part), int(pk_part)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("مؤشر غير صالح") from e
+
+
+def reviews_page(product_id, cursor=None, limit=None):
+    """
+    صفحة من تقييمات المنتج مرتبة من الأحدث، تبدأ بعد المؤشر إن وُجد.
+    يعيد (قائمة التقييمات، مؤشر الصفحة التالية أو None)
+    """
+    limit = limit or getattr(settings, "REVIEWS_PAGE_SIZE", 10)
+    reviews = (
+        Review.objects.filter(product_id=product_id)
+        .select_related("customer")
+        .order_by("-review_date", "-id")
+    )
+    if cursor:
+        review_date, pk = decode_cursor(cursor)
+        reviews = reviews.filter(
+            Q(review_date__lt=review_date) | Q(review_date=review_date, id__lt=pk)
+        )
+    rows = list(reviews[: limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def serialize_review(review):
+    """نفس شكل التقييم في رد add_review"""
+    return {
+        "customer_name": review.customer.name.strip() or "عميل",
+        "rating": review.rating,
+        "comment": review.comment or "",
+        "review_date": review.review_date.strftime("%d %b, %Y"),
+    }
@@ -0,0 +1,63 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+# هل يُسمح بالقراءة من النسخة المتماثلة في هذا الطلب؟ (تحدده ReplicaRoutingMiddleware)
+_replica_allowed = ContextVar("replica_allowed", default=False)
+# هل كتب هذا الطلب في جداول التطبيقات الموجهة؟
+_wrote = ContextVar("replica_wrote", default=False)
+
+
+def replica_alias():
+    """اسم قاعدة النسخة المتماثلة، أو None إذا لم تكن معرّفة (الرجوع للأساسية)"""
+    alias = getattr(settings, "REPLICA_DATABASE_ALIAS", "replica")
+    return alias if alias in settings.DATABASES else None
+
+
+def _routed(model):
+    return model._meta.app_label in getattr(settings, "REPLICA_ROUTED_APPS", ["store"])
+
+
+class PrimaryReplicaRouter:
+    """
+    الكتابة دائماً على default، والقراءة من النسخة المتماثلة فقط:
+    - لنماذج REPLICA_ROUTED_APPS (الجلسات والمستخدمون تبقى على الأساسية)
+    - داخل طلب GET/HEAD لم يكتب صاحبه مؤخراً (Read-Your-Writes)
+    - خارج أي معاملة مفتوحة على الأساسية
+    """
+
+    def db_for_read(self, model, **hints):
+        if not (_replica_allowed.get() and _routed(model)) or _wrote.get():
+            return "default"
+        if connections["default"].in_atomic_block:
+            return "default"
+        return replica_alias() or "default"
+
+    def db_for_write(self, model, **hints):
+        if _routed(model) or model._meta.app_label == "auth":
+            _wrote.set(True)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # النسختان تحملان نفس البيانات
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+@contextmanager
+def request_routing(allow_replica):
+    """
+    سياق طلب واحد: يحدد هل يُسمح بالقراءة من النسخة المتماثلة،
+    ويعيد دالة تخبر هل كتب الطلب في جداول التطبيقات الموجهة.
+    """
+    allowed_token = _replica_allowed.set(allow_replica)
+    wrote_token = _wrote.set(False)
+    try:
+        yield _wrote.get
+    finally:
+        _wrote.reset(wrote_token)
+        _replica_allowed.reset(allowed_token)
@@ -0,0 +1,87 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cart
+
+CHECKPOINT_KEY = "purge_sessions:checkpoint"
+
+
+def _checkpoint_cache():
+    # الكاش المشترك (ملفات افتراضياً) حتى تستأنف أي عملية من حيث توقفت الأخرى
+    return caches[getattr(settings, "STORE_CACHE", {}).get("ALIAS", "default")]
+
+
+def load_checkpoint():
+    return _checkpoint_cache().get(CHECKPOINT_KEY)
+
+
+def save_checkpoint(last_key, cutoff):
+    _checkpoint_cache().set(
+        CHECKPOINT_KEY, {"last_key": last_key, "cutoff": cutoff}, timeout=None
+    )
+
+
+def clear_checkpoint():
+    _checkpoint_cache().delete(CHECKPOINT_KEY)
+
+
+def purge_batch(last_key, cutoff, batch_size):
+    """
+    حذف دفعة واحدة من الجلسات المنتهية مرتبة بالمفتاح بعد last_key، مع سلالها.
+    شرط الانتهاء يُعاد في الحذف: جلسة جُددت أثناء الدفعة لا تُحذف.
+    يعيد (آخر مفتاح، عدد الجلسات، عدد السلال) أو None عند انتهاء الجلسات.
+    """
+    keys = list(
+        Session.objects.filter(expire_date__lt=cutoff, session_key__gt=last_key)
+        .order_by("session_key")
+        .values_list("session_key", flat=True)[:batch_size]
+    )
+    if not keys:
+        return None
+    with transaction.atomic():
+        carts, _ = Cart.objects.filter(
+            session_id__in=keys, session__expire_date__lt=cutoff
+        ).delete()
+        sessions, _ = Session.objects.filter(
+            session_key__in=keys, expire_date__lt=cutoff
+        ).delete()
+    return keys[-1], sessions, carts
+
+
+def purge_expired(batch_size=1000, sleep=0.1, max_batches=None, stdout=None, report_every=10):
+    """
+    جولة كاملة على الجلسات المنتهية على دفعات صغيرة مع توقف قصير بين الدفعات
+    (حتى لا تُقفل الجداول أمام الزوار). تُحفظ نقطة الاستئناف بعد كل دفعة.
+    يعيد (عدد الجلسات، عدد السلال، انتهت الجولة؟)
+    """
+    checkpoint = load_checkpoint()
+    if checkpoint:
+        last_key, cutoff = checkpoint["last_key"], checkpoint["cutoff"]
+    else:
+        last_key, cutoff = "", timezone.now()
+
+    started = time.monotonic()
+    total_sessions = total_carts = batches = 0
+    finished = False
+    while max_batches is None or batches < max_batches:
+        result = purge_batch(last_key, cutoff, batch_size)
+        if result is None:
+            clear_checkpoint()
+            finished = True
+            break
+        last_key, sessions, carts = result
+        save_checkpoint(last_key, cutoff)
+        total_sessions += sessions
+        total_carts += carts
+        batches += 1
+        if stdout is not None and batches % report_every == 0:
+            rate = total_sessions / (time.monotonic() - started)
+            stdout.write(f"{total_sessions} جلسة، {total_carts} سلة ({rate:.0f} جلسة/ثانية)")
+        if sleep:
+            time.sleep(sleep)
+    return total_sessions, total_carts, finished
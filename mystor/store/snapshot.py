@@ -0,0 +1,269 @@
+"""
+نسخة عمودية (NumPy) من حقول عرض المنتجات لصفحة المنتجات:
+فلترة وترتيب وترقيم بعمليات متجهة، ثم جلب منتجات الصفحة فقط من قاعدة البيانات.
+
+- الملفات: CATALOG_SNAPSHOT["DIR"]/<version>/*.npy والملف CURRENT يشير للنسخة الحالية.
+  تُقرأ بـ mmap (للقراءة فقط) فتتشارك عمال gunicorn نفس صفحات الذاكرة.
+- التحديث: invalidate_catalog يسجل المنتجات المتغيرة في dirty.log ويضيف مهمة
+  خلفية (run_worker) تجلب صفوفها فقط من قاعدة البيانات، ثم تكتب نسخة جديدة كاملة
+  من الأعمدة وتبدل CURRENT بشكل ذري.
+- NumPy اختياري: بدونه (أو عند التعطيل) تعمل صفحة المنتجات من قاعدة البيانات كالمعتاد.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+
+from .jobs import task
+from .models import Product
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+COLUMNS = {
+    "id": "int64",
+    "price": "float64",
+    "category": "int64",
+    "brand": "int64",  # -1 = بدون شركة
+    "stock": "int64",
+    "available": "bool",
+    "rating": "float32",  # متوسط التقييم (0 بدون تقييمات) مثل ترتيب "rating"
+}
+FIELDS = [
+    "id", "price", "category_id", "brand_id", "stock", "is_available",
+    "rating_sum", "rating_count",
+]
+KEEP_VERSIONS = 2
+
+
+def get_config():
+    return {
+        "ENABLED": False,
+        "DIR": os.path.join(settings.BASE_DIR, "snapshot"),
+        "REBUILD_DELAY": 5,  # ثوانٍ لتجميع عدة تعديلات في إعادة بناء واحدة
+        **getattr(settings, "CATALOG_SNAPSHOT", {}),
+    }
+
+
+def enabled():
+    return np is not None and get_config()["ENABLED"]
+
+
+# ==========================================
+# البناء
+# ==========================================
+
+
+def _rows_to_columns(rows):
+    data = {name: [] for name in COLUMNS}
+    for pk, price, category, brand, stock, available, rating_sum, rating_count in rows:
+        data["id"].append(pk)
+        data["price"].append(float(price))
+        data["category"].append(category)
+        data["brand"].append(-1 if brand is None else brand)
+        data["stock"].append(stock)
+        data["available"].append(available)
+        data["rating"].append(rating_sum / rating_count if rating_count else 0.0)
+    return {name: np.array(values, dtype=COLUMNS[name]) for name, values in data.items()}
+
+
+def _write(columns, directory):
+    """كتابة نسخة جديدة ثم تبديل CURRENT ذرياً (os.replace)"""
+    # الاسم بالنانو ثانية حتى يكون الترتيب الأبجدي هو ترتيب الإنشاء
+    version = str(time.time_ns())
+    path = os.path.join(directory, version)
+    os.makedirs(path)
+    for name, values in columns.items():
+        np.save(os.path.join(path, f"{name}.npy"), values)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"rows": len(columns["id"]), "built_at": time.time()}, f)
+
+    tmp = os.path.join(directory, f"CURRENT.{uuid.uuid4().hex}")
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(directory, "CURRENT"))
+
+    # العمال الذين فتحوا نسخة قديمة بـ mmap يحتفظون بها حتى بعد حذف ملفاتها
+    versions = sorted(
+        name for name in os.listdir(directory)
+        if os.path.isdir(os.path.join(directory, name))
+    )
+    for old in versions[:-KEEP_VERSIONS]:
+        if old == version:
+            continue
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return version
+
+
+def build_full():
+    directory = get_config()["DIR"]
+    os.makedirs(directory, exist_ok=True)
+    # إزالة السجل قبل القراءة: أي تعديل بعد هذه اللحظة يُطبق في التحديث التالي
+    _take_dirty(directory)
+    rows = Product.objects.order_by("pk").values_list(*FIELDS).iterator(chunk_size=5000)
+    return _write(_rows_to_columns(rows), directory)
+
+
+def _take_dirty(directory):
+    path = os.path.join(directory, "dirty.log")
+    processing = f"{path}.{uuid.uuid4().hex}"
+    try:
+        os.replace(path, processing)
+    except FileNotFoundError:
+        return set()
+    with open(processing) as f:
+        ids = {int(line) for line in f if line.strip()}
+    os.remove(processing)
+    return ids
+
+
+def apply_changes():
+    """
+    تحديث النسخة بالمنتجات المتغيرة (أو بناء كامل إذا لم توجد نسخة).
+    الاستعلام وحده تدريجي: الأعمدة تُدمج وتُكتب كاملة في نسخة جديدة (O(N) بدون
+    قاعدة البيانات)، لأن العمال يقرؤون الملفات الحالية بـ mmap والكتابة فوقها في
+    مكانها تظهر لهم صفوفاً نصف محدثة.
+    """
+    directory = get_config()["DIR"]
+    current = _load(directory)
+    if current is None:
+        return build_full()
+    dirty = _take_dirty(directory)
+    if not dirty:
+        return current["version"]
+
+    changed = _rows_to_columns(
+        Product.objects.filter(pk__in=dirty).order_by("pk").values_list(*FIELDS)
+    )
+    keep = ~np.isin(current["columns"]["id"], np.fromiter(dirty, dtype="int64"))
+    merged = {
+        name: np.concatenate([current["columns"][name][keep], changed[name]])
+        for name in COLUMNS
+    }
+    order = np.argsort(merged["id"], kind="stable")
+    return _write({name: values[order] for name, values in merged.items()}, directory)
+
+
+@task("catalog_snapshot")
+def rebuild_snapshot(full=False):
+    if not enabled():
+        return
+    if full:
+        build_full()
+    else:
+        apply_changes()
+
+
+def mark_dirty(product_ids):
+    """يُستدعى من invalidate_catalog بعد نهاية المعاملة"""
+    if not product_ids or not enabled():
+        return
+    config = get_config()
+    os.makedirs(config["DIR"], exist_ok=True)
+    # الإضافة بـ O_APPEND لسطور قصيرة آمنة بين العمليات
+    with open(os.path.join(config["DIR"], "dirty.log"), "a") as f:
+        f.write("".join(f"{pid}\n" for pid in product_ids))
+    # مهمة لكل نافذة REBUILD_DELAY تعمل عند نهايتها: ما يُسجل أثناء تنفيذها يقع في
+    # نافذة لاحقة فيضيف مهمة جديدة بدل أن يبتلعه dedup المهمة الجارية
+    delay = max(config["REBUILD_DELAY"], 1)
+    window = int(time.time() // delay)
+    rebuild_snapshot.enqueue(
+        dedup_key=f"catalog_snapshot:{window}",
+        run_at=datetime.fromtimestamp((window + 1) * delay, tz=dt_timezone.utc),
+    )
+
+
+# ==========================================
+# القراءة
+# ==========================================
+
+_loaded = {"version": None, "columns": None}
+_load_lock = threading.Lock()
+
+
+def _load(directory):
+    try:
+        with open(os.path.join(directory, "CURRENT")) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    if _loaded["version"] != version:
+        with _load_lock:
+            if _loaded["version"] != version:
+                path = os.path.join(directory, version)
+                _loaded["columns"] = {
+                    name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                    for name in COLUMNS
+                }
+                _loaded["version"] = version
+    return dict(_loaded)
+
+
+SORTS = {
+    # (المفتاح الأساسي، تنازلي؟) والتعادل دائماً بالأحدث (-id)
+    "price_asc": ("price", False),
+    "price_desc": ("price", True),
+    "rating": ("rating", True),
+}
+
+
+class SnapshotResult:
+    """
+    نتيجة قابلة للترقيم بـ Paginator: العدد من المصفوفات،
+    والشريحة تجلب منتجات الصفحة فقط من قاعدة البيانات بنفس الترتيب.
+    """
+
+    def __init__(self, ids, queryset):
+        self.ids = ids
+        self.queryset = queryset
+
+    def count(self):
+        return len(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        ids = [int(pk) for pk in self.ids[index]]
+        products = self.queryset.in_bulk(ids)
+        # المنتجات المحذوفة بعد آخر تحديث للنسخة تُتجاهل
+        return [products[pk] for pk in ids if pk in products]
+
+
+def query(category_id=None, brand_id=None, in_stock=False, sort="newest", queryset=None):
+    """يعيد SnapshotResult أو None إذا لم تكن النسخة متاحة"""
+    if not enabled():
+        return None
+    current = _load(get_config()["DIR"])
+    if current is None:
+        return None
+    columns = current["columns"]
+
+    mask = np.ones(len(columns["id"]), dtype=bool)
+    if category_id is not None:
+        mask &= columns["category"] == category_id
+    if brand_id is not None:
+        mask &= columns["brand"] == brand_id
+    if in_stock:
+        mask &= columns["available"] & (columns["stock"] > 0)
+    index = np.flatnonzero(mask)
+
+    ids = columns["id"][index]
+    if sort in SORTS:
+        column, descending = SORTS[sort]
+        values = columns[column][index]
+        # lexsort: آخر مفتاح هو الأساسي
+        order = np.lexsort((-ids, -values if descending else values))
+    else:
+        order = np.argsort(-ids, kind="stable")
+    if queryset is None:
+        queryset = Product.objects.all()
+    return SnapshotResult(ids[order], queryset)
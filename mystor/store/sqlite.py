@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# إعدادات SQLite للإنتاج (تُطبق على كل اتصال جديد عند تفعيل SQLITE_TUNING)
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",  # القراءة لا تنتظر الكتابة
+    "synchronous": "NORMAL",  # fsync عند نقاط الحفظ فقط (آمن مع WAL)
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # بالكيلوبايت عندما تكون القيمة سالبة (64MB)
+    "busy_timeout": 5000,  # بالملي ثانية: الانتظار بدلاً من "database is locked"
+    "temp_store": "MEMORY",
+}
+
+
+def get_pragmas():
+    return {**DEFAULT_PRAGMAS, **getattr(settings, "SQLITE_PRAGMAS", {})}
+
+
+def apply_pragmas(cursor, pragmas=None):
+    for name, value in (pragmas or get_pragmas()).items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != "sqlite" or not getattr(settings, "SQLITE_TUNING", False):
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor)
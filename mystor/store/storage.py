@@ -0,0 +1,81 @@
+"""
+تخزين الوسائط بعنوان المحتوى: اسم الملف هو sha256 لمحتواه
+    products/ab/ab12...ef.jpg
+الرفع المكرر لنفس الملف يعيد نفس الاسم بدون كتابة جديدة، ولأن المحتوى لا يتغير
+تحت نفس الاسم يمكن تقديم الملفات بـ Cache-Control: immutable (views.media_file).
+"""
+
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# المجلدات (upload_to) التي تُسمى ملفاتها بالمحتوى، والباقي (variants/) يبقى
+# بأسمائه العادية لأن المهام تبحث عنه بالاسم
+DEFAULT_PREFIXES = ("products/", "customers/")
+CHUNK_SIZE = 64 * 1024
+
+HASHED_NAME_RE = re.compile(r"(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(?:\.[a-z0-9]+)?$")
+
+
+def is_hashed_name(name):
+    return bool(HASHED_NAME_RE.search(name))
+
+
+def file_digest(file, chunk_size=CHUNK_SIZE):
+    """sha256 على أجزاء: الملفات الكبيرة لا تُحمّل كاملة في الذاكرة"""
+    digest = hashlib.sha256()
+    if hasattr(file, "chunks"):
+        for chunk in file.chunks(chunk_size):
+            digest.update(chunk)
+    else:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest):
+    directory = os.path.dirname(name)
+    ext = os.path.splitext(name)[1].lower()
+    if not re.fullmatch(r"\.[a-z0-9]{1,10}", ext):
+        ext = ""
+    hashed = f"{digest[:2]}/{digest}{ext}"
+    return f"{directory}/{hashed}" if directory else hashed
+
+
+@deconstructible(path="store.storage.ContentAddressedStorage")
+class ContentAddressedStorage(FileSystemStorage):
+    def __init__(self, *args, prefixes=DEFAULT_PREFIXES, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prefixes = tuple(prefixes)
+
+    def is_content_addressed(self, name):
+        return name.replace("\\", "/").startswith(self.prefixes)
+
+    def get_available_name(self, name, max_length=None):
+        # الاسم النهائي يُحدد في _save بعد حساب الـ hash
+        if self.is_content_addressed(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if not self.is_content_addressed(name):
+            return super()._save(name, content)
+
+        if hasattr(content, "seek"):
+            content.seek(0)
+        target = hashed_name(name, file_digest(content))
+        if self.exists(target):
+            return target
+        if hasattr(content, "seek"):
+            content.seek(0)
+
+        # الكتابة باسم مؤقت ثم إعادة التسمية: رفعان متزامنان لنفس الملف لا يتعارضان
+        # ولا يرى أحد ملفاً نصف مكتوب
+        temp = f"{os.path.dirname(target)}/.tmp-{uuid.uuid4().hex}"
+        temp = super()._save(temp, content)
+        os.replace(self.path(temp), self.path(target))
+        return target
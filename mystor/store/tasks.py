@@ -0,0 +1,135 @@
+"""المهام الخلفية المسجلة في طابور store/jobs.py (يشغلها manage.py run_worker)"""
+
+import csv
+import io
+import os
+import re
+import secrets
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import feeds
+from .jobs import task
+from .models import Customer, Order, Product
+from .reviews import recompute_ratings
+
+# أحجام الصور المصغرة المولدة لصور المنتجات وصور العملاء (أطول ضلع بالبكسل)
+DEFAULT_IMAGE_VARIANTS = {"thumb": 150, "card": 400, "large": 800}
+
+
+def image_variants():
+    return getattr(settings, "IMAGE_VARIANTS", DEFAULT_IMAGE_VARIANTS)
+
+
+def variant_name(name, label):
+    base, _ = os.path.splitext(name)
+    return f"variants/{base}_{label}.webp"
+
+
+@task("image_variants")
+def generate_image_variants(model, pk, field):
+    obj = apps.get_model("store", model).objects.filter(pk=pk).first()
+    image = getattr(obj, field, None) if obj else None
+    if not image:
+        return
+
+    missing = {
+        label: size
+        for label, size in image_variants().items()
+        if not image.storage.exists(variant_name(image.name, label))
+    }
+    if not missing:
+        return
+
+    with image.open("rb"), Image.open(image) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ("RGB", "RGBA"):
+            source = source.convert("RGBA")
+        for label, size in missing.items():
+            variant = source.copy()
+            variant.thumbnail((size, size))
+            buffer = io.BytesIO()
+            variant.save(buffer, "WEBP", quality=82)
+            image.storage.save(
+                variant_name(image.name, label), ContentFile(buffer.getvalue())
+            )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Customer)
+def enqueue_image_variants(sender, instance, created=False, raw=False, **kwargs):
+    field = "image" if sender is Product else "avatar"
+    if raw or field in instance.get_deferred_fields():
+        return
+    file = getattr(instance, field)
+    loaded = getattr(instance, f"_loaded_{field}", None)
+    if not file or not created and file.name == loaded:
+        # حفظ بدون تغيير الصورة (السعر، المخزون...) لا يحتاج صوراً مصغرة جديدة
+        return
+    setattr(instance, f"_loaded_{field}", file.name)
+    model = sender._meta.model_name
+    transaction.on_commit(
+        lambda: generate_image_variants.enqueue(
+            model=model,
+            pk=instance.pk,
+            field=field,
+            dedup_key=f"image_variants:{model}:{instance.pk}",
+        )
+    )
+
+
+@task("recompute_ratings")
+def recompute_ratings_task(product_ids=None):
+    recompute_ratings(product_ids)
+
+
+# ملفات التصدير فيها بيانات العملاء: تُحفظ في EXPORTS_DIR خارج MEDIA_ROOT ولا تُحمّل
+# إلا من لوحة التحكم، وباسم عشوائي لا يمكن تخمينه
+EXPORT_NAME_RE = re.compile(r"orders-\d{8}-\d{6}-[\w-]{22}\.csv")
+
+
+def exports_storage():
+    return FileSystemStorage(location=settings.EXPORTS_DIR, base_url=None)
+
+
+def export_name():
+    return f"orders-{timezone.now():%Y%m%d-%H%M%S}-{secrets.token_urlsafe(16)}.csv"
+
+
+@task("export_orders")
+def export_orders(order_ids=None, name=None):
+    """تصدير الطلبات (أو المحددة منها) إلى ملف CSV في EXPORTS_DIR"""
+    orders = Order.objects.select_related("customer").order_by("pk")
+    if order_ids is not None:
+        orders = orders.filter(pk__in=order_ids)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["id", "customer", "order_date", "status", "total"])
+    for order in orders.iterator(chunk_size=1000):
+        writer.writerow(
+            [
+                order.pk,
+                order.customer.name if order.customer else "",
+                order.order_date.isoformat(),
+                order.status,
+                order.total,
+            ]
+        )
+    # utf-8-sig حتى يفتح Excel الأسماء العربية بشكل صحيح
+    return exports_storage().save(
+        name or export_name(), ContentFile(buffer.getvalue().encode("utf-8-sig"))
+    )
+
+
+@task("generate_feeds")
+def generate_feeds(force=False):
+    feeds.generate(force=force)
@@ -1,3 +1,1544 @@
-from django.test import TestCase
+import base64
+import gzip
+import io
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    analytics,
+    attributes,
+    compare,
+    feeds,
+    metrics,
+    recently_viewed,
+    reservations,
+    session_purge,
+    snapshot,
+    views,
+    warmup,
+)
+from .bulk import bulk_update_products
+from .cache import TwoTierCache, catalog_cache
+from .jobs import claim, enqueue, heartbeat, requeue_stale, run_job
+from .loaders import load_product_details
+from .models import (
+    Attribute,
+    Brand,
+    Cart,
+    Category,
+    Customer,
+    InventoryMovement,
+    Job,
+    Order,
+    OrderItem,
+    Product,
+    ProductSalesRollup,
+    ProfileRecord,
+    Review,
+    SalesRollup,
+    Specification,
+    StockReservation,
+    Wishlist,
+)
+from .resilience import config as resilience_config
+from .throttling import (
+    CacheStore,
+    FixedWindow,
+    LocalMemoryStore,
+    SlidingWindow,
+    TokenBucket,
+    get_client_ip,
+)
+from .reviews import (
+    ReviewBuffer,
+    recompute_ratings,
+    reviews_page,
+    save_reviews,
+    submit_review,
+)
+
+# الاختبارات لا تكتب في مجلد الكاش المشترك الحقيقي (BASE_DIR/cache)
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "shared": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tests-shared",
+    },
+}
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "shared": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    }
+)
+class ProductDetailsLoaderTests(TestCase):
+    def setUp(self):
+        catalog_cache.local.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="لابتوبات")
+        other_category = Category.objects.create(name="هواتف")
+        brand = Brand.objects.create(name="Lenovo")
+        cls.product = Product.objects.create(
+            name="ThinkPad", price=1000, description="-", category=category, brand=brand
+        )
+        for i in range(6):
+            Product.objects.create(
+                name=f"Laptop {i}", price=500, description="-", category=category
+            )
+        Product.objects.create(
+            name="Phone", price=300, description="-", category=other_category
+        )
+        Specification.objects.create(product=cls.product, name="RAM", value="16 GB")
+        Specification.objects.create(product=cls.product, name="CPU", value="i7")
+
+        users = [
+            User.objects.create_user(f"user{i}@example.com", password="pw")
+            for i in range(3)
+        ]
+        save_reviews(
+            [
+                {
+                    "product_id": cls.product.id,
+                    "customer_id": user.customer_profile.id,
+                    "rating": rating,
+                }
+                for user, rating in zip(users, [5, 4, 4])
+            ]
+        )
+
+    def test_loader_query_budget(self):
+        with self.assertNumQueries(3):
+            data = load_product_details(self.product.id)
+
+        self.assertEqual(data["product"]["name"], "ThinkPad")
+        self.assertEqual(data["product"]["brand"]["name"], "Lenovo")
+        self.assertEqual(len(data["specifications"]), 2)
+        self.assertEqual(len(data["reviews"]), 3)
+        self.assertEqual(data["review_summary"]["num_reviews"], 3)
+        self.assertEqual(len(data["related_products"]), 4)
+        self.assertNotIn(
+            self.product.id, [p["id"] for p in data["related_products"]]
+        )
+
+    def test_loader_missing_product(self):
+        self.assertIsNone(load_product_details(self.product.id + 1000))
+
+    def test_product_details_view(self):
+        response = self.client.get(reverse("product_details", args=[self.product.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "16 GB")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AdminChangelistTests(TestCase):
+    """عدد استعلامات قوائم لوحة التحكم ثابت مهما زاد عدد الصفوف"""
+
+    CHANGELISTS = [
+        "admin:store_product_changelist",
+        "admin:store_order_changelist",
+        "admin:store_review_changelist",
+        "admin:store_inventorymovement_changelist",
+        "admin:store_specification_changelist",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        cls.category = Category.objects.create(name="لابتوبات")
+        cls.brand = Brand.objects.create(name="Lenovo")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, start, count):
+        for i in range(start, start + count):
+            product = Product.objects.create(
+                name=f"Laptop {i}",
+                price=100,
+                description="-",
+                category=self.category,
+                brand=self.brand,
+                sku=f"sku-{i}",
+            )
+            customer = Customer.objects.create(name=f"عميل {i}")
+            Order.objects.create(customer=customer)
+            Review.objects.create(product=product, customer=customer, rating=4)
+            InventoryMovement.objects.create(product=product, quantity=1, movement_type="ADD")
+            Specification.objects.create(product=product, name="RAM", value="16 GB")
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_changelists_query_budget(self):
+        self.add_rows(0, 3)
+        for name in self.CHANGELISTS:
+            # الطلب الأول يملأ كاش الكتالوج (قائمة الأصناف) ولا يُحتسب
+            self.count_queries(reverse(name))
+        before = {name: self.count_queries(reverse(name)) for name in self.CHANGELISTS}
+        self.add_rows(3, 20)
+        for name in self.CHANGELISTS:
+            with self.subTest(name):
+                self.assertEqual(self.count_queries(reverse(name)), before[name])
+
+    def test_review_search(self):
+        self.add_rows(0, 2)
+        response = self.client.get(
+            reverse("admin:store_review_changelist"), {"q": "Laptop 1"}
+        )
+        self.assertContains(response, "Laptop 1")
+
+    def test_order_search(self):
+        self.add_rows(0, 2)
+        order = Order.objects.get(customer__name="عميل 1")
+        url = reverse("admin:store_order_changelist")
+        for term in (str(order.pk), "عميل 1", "#1 abc"):
+            with self.subTest(term):
+                self.assertEqual(self.client.get(url, {"q": term}).status_code, 200)
+        response = self.client.get(url, {"q": str(order.pk)})
+        self.assertEqual([o.pk for o in response.context["cl"].result_list], [order.pk])
+
+    def test_order_export_is_private(self):
+        self.add_rows(0, 2)
+        with tempfile.TemporaryDirectory() as exports_dir, self.settings(
+            EXPORTS_DIR=exports_dir
+        ):
+            self.client.post(
+                reverse("admin:store_order_changelist"),
+                {
+                    "action": "export_csv",
+                    "_selected_action": Order.objects.values_list("pk", flat=True),
+                },
+            )
+            job = Job.objects.get(task="export_orders")
+            name = job.payload["name"]
+            url = reverse("admin:store_order_export", args=[name])
+            self.assertEqual(self.client.get(url).status_code, 404)  # قبل تنفيذ المهمة
+            self.assertEqual(run_job(claim("test")[0]), "done")
+
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("عميل 1".encode(), b"".join(response.streaming_content))
+            bad = reverse("admin:store_order_export", args=["..%2Fdb.sqlite3"])
+            self.assertEqual(self.client.get(bad).status_code, 404)
+            self.client.logout()
+            self.assertNotEqual(self.client.get(url).status_code, 200)
+
+
+@override_settings(
+    CACHES=TEST_CACHES,
+    WISHLIST_NOTIFICATIONS={"CHUNK_SIZE": 2, "DIGEST_DELAY": 1},
+)
+class WishlistNotificationTests(TestCase):
+    """تغييرات عدة منتجات تصل لكل مستخدم في رسالة واحدة"""
+
+    def run_jobs(self):
+        while True:
+            # مهمة الملخص مجدولة لنهاية نافذة التجميع
+            Job.objects.filter(status="QUEUED").update(run_at=timezone.now())
+            jobs = claim("test", limit=10)
+            if not jobs:
+                break
+            for job in jobs:
+                self.assertEqual(run_job(job), "done")
+
+    def test_digest_per_user(self):
+        category = Category.objects.create(name="لابتوبات")
+        laptop = Product.objects.create(
+            name="ThinkPad", price=100, description="-", category=category, stock=5
+        )
+        phone = Product.objects.create(
+            name="Pixel", price=50, description="-", category=category, stock=0
+        )
+        for i in range(5):
+            user = User.objects.create_user(f"user{i}", f"user{i}@example.com", "pw")
+            Wishlist.objects.create(user=user, product=laptop)
+            Wishlist.objects.create(user=user, product=phone)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            laptop = Product.objects.get(pk=laptop.pk)
+            for price in (80, 70, 90):
+                laptop.price = price
+                laptop.save()
+            bulk_update_products(Product.objects.filter(pk=phone.pk), "stock_delta", 3)
+        self.run_jobs()
+
+        self.assertEqual(len(mail.outbox), 5)
+        body = mail.outbox[0].body
+        self.assertIn("ThinkPad", body)
+        self.assertIn("100.00 إلى 90.00", body)
+        self.assertIn("Pixel", body)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StockReservationTests(TestCase):
+    def test_reserve_release_and_expiry(self):
+        category = Category.objects.create(name="لابتوبات")
+        product = Product.objects.create(
+            name="ThinkPad", price=100, description="-", category=category, stock=3
+        )
+        reservations.reserve(product.pk, "session-a", 2)
+        with self.assertRaises(reservations.InsufficientStock):
+            reservations.reserve(product.pk, "session-b", 2)
+        reservations.reserve(product.pk, "session-b", 1)
+        product.refresh_from_db()
+        self.assertEqual((product.reserved, product.available_stock), (3, 0))
+
+        # حفظ نسخة محملة قبل الحجز لا يلغيه
+        stale = Product.objects.get(pk=product.pk)
+        reservations.release(product.pk, "session-b")
+        reservations.reserve(product.pk, "session-c", 1)
+        stale.save()
+        product.refresh_from_db()
+        self.assertEqual(product.reserved, 3)
+
+        StockReservation.objects.filter(cart_id="session-a").update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(reservations.release_expired(), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.reserved, 1)
+
+    @override_settings(STOCK_RESERVATIONS={"ENABLED": True})
+    def test_cart_reservations_survive_login(self):
+        category = Category.objects.create(name="لابتوبات")
+        product = Product.objects.create(
+            name="ThinkPad", price=100, description="-", category=category, stock=2
+        )
+        User.objects.create_user("buyer", "buyer@example.com", "pw")
+        url = reverse("product_details", args=[product.pk])
+
+        def post(name, data):
+            return self.client.post(reverse(name), data, content_type="application/json")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post("add_to_cart", {"product_id": product.pk, "quantity": 2})
+        caches["shared"].clear()
+        # كل المخزون محجوز: صفحة المنتج تعرضه غير متوفر
+        self.assertContains(self.client.get(url), "غير متوفر حاليًا")
+
+        old_key = self.client.session.session_key
+        post("login_ajax", {"email": "buyer", "password": "pw"})
+        self.assertNotEqual(self.client.session.session_key, old_key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post("remove_from_cart", {"product_id": product.pk})
+        product.refresh_from_db()
+        self.assertEqual(product.reserved, 0)
+        self.assertFalse(StockReservation.objects.exists())
+        caches["shared"].clear()
+        self.assertContains(self.client.get(url), "متوفر في المخزن")
+
+        post("add_to_cart", {"product_id": product.pk, "quantity": 1})
+        self.client.get(reverse("logout"))
+        product.refresh_from_db()
+        self.assertEqual(product.reserved, 0)
+
+    def test_give_back_never_goes_negative(self):
+        category = Category.objects.create(name="لابتوبات")
+        product = Product.objects.create(
+            name="ThinkPad", price=100, description="-", category=category, stock=3
+        )
+        reservations.reserve(product.pk, "cart-a", 1)
+        Product.objects.filter(pk=product.pk).update(reserved=0)  # مثلاً بعد reconcile
+        self.assertEqual(reservations.release(product.pk, "cart-a"), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.reserved, 0)
+
+    def test_save_after_delete_and_copy(self):
+        category = Category.objects.create(name="لابتوبات")
+        product = Product.objects.create(
+            name="ThinkPad", price=100, description="-", category=category, stock=3
+        )
+        Product.objects.filter(pk=product.pk).delete()
+        product.save()  # لم يعد الصف موجوداً: INSERT بدل DatabaseError
+        self.assertTrue(Product.objects.filter(pk=product.pk).exists())
+
+        product.pk = None
+        product.name = "ThinkPad 2"
+        product.save()
+        self.assertEqual(Product.objects.count(), 2)
+
+        Product.objects.filter(pk=product.pk).update(reserved=2)
+        product.reserved = 0
+        product.save(update_fields=["reserved"])  # الكتابة الصريحة مسموحة
+        product.refresh_from_db()
+        self.assertEqual(product.reserved, 0)
+
+    @override_settings(STOCK_RESERVATIONS={"ENABLED": True})
+    def test_cart_drops_items_whose_reservation_expired(self):
+        category = Category.objects.create(name="لابتوبات")
+        kept = Product.objects.create(
+            name="ThinkPad", price=100, description="-", category=category, stock=2
+        )
+        sold_out = Product.objects.create(
+            name="Pixel", price=100, description="-", category=category, stock=1
+        )
+
+        def add(product):
+            self.client.post(
+                reverse("add_to_cart"),
+                {"product_id": product.pk, "quantity": 1},
+                content_type="application/json",
+            )
+
+        add(kept)
+        add(sold_out)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(reservations.release_expired(), 2)
+        # مشترٍ آخر أخذ آخر قطعة بعد انتهاء الحجز
+        reservations.reserve(sold_out.pk, "other-cart", 1)
+
+        response = self.client.get(reverse("checkout"))
+        self.assertContains(response, "حُذفت من السلة")
+        self.assertEqual(
+            [item["product"] for item in response.context["cart_items"]], [kept]
+        )
+        self.assertEqual(self.client.session["cart"], {str(kept.pk): 1})
+        self.assertEqual(
+            list(
+                StockReservation.objects.order_by("product_id").values_list(
+                    "product_id", "cart_id"
+                )
+            ),
+            [(kept.pk, self.client.session["cart_id"]), (sold_out.pk, "other-cart")],
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ResilienceMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="لابتوبات")
+        cls.product = Product.objects.create(
+            name="ThinkPad", price=100, description="-", category=category, stock=3
+        )
+
+    def setUp(self):
+        caches["shared"].clear()
+        catalog_cache.local.clear()
+
+    def test_cached_product_page_sets_visitor_cookie(self):
+        url = reverse("product_details", args=[self.product.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        response = Client().get(url)
+        self.assertEqual(response["X-Page-Cache"], "HIT")
+        self.assertIn("recently_viewed", response.cookies)
+
+    def test_stale_product_page_sets_visitor_cookie(self):
+        url = reverse("product_details", args=[self.product.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        with mock.patch.dict(resilience_config, FRESH_SECONDS=0), mock.patch(
+            "store.middleware.threading.Thread"
+        ) as thread, mock.patch("store.recently_viewed.view_counter.add") as add:
+            response = Client().get(url)
+        self.assertEqual(response["X-Page-Cache"], "STALE")
+        self.assertIn("recently_viewed", response.cookies)
+        add.assert_called_once_with(self.product.id)
+        # التحديث في الخلفية بطلب مستقل عن طلب الزائر
+        refresh_request = thread.call_args.kwargs["args"][0]
+        self.assertTrue(refresh_request.store_background_render)
+        self.assertEqual(refresh_request.get_full_path(), url)
+        self.assertNotIn("recently_viewed", refresh_request.COOKIES)
+
+    def test_warmup_render_skips_views_and_sessions(self):
+        url = reverse("product_details", args=[self.product.id])
+        with mock.patch("store.recently_viewed.view_counter.add") as add:
+            warmup._render_page(warmup._page_handler(), url)
+        add.assert_not_called()
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(Client().get(url)["X-Page-Cache"], "HIT")
+
+    def test_warmup_leaves_no_threads_behind(self):
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            time.sleep(0.3)
+
+        plan = [("pages", f"slow-{i}", slow) for i in range(4)]
+        with mock.patch("store.warmup.build_plan", return_value=plan):
+            report = warmup.warm(budget=0.05, workers=1)
+        self.assertTrue(started.is_set())
+        self.assertTrue(report["budget_exhausted"])
+        self.assertFalse([t for t in threading.enumerate() if t.name.startswith("warm")])
+
+    def test_degraded_mode_rejects_writes_only(self):
+        with mock.patch.dict(resilience_config, FORCE_MODE="degraded"):
+            self.assertEqual(self.client.get(reverse("about")).status_code, 200)
+            response = self.client.post(
+                reverse("add_to_cart"),
+                {"product_id": self.product.id},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 503)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CatalogSnapshotTests(TestCase):
+    """صفحة المنتجات من النسخة العمودية تعطي نفس نتائج وترقيم الاستعلام العادي"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [Category.objects.create(name=n) for n in ("لابتوبات", "هواتف")]
+        cls.products = [
+            Product.objects.create(
+                name=f"منتج {i}",
+                price=[300, 100, 200, 100, 300, 150, 100][i],
+                description="-",
+                category=cls.categories[i % 2],
+            )
+            for i in range(7)
+        ]
+        customer = Customer.objects.create(name="عميل")
+        save_reviews(
+            [
+                {"product_id": cls.products[i].id, "customer_id": customer.id, "rating": r}
+                for i, r in [(1, 5), (2, 3), (4, 5), (5, 4)]
+            ]
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.config = {"ENABLED": True, "DIR": directory.name}
+
+    def page_ids(self, url, params, enabled):
+        caches["default"].clear()
+        caches["shared"].clear()
+        with self.settings(CATALOG_SNAPSHOT={**self.config, "ENABLED": enabled}):
+            response = self.client.get(url, params)
+        return [p.id for p in response.context["products"]]
+
+    def test_filter_sort_and_pages_match_orm(self):
+        with self.settings(CATALOG_SNAPSHOT=self.config):
+            snapshot.build_full()
+        urls = [reverse("products"), reverse("products", args=[self.categories[0].id])]
+        for url in urls:
+            for sort in ("newest", "price_asc", "price_desc", "rating"):
+                for page in (1, 2, 3):
+                    params = {"sort": sort, "page": page}
+                    with self.subTest(url=url, **params):
+                        self.assertEqual(
+                            self.page_ids(url, params, enabled=True),
+                            self.page_ids(url, params, enabled=False),
+                        )
+
+    def test_changes_during_rebuild_are_scheduled(self):
+        product = self.products[0]
+        with self.settings(CATALOG_SNAPSHOT={**self.config, "REBUILD_DELAY": 5}):
+            snapshot.build_full()
+            now = time.time()
+            with mock.patch("store.snapshot.time.time", return_value=now):
+                snapshot.mark_dirty([product.id])
+            # المهمة تعمل، وتعديل جديد يصل أثناءها
+            Job.objects.filter(task="catalog_snapshot").update(status="RUNNING")
+            Product.objects.filter(pk=product.id).update(price=50)
+            with mock.patch("store.snapshot.time.time", return_value=now + 5):
+                snapshot.mark_dirty([product.id])
+            self.assertEqual(
+                Job.objects.filter(task="catalog_snapshot", status="QUEUED").count(), 1
+            )
+            snapshot.apply_changes()
+            result = snapshot.query(sort="price_asc")
+        self.assertEqual(result[:1][0].id, product.id)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="لابتوبات")
+        cls.products = [
+            Product.objects.create(
+                name=f"منتج {i}", price=100, description="-", category=category, stock=1
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        feeds_settings = self.settings(
+            FEEDS={"DIR": directory.name, "SHARD_SIZE": 2, "SITE_URL": "http://shop.test"}
+        )
+        feeds_settings.enable()
+        self.addCleanup(feeds_settings.disable)
+
+    def test_incremental_generation(self):
+        self.assertEqual(feeds.generate(), (3, 3))
+        self.assertEqual(feeds.generate(), (0, 3))
+
+        # update() بدون save: التقييمات تضبط updated_at، والحجز يغير التوفر
+        customer = Customer.objects.create(name="عميل")
+        save_reviews(
+            [{"product_id": self.products[0].id, "customer_id": customer.id, "rating": 5}]
+        )
+        reservations.reserve(self.products[4].id, "session", 1)
+        self.assertEqual(feeds.generate(), (2, 3))
+
+        with open(feeds.file_path("feed.csv.gz"), "rb") as f:
+            rows = gzip.decompress(f.read()).decode()
+        self.assertIn(f"{self.products[4].id},منتج 4,100.00 USD,out of stock", rows)
+        self.assertIn(f"{self.products[3].id},منتج 3,100.00 USD,in stock", rows)
+
+    def test_feed_file_etag(self):
+        feeds.generate()
+        url = reverse("feed_file", args=["feed.xml.gz"])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_file_path_rejects_unsafe_names(self):
+        feeds.generate()
+        self.assertIsNotNone(feeds.file_path("sitemap.xml"))
+        unsafe = ["manifest.json", "../db.sqlite3", ".hidden", "parts/feed-0.xml.gz"]
+        for name in unsafe:
+            with self.subTest(name):
+                self.assertIsNone(feeds.file_path(name))
+        self.assertEqual(
+            self.client.get(reverse("feed_file", args=["manifest.json"])).status_code, 404
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BulkEditTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        category = Category.objects.create(name="لابتوبات")
+        cls.products = [
+            Product.objects.create(
+                name=f"منتج {i}", price=100, description="-", category=category, stock=stock
+            )
+            for i, stock in enumerate([5, 3, 1])
+        ]
+        # 3 في المخزون لكن 2 منها محجوزة في سلة
+        Product.objects.filter(pk=cls.products[1].pk).update(reserved=2)
+
+    def test_admin_action_reports_skipped(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            reverse("admin:store_product_changelist"),
+            {
+                "action": "bulk_edit",
+                "_selected_action": [p.pk for p in self.products],
+                "apply": "1",
+                "operation": "stock_delta",
+                "value": "-2",
+            },
+            follow=True,
+        )
+        messages = [str(m) for m in response.context["messages"]]
+        self.assertIn("تم تعديل 1 منتج", messages)
+        self.assertIn(f"{self.products[1].pk}, {self.products[2].pk}", messages[1])
+        stock = dict(Product.objects.values_list("pk", "stock"))
+        self.assertEqual([stock[p.pk] for p in self.products], [3, 3, 1])
+        self.assertEqual(InventoryMovement.objects.count(), 1)
+
+    def test_bulk_products_command(self):
+        ids = ",".join(str(p.pk) for p in self.products[:2])
+        out = io.StringIO()
+        call_command("bulk_products", "--ids", ids, "--price-percent", "-10", stdout=out)
+        prices = dict(Product.objects.values_list("pk", "price"))
+        self.assertEqual([str(prices[p.pk]) for p in self.products], ["90.00", "90.00", "100.00"])
+
+        call_command("bulk_products", "--ids", ids, "--stock-delta", "-4", stdout=out)
+        self.assertIn("تم تخطي 1 منتج", out.getvalue())
+        self.assertIn(str(self.products[1].pk), out.getvalue().splitlines()[-2])
+
+
+class MediaFileTests(SimpleTestCase):
+    def test_cache_headers_by_prefix(self):
+        with tempfile.TemporaryDirectory() as media_root, self.settings(
+            MEDIA_ROOT=media_root
+        ):
+            digest = "ab" + "0" * 62
+            names = {
+                f"products/ab/{digest}.jpg": "public, max-age=31536000, immutable",
+                "variants/products/old_thumb.webp": "public, max-age=3600",
+                "exports/orders.csv": "private, no-cache",
+            }
+            for name, cache_control in names.items():
+                os.makedirs(os.path.join(media_root, os.path.dirname(name)), exist_ok=True)
+                with open(os.path.join(media_root, name), "wb") as f:
+                    f.write(b"-")
+                with self.subTest(name):
+                    response = views.media_file(RequestFactory().get("/"), name)
+                    self.assertEqual(response["Cache-Control"], cache_control)
+
+
+@override_settings(
+    CACHES=TEST_CACHES,
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class LoginThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user("buyer", "buyer@example.com", "pw")
+
+    def login(self, password):
+        return self.client.post(
+            reverse("login_ajax"),
+            {"email": "buyer@example.com", "password": password},
+            content_type="application/json",
+        )
+
+    def test_token_bucket_refills(self):
+        store, bucket = LocalMemoryStore(), TokenBucket(2, 0.5)
+        with mock.patch("store.throttling.time.time", return_value=1000.0):
+            self.assertEqual(bucket.hit(store, "k"), (True, 0))
+            self.assertEqual(bucket.hit(store, "k"), (True, 0))
+            self.assertEqual(bucket.hit(store, "k"), (False, 2.0))
+        with mock.patch("store.throttling.time.time", return_value=1002.0):
+            self.assertEqual(bucket.hit(store, "k"), (True, 0))
+
+    def test_cache_store_refuses_token_bucket(self):
+        with mock.patch.object(CacheStore, "ATOMIC_BACKENDS", (LocMemCache,)):
+            store = CacheStore()
+        with self.assertRaises(ImproperlyConfigured):
+            TokenBucket(5, 1).hit(store, "k")
+
+    def test_account_lockout(self):
+        for _ in range(5):
+            self.assertEqual(self.login("wrong").json()["status"], "error")
+        response = self.login("wrong")
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(0 < int(response["Retry-After"]) <= 60)
+        # حتى كلمة المرور الصحيحة تُرفض حتى يتجدد رمز
+        self.assertEqual(self.login("pw").status_code, 429)
+
+    def test_successful_login_resets_account(self):
+        for _ in range(4):
+            self.login("wrong")
+        self.assertEqual(self.login("pw").json()["status"], "success")
+        self.client.logout()
+        for _ in range(5):
+            self.assertEqual(self.login("wrong").status_code, 200)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RateLimitTests(TestCase):
+    def test_fixed_window_rollover(self):
+        store, policy = LocalMemoryStore(), FixedWindow(2, 60)
+        with mock.patch("store.throttling.time.time", return_value=6010.0):
+            self.assertTrue(policy.hit(store, "k")[0])
+            self.assertTrue(policy.hit(store, "k")[0])
+            self.assertEqual(policy.hit(store, "k"), (False, 50.0))
+        with mock.patch("store.throttling.time.time", return_value=6060.0):
+            self.assertTrue(policy.hit(store, "k")[0])
+
+    def test_sliding_window_weighs_previous_window(self):
+        store, policy = LocalMemoryStore(), SlidingWindow(4, 60)
+        with mock.patch("store.throttling.time.time", return_value=6000.0):
+            for _ in range(4):
+                self.assertTrue(policy.hit(store, "k")[0])
+        # بعد ربع النافذة التالية ما زال 75% من النافذة السابقة يُحتسب: 3 + 1
+        with mock.patch("store.throttling.time.time", return_value=6075.0):
+            self.assertTrue(policy.hit(store, "k")[0])
+            self.assertEqual(policy.hit(store, "k"), (False, 45.0))
+
+    def test_file_cache_refused_for_counters(self):
+        file_cache = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache"}
+        with tempfile.TemporaryDirectory() as location, self.settings(
+            CACHES={**TEST_CACHES, "shared": {**file_cache, "LOCATION": location}}
+        ):
+            with self.assertRaises(ImproperlyConfigured):
+                CacheStore()
+
+    @override_settings(
+        RATE_LIMITS={"add_review": {"policy": "fixed_window", "limit": 2, "window": 60}}
+    )
+    def test_middleware_returns_429(self):
+        client = Client()
+        url = reverse("add_review", args=[1])
+        for _ in range(2):
+            self.assertNotEqual(client.post(url).status_code, 429)
+        response = client.post(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(0 < int(response["Retry-After"]) <= 60)
+        # القراءة لا تُحد، وعنوان آخر له عداده
+        self.assertNotEqual(client.get(url).status_code, 429)
+        self.assertNotEqual(client.post(url, REMOTE_ADDR="10.0.0.9").status_code, 429)
+
+    def test_client_ip_behind_proxies(self):
+        request = RequestFactory().get(
+            "/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="6.6.6.6, 1.2.3.4, 10.0.0.2"
+        )
+        self.assertEqual(get_client_ip(request), "10.0.0.1")
+        with self.settings(THROTTLE_PROXY_COUNT=1):
+            self.assertEqual(get_client_ip(request), "10.0.0.2")
+        with self.settings(THROTTLE_PROXY_COUNT=2):
+            # القيمة الأولى يضعها العميل نفسه فلا يُوثق بها
+            self.assertEqual(get_client_ip(request), "1.2.3.4")
+        with self.settings(THROTTLE_PROXY_COUNT=5):
+            self.assertEqual(get_client_ip(request), "10.0.0.1")
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(METRICS_DIR=self.tmp.name, METRICS_TOKEN="secret")
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_first_sample_is_kept(self):
+        registry = metrics.MetricsRegistry(buckets=(0.1, 1.0), flush_interval=3600)
+        registry.inc("store_orders_placed_total")
+        registry.observe("store_request_duration_seconds", 0.5, view="home")
+        data = registry.snapshot()
+        self.assertIn(["store_orders_placed_total", [], 1], data["counters"])
+        self.assertEqual(
+            data["histograms"],
+            [["store_request_duration_seconds", [("view", "home")], [0, 1, 0, 0.5]]],
+        )
+
+    def test_prometheus_format(self):
+        with open(os.path.join(self.tmp.name, "metrics-1-1.json"), "w") as f:
+            json.dump(
+                {
+                    "buckets": [0.1, 1.0],
+                    "counters": [["store_requests_total", [["view", "home"]], 3]],
+                    "histograms": [
+                        ["store_request_duration_seconds", [["view", "home"]], [1, 1, 1, 2.55]]
+                    ],
+                },
+                f,
+            )
+        with mock.patch.object(metrics.registry, "snapshot", return_value={
+            "buckets": [0.1, 1.0], "counters": [], "histograms": []
+        }):
+            text = metrics.render_prometheus()
+        lines = text.splitlines()
+        self.assertIn("# TYPE store_requests_total counter", lines)
+        self.assertIn('store_requests_total{view="home"} 3', lines)
+        self.assertIn("# TYPE store_request_duration_seconds histogram", lines)
+        # الدلاء تراكمية و+Inf يساوي العدد الكلي
+        self.assertIn('store_request_duration_seconds_bucket{view="home",le="0.1"} 1', lines)
+        self.assertIn('store_request_duration_seconds_bucket{view="home",le="1"} 2', lines)
+        self.assertIn('store_request_duration_seconds_bucket{view="home",le="+Inf"} 3', lines)
+        self.assertIn('store_request_duration_seconds_sum{view="home"} 2.55', lines)
+        self.assertIn('store_request_duration_seconds_count{view="home"} 3', lines)
+
+    def test_endpoint_requires_token_or_staff(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(
+            self.client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 403
+        )
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('view="metrics"', response.content.decode())
+
+        User.objects.create_user("staff", password="x", is_staff=True)
+        self.client.force_login(User.objects.get(username="staff"))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class JobQueueTests(TestCase):
+    def stale_job(self, attempts):
+        job = enqueue("recompute_ratings", {"product_ids": []}, dedup_key="ratings")
+        Job.objects.filter(pk=job.pk).update(
+            status="RUNNING",
+            attempts=attempts,
+            locked_by="dead-worker",
+            locked_at=timezone.now() - timedelta(hours=1),
+        )
+        return job
+
+    def test_requeue_stale_respects_max_attempts(self):
+        job = self.stale_job(attempts=1)
+        self.assertEqual(requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "QUEUED")
+        self.assertEqual(job.locked_by, "")
+        self.assertGreater(job.run_at, timezone.now())
+
+        Job.objects.filter(pk=job.pk).update(
+            status="RUNNING", attempts=job.max_attempts,
+            locked_at=timezone.now() - timedelta(hours=1),
+        )
+        requeue_stale()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "FAILED")
+        self.assertIsNotNone(job.finished_at)
+
+    def test_heartbeat_keeps_long_job_locked(self):
+        job = self.stale_job(attempts=1)
+        self.assertEqual(heartbeat(["dead-worker"]), 1)
+        self.assertEqual(requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "RUNNING")
+
+    def test_admin_retry_skips_dedup_conflict(self):
+        old = self.stale_job(attempts=5)
+        Job.objects.filter(pk=old.pk).update(status="FAILED")
+        enqueue("recompute_ratings", {"product_ids": []}, dedup_key="ratings")
+        done = enqueue("recompute_ratings", {"product_ids": []})
+        Job.objects.filter(pk=done.pk).update(status="DONE")
+
+        User.objects.create_superuser("admin", password="x")
+        self.client.force_login(User.objects.get(username="admin"))
+        response = self.client.post(
+            reverse("admin:store_job_changelist"),
+            {"action": "retry", "_selected_action": [old.pk, done.pk]},
+            follow=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Job.objects.get(pk=old.pk).status, "FAILED")
+        self.assertEqual(Job.objects.get(pk=done.pk).status, "QUEUED")
+        self.assertContains(response, f"لم تُعد المهام {old.pk}")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches["shared"].clear()
+        self.cache = TwoTierCache(alias="shared", local_ttl=60)
+
+    def test_single_flight(self):
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "value"
+
+        results = []
+
+        def read():
+            barrier.wait()
+            results.append(self.cache.get_or_set("k", compute, ttl=60))
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["value"] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_early_refresh_near_expiry(self):
+        # قيمة صالحة لثانية أخرى وحسابها أخذ ثانيتين: XFetch يعيد البناء مبكراً
+        caches["shared"].set("k", ("old", time.time() + 1, 2.0), 60)
+        with mock.patch("store.cache.random.random", return_value=0.1):
+            self.assertEqual(self.cache.get_or_set("k", lambda: "new", ttl=60), "new")
+        self.assertEqual(self.cache.stats()["early_refreshes"], 1)
+
+        # بعيداً عن الانتهاء تُقدم القيمة المخزنة دون حساب
+        self.cache.local.clear()
+        caches["shared"].set("k", ("old", time.time() + 60, 0.01), 60)
+        with mock.patch("store.cache.random.random", return_value=0.1):
+            self.assertEqual(self.cache.get_or_set("k", lambda: "new", ttl=60), "old")
+
+    def test_early_refresh_serves_stale_while_locked(self):
+        caches["shared"].set("k", ("old", time.time() + 1, 2.0), 60)
+        with self.cache._key_lock("k"), mock.patch(
+            "store.cache.random.random", return_value=0.1
+        ):
+            self.assertEqual(self.cache.get_or_set("k", lambda: "new", ttl=60), "old")
+        self.assertEqual(self.cache.stats()["stale_served"], 1)
+
+    def test_key_locks_are_bounded(self):
+        for i in range(1000):
+            self.cache.get_or_set(f"k{i}", lambda: i, ttl=60)
+        self.assertEqual(len(self.cache._key_locks), 64)
+
+
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="هواتف")
+        brand = Brand.objects.create(name="Nokia")
+        cls.phone = Product.objects.create(
+            name="Phone", price=100, description="-", category=category, brand=brand
+        )
+        cls.case = Product.objects.create(
+            name="Case", price=10, description="-", category=category, brand=brand
+        )
+
+    def place_order(self, lines):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create()
+            for product, quantity in lines:
+                OrderItem.objects.create(
+                    order=order, product=product, quantity=quantity, price=product.price
+                )
+        return order
+
+    def complete(self, order, status="COMPLETED"):
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = status
+            order.save()
+
+    def day_total(self):
+        return SalesRollup.objects.values("revenue", "units", "orders").get(granularity="DAY")
+
+    def test_increments_on_status_change(self):
+        order = self.place_order([(self.phone, 2), (self.case, 1)])
+        self.assertFalse(SalesRollup.objects.exists())
+        self.complete(order)
+        self.assertEqual(self.day_total(), {"revenue": 210, "units": 3, "orders": 1})
+        self.assertEqual(
+            ProductSalesRollup.objects.get(granularity="HOUR", product=self.phone).units, 2
+        )
+        self.complete(self.place_order([(self.case, 3)]))
+        self.assertEqual(self.day_total(), {"revenue": 240, "units": 6, "orders": 2})
+        # إلغاء طلب مكتمل يطرحه
+        self.complete(order, "CANCELLED")
+        self.assertEqual(self.day_total(), {"revenue": 30, "units": 3, "orders": 1})
+
+    def test_rebuild_matches_live_rollups(self):
+        for lines in ([(self.phone, 1)], [(self.case, 2)], [(self.phone, 1), (self.case, 1)]):
+            self.complete(self.place_order(lines))
+        self.place_order([(self.phone, 5)])  # غير مكتمل
+        live = self.day_total()
+        SalesRollup.objects.update(revenue=0, units=0, orders=0)
+
+        self.assertEqual(analytics.rebuild(chunk_size=2), 3)
+        self.assertEqual(self.day_total(), live)
+        self.assertEqual(ProductSalesRollup.objects.filter(granularity="DAY").count(), 2)
+
+    def test_failed_rebuild_keeps_old_totals(self):
+        for _ in range(3):
+            self.complete(self.place_order([(self.phone, 1)]))
+        before = self.day_total()
+        flush = analytics.RollupBatch.flush
+        calls = []
+
+        def flaky_flush(batch):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError("انقطع الاتصال")
+            flush(batch)
+
+        with mock.patch.object(analytics.RollupBatch, "flush", flaky_flush):
+            with self.assertRaises(RuntimeError):
+                analytics.rebuild(chunk_size=1)
+        # لا مجاميع جزئية: المعاملة تراجعت عن الحذف أيضاً
+        self.assertEqual(self.day_total(), before)
+
+    def test_dashboard_view(self):
+        self.complete(self.place_order([(self.phone, 2)]))
+        User.objects.create_superuser("admin", password="x")
+        self.client.force_login(User.objects.get(username="admin"))
+        url = reverse("admin:store_salesrollup_changelist")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"days": 7, "granularity": "HOUR"})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('"store_order"' in q["sql"] for q in queries.captured_queries))
+        data = response.context["data"]
+        self.assertEqual(data["summary"]["orders"], 1)
+        self.assertEqual(data["top_products"][0]["product__name"], "Phone")
+        self.assertEqual(response.context["granularity"], "HOUR")
+
+
+class AttributeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="هواتف")
+        cls.products = [
+            Product.objects.create(
+                name=f"Phone {i}", price=100, description="-", category=category
+            )
+            for i in range(3)
+        ]
+
+    def spec(self, product, name, value):
+        return Specification.objects.create(product=product, name=name, value=value)
+
+    def test_parse_value(self):
+        self.assertEqual(
+            attributes.parse_value("16 GB"), attributes.ParsedValue(16, "GB", "16 gb")
+        )
+        self.assertEqual(attributes.parse_value("1 TB").numeric, 1024)
+        self.assertEqual(attributes.parse_value("16gb").unit, "GB")
+        self.assertEqual(attributes.parse_value("٨ جيجا").numeric, 8)
+        self.assertEqual(attributes.parse_value("15,6 بوصة").numeric, 15.6)
+        self.assertEqual(attributes.parse_value("500 g").numeric, 0.5)
+        # "G" ليست جراماً و "4g LTE" ليست وحدة أصلاً
+        self.assertEqual(attributes.parse_value("5G"), attributes.ParsedValue(None, "", "5g"))
+        self.assertIsNone(attributes.parse_value("4g LTE").numeric)
+        self.assertEqual(attributes.parse_value("8").unit, "")
+
+    def test_parse_spec_filters(self):
+        self.assertEqual(
+            attributes.parse_spec_filters(
+                ["ram:gte:16 GB", "color:eq:black", "ram:like:16", "ram:gte:", "bad", "os:eq:a:b"]
+            ),
+            [("ram", "gte", "16 GB"), ("color", "eq", "black"), ("os", "eq", "a:b")],
+        )
+
+    def test_kind_follows_all_values(self):
+        first, second, third = self.products
+        self.spec(first, "Network", "4 GB")  # قيمة خاطئة أولاً تجعلها رقمية
+        self.assertEqual(Attribute.objects.get(slug="network").kind, "NUMERIC")
+        self.spec(second, "Network", "5G")
+        self.spec(third, "Network", "4G")
+        network = Attribute.objects.get(slug="network")
+        self.assertEqual((network.kind, network.unit), ("ENUM", ""))
+        self.assertFalse(network.values.filter(numeric_value__isnull=False).exists())
+
+    def test_backfill_infers_kind_from_all_values(self):
+        first, second, _ = self.products
+        # bulk_create لا يرسل post_save: لا فهرس قبل backfill
+        Specification.objects.bulk_create(
+            [
+                Specification(product=first, name="Weight", value="180 g"),
+                Specification(product=second, name="Weight", value="0.2 kg"),
+                Specification(product=first, name="Connectivity", value="5g"),
+                Specification(product=second, name="Connectivity", value="wifi"),
+            ]
+        )
+        self.assertEqual(attributes.backfill(batch_size=2), 4)
+        weight = Attribute.objects.get(slug="weight")
+        self.assertEqual((weight.kind, weight.unit), ("NUMERIC", "kg"))
+        self.assertEqual(Attribute.objects.get(slug="connectivity").kind, "ENUM")
+
+    def test_filter_products(self):
+        first, second, third = self.products
+        rows = [(first, "8 GB", "Black"), (second, "1 TB", "White"), (third, "16gb", "black")]
+        for product, ram, color in rows:
+            self.spec(product, "RAM", ram)
+            self.spec(product, "Color", color)
+        products = Product.objects.all()
+
+        def ids(*filters):
+            return set(
+                attributes.filter_products(products, attributes.parse_spec_filters(filters))
+                .values_list("id", flat=True)
+            )
+
+        self.assertEqual(ids("ram:gte:16"), {second.id, third.id})
+        self.assertEqual(ids("ram:gte:1 TB"), {second.id})
+        self.assertEqual(ids("ram:lt:16 GB", "color:eq:black"), {first.id})
+        self.assertEqual(ids("color:eq:BLACK"), {first.id, third.id})
+        self.assertEqual(ids("ram:gte:2 GHz"), set())  # وحدة مختلفة
+        self.assertEqual(ids("color:gt:1"), set())
+        self.assertEqual(ids("unknown:eq:1"), set())
+        response = self.client.get(reverse("products"), {"spec": "ram:gte:16"})
+        self.assertEqual(response.status_code, 200)
+
+
+class ReviewWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="لابتوبات")
+        cls.product = Product.objects.create(
+            name="ThinkPad", price=100, description="-", category=category
+        )
+        cls.customers = [
+            User.objects.create_user(f"user{i}", password="pw").customer_profile
+            for i in range(2)
+        ]
+
+    def entry(self, customer, rating, comment=""):
+        return {
+            "product_id": self.product.pk,
+            "customer_id": customer.pk,
+            "rating": rating,
+            "comment": comment,
+        }
+
+    def summary(self):
+        self.product.refresh_from_db()
+        return (
+            self.product.rating_count,
+            self.product.rating_sum,
+            [getattr(self.product, f"stars_{i}") for i in range(1, 6)],
+        )
+
+    def test_upsert_updates_summary_by_delta(self):
+        first, second = self.customers
+        save_reviews([self.entry(first, 5), self.entry(second, 3)])
+        self.assertEqual(self.summary(), (2, 8, [0, 0, 1, 0, 1]))
+
+        # تعديل تقييم موجود: العدد ثابت ويُنقل التقييم من 5 إلى 2
+        save_reviews([self.entry(first, 2, "تغير رأيي")])
+        self.assertEqual(self.summary(), (2, 5, [0, 1, 1, 0, 0]))
+        self.assertEqual(Review.objects.get(customer=first).comment, "تغير رأيي")
+
+        # تكرار نفس العميل في الدفعة: آخر تقييم فقط
+        save_reviews([self.entry(second, 1), self.entry(second, 4)])
+        self.assertEqual(self.summary(), (2, 6, [0, 1, 0, 1, 0]))
+        self.assertEqual(Review.objects.count(), 2)
+
+        # الملخص التدريجي يطابق إعادة الحساب الكاملة
+        before = self.summary()
+        Product.objects.filter(pk=self.product.pk).update(rating_count=0, rating_sum=0)
+        recompute_ratings([self.product.pk])
+        self.assertEqual(self.summary(), before)
+
+    def test_buffer_flushes_by_size(self):
+        first, second = self.customers
+        buffer = ReviewBuffer(max_size=2, max_delay=60)
+        with mock.patch("store.reviews.save_reviews") as save:
+            buffer.add(self.entry(first, 5))
+            save.assert_not_called()
+            buffer.add(self.entry(second, 4))
+            save.assert_called_once_with([self.entry(first, 5), self.entry(second, 4)])
+        self.assertIsNone(buffer._timer)
+
+    def test_buffer_flushes_by_timer(self):
+        flushed = threading.Event()
+        buffer = ReviewBuffer(max_size=50, max_delay=0.05)
+        with mock.patch(
+            "store.reviews.save_reviews", side_effect=lambda batch: flushed.set()
+        ) as save:
+            buffer.add(self.entry(self.customers[0], 5))
+            self.assertTrue(flushed.wait(2))
+        save.assert_called_once_with([self.entry(self.customers[0], 5)])
+        self.assertEqual(buffer._pending, [])
+
+    @override_settings(REVIEW_WRITE_MODE="buffered")
+    def test_buffered_mode_goes_through_buffer(self):
+        buffer = ReviewBuffer(max_size=2, max_delay=60)
+        with mock.patch("store.reviews._buffer", buffer):
+            submit_review(self.product.pk, self.customers[0].pk, 5)
+            self.assertFalse(Review.objects.exists())
+            buffer.flush()
+        self.assertEqual(self.summary()[:2], (1, 5))
+
+
+@override_settings(
+    CACHES=TEST_CACHES,
+    PROFILING={"ENABLED": True, "MODE": "cprofile", "SAMPLE_RATE": 0.0, "MAX_RECORDS": 2},
+)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", password="x")
+        cls.customer = User.objects.create_user("customer", password="x")
+
+    def test_only_staff_can_trigger(self):
+        url = reverse("about")
+        self.client.force_login(self.customer)
+        response = self.client.get(url, {"_profile": "1"})
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertFalse(ProfileRecord.objects.exists())
+
+        self.client.force_login(self.admin)
+        self.assertNotIn("X-Profile-Id", self.client.get(url))
+        response = self.client.get(url, {"_profile": "1"})
+        record = ProfileRecord.objects.get(pk=response["X-Profile-Id"])
+        self.assertEqual((record.mode, record.url_name), ("cprofile", "about"))
+        self.assertEqual((record.user, record.status_code), (self.admin, 200))
+
+    def test_sample_rate_profiles_anonymous_requests(self):
+        profiling = {"ENABLED": True, "MODE": "sampling", "SAMPLE_RATE": 1.0}
+        with self.settings(PROFILING=profiling):
+            response = Client().get(reverse("about"))
+        self.assertNotIn("X-Profile-Id", response)
+        record = ProfileRecord.objects.get()
+        self.assertEqual(record.mode, "sampling")
+        self.assertIsNone(record.user)
+        self.assertIsNone(record.pstats)
+
+    def test_disabled_middleware_is_not_loaded(self):
+        with self.settings(PROFILING={"ENABLED": False}):
+            self.client.force_login(self.admin)
+            self.client.get(reverse("about"), {"_profile": "1"})
+        self.assertFalse(ProfileRecord.objects.exists())
+
+    def test_records_are_persisted_and_pruned(self):
+        self.client.force_login(self.admin)
+        ids = [
+            int(self.client.get(reverse("about"), HTTP_X_PROFILE="1")["X-Profile-Id"])
+            for _ in range(3)
+        ]
+        # MAX_RECORDS=2: الأقدم يُحذف
+        self.assertEqual(
+            list(ProfileRecord.objects.values_list("pk", flat=True)), [ids[2], ids[1]]
+        )
+        record = ProfileRecord.objects.get(pk=ids[-1])
+        self.assertIn("function calls", record.summary)
+        response = self.client.get(
+            reverse("admin:store_profilerecord_download", args=[record.pk, "pstats"])
+        )
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "profile.pstats")
+        with open(path, "wb") as f:
+            f.write(response.content)
+        self.assertTrue(pstats.Stats(path).total_calls > 0)
+
+
+@override_settings(CACHES=TEST_CACHES, REVIEWS_PAGE_SIZE=2)
+class ReviewPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="لابتوبات")
+        cls.product = Product.objects.create(
+            name="ThinkPad", price=100, description="-", category=category
+        )
+        save_reviews(
+            [
+                {
+                    "product_id": cls.product.pk,
+                    "customer_id": User.objects.create_user(f"user{i}").customer_profile.pk,
+                    "rating": 5,
+                    "comment": f"review {i}",
+                }
+                for i in range(5)
+            ]
+        )
+        # نفس الوقت لكل التقييمات (دفعة واحدة): الترتيب يعتمد على id وحده
+        Review.objects.update(review_date=timezone.now())
+        cls.expected = list(
+            Review.objects.order_by("-id").values_list("comment", flat=True)
+        )
+
+    def test_cursor_pages_break_ties_on_id(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            reviews, cursor = reviews_page(self.product.pk, cursor)
+            seen += [review.comment for review in reviews]
+            pages += 1
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(pages, 3)
+
+    def test_endpoint(self):
+        url = reverse("product_reviews", args=[self.product.pk])
+        comments, cursor = [], None
+        while True:
+            data = self.client.get(url, {"cursor": cursor} if cursor else {}).json()
+            self.assertEqual(data["status"], "success")
+            comments += [review["comment"] for review in data["reviews"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(comments, self.expected)
+
+    def test_last_full_page_has_no_cursor(self):
+        reviews, cursor = reviews_page(self.product.pk, limit=5)
+        self.assertEqual(len(reviews), 5)
+        self.assertIsNone(cursor)
+
+    def test_invalid_cursor(self):
+        url = reverse("product_reviews", args=[self.product.pk])
+        for cursor in ("not-a-cursor", "!!!", base64.urlsafe_b64encode(b"x|y").decode()):
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["status"], "error")
+
+
+@override_settings(COMPARE_MAX_PRODUCTS=4)
+class CompareCookieTests(TestCase):
+    def toggle(self, product_id):
+        return self.client.post(
+            reverse("toggle_compare"),
+            {"product_id": product_id},
+            content_type="application/json",
+        ).json()
+
+    def test_limit_drops_oldest(self):
+        for pid in range(1, 6):
+            data = self.toggle(pid)
+        self.assertEqual((data["status"], data["compare_count"]), ("added", 4))
+        request = RequestFactory().get("/")
+        request.COOKIES = {compare.COOKIE_NAME: self.client.cookies[compare.COOKIE_NAME].value}
+        self.assertEqual(compare.get_compare_ids(request), [2, 3, 4, 5])
+        self.assertEqual(self.toggle(3)["status"], "removed")
+
+    def test_tampered_or_oversized_cookie(self):
+        self.toggle(1)
+        signed = self.client.cookies[compare.COOKIE_NAME].value
+        request = RequestFactory().get("/")
+
+        request.COOKIES = {compare.COOKIE_NAME: signed.replace("1", "2", 1)}
+        self.assertEqual(compare.get_compare_ids(request), [])
+        request.COOKIES = {compare.COOKIE_NAME: "1.2.3"}  # بدون توقيع
+        self.assertEqual(compare.get_compare_ids(request), [])
+
+        # كوكي موقّعة بقائمة أطول من الحد (مثلاً قبل تقليل COMPARE_MAX_PRODUCTS)
+        response = HttpResponse()
+        compare.set_compare_cookie(response, list(range(1, 11)))
+        request.COOKIES = {compare.COOKIE_NAME: response.cookies[compare.COOKIE_NAME].value}
+        self.assertEqual(compare.get_compare_ids(request), [1, 2, 3, 4])
+
+
+@override_settings(CACHES=TEST_CACHES, RECENTLY_VIEWED_MAX=2)
+class RecentlyViewedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="لابتوبات")
+        cls.products = [
+            Product.objects.create(
+                name=f"Laptop {name}", price=100, description="-", category=category
+            )
+            for name in ("Alpha", "Beta", "Gamma")
+        ]
+
+    def setUp(self):
+        catalog_cache.local.clear()
+        caches["shared"].clear()
+
+    def strip(self, response):
+        """أسماء المنتجات في شريط "شاهدتها مؤخراً" بترتيب ظهورها"""
+        html = response.content.decode()
+        self.assertIn("شاهدتها مؤخراً", html)
+        section = html[html.index("شاهدتها مؤخراً"):]
+        section = section[: section.index("</section>")]
+        return [
+            product.name
+            for product in sorted(self.products, key=lambda p: section.find(p.name))
+            if product.name in section
+        ]
+
+    def test_strip_lists_latest_views_first(self):
+        self.assertNotContains(self.client.get(reverse("index")), "شاهدتها مؤخراً")
+        alpha, beta, gamma = self.products
+        for product in (alpha, beta, alpha, gamma):
+            self.client.get(reverse("product_details", args=[product.pk]))
+
+        # الحد 2: الأحدث أولاً بلا تكرار، و Beta خرجت من القائمة
+        response = self.client.get(reverse("index"))
+        self.assertEqual(self.strip(response), ["Laptop Gamma", "Laptop Alpha"])
+        # صفحة المنتج لا تعرضه في شريطه
+        response = self.client.get(reverse("product_details", args=[gamma.pk]))
+        self.assertEqual(self.strip(response), ["Laptop Alpha"])
+
+    def test_tampered_cookie_is_ignored(self):
+        self.client.cookies[recently_viewed.COOKIE_NAME] = f"{self.products[0].pk}:forged"
+        self.assertNotContains(self.client.get(reverse("index")), "شاهدتها مؤخراً")
+
+
+@override_settings(SQLITE_TUNING=True, SQLITE_PRAGMAS={"busy_timeout": 100})
+class SQLiteImmediateTests(TestCase):
+    def open(self, path):
+        """اتصال منفصل بملف SQLite بنفس إعدادات الإنتاج (transaction_mode=IMMEDIATE)"""
+        conn = connection.copy()
+        conn.settings_dict = {
+            **conn.settings_dict,
+            "NAME": path,
+            "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 0.1},
+        }
+        self.addCleanup(conn.close)
+        return conn
+
+    def begin(self, conn):
+        # نفس ما يفعله transaction.atomic عند الدخول
+        conn.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+
+    def test_write_lock_taken_at_begin(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite فقط")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "db.sqlite3")
+        first, second = self.open(path), self.open(path)
+        with first.cursor() as cursor:
+            cursor.execute("CREATE TABLE counter (value INTEGER)")
+            cursor.execute("INSERT INTO counter VALUES (0)")
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+
+        self.begin(first)
+        # الأولى لم تكتب بعد لكنها تملك قفل الكتابة: الثانية تفشل عند BEGIN مباشرة
+        # بدل أن تقرأ ثم تفشل عند الترقية إلى كتابة (SQLITE_BUSY دون انتظار)
+        with self.assertRaisesMessage(OperationalError, "database is locked"):
+            self.begin(second)
+        second.set_autocommit(True)
+
+        with first.cursor() as cursor:
+            cursor.execute("UPDATE counter SET value = value + 1")
+        first.commit()
+        first.set_autocommit(True)
+
+        self.begin(second)
+        with second.cursor() as cursor:
+            cursor.execute("UPDATE counter SET value = value + 1")
+            cursor.execute("SELECT value FROM counter")
+            self.assertEqual(cursor.fetchone()[0], 2)
+        second.commit()
+        second.set_autocommit(True)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PurgeSessionsTests(TestCase):
+    def setUp(self):
+        caches["shared"].clear()
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(
+                session_key=f"expired{i}",
+                session_data="",
+                expire_date=now - timedelta(days=1),
+            )
+        for i in range(2):
+            Session.objects.create(
+                session_key=f"live{i}",
+                session_data="",
+                expire_date=now + timedelta(days=1),
+            )
+        Cart.objects.create(session_id="expired0", items={"1": 1})
+        Cart.objects.create(session_id="live0", items={"1": 1})
+
+    def test_deletes_only_expired_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            sessions, carts, finished = session_purge.purge_expired(
+                batch_size=2, sleep=0, max_batches=2
+            )
+        self.assertEqual((sessions, carts, finished), (4, 1, False))
+        # كل دفعة حذف محدود بمفاتيحها وليس حذفاً واحداً لكل الجلسات المنتهية
+        session_deletes = [
+            q for q in queries.captured_queries
+            if q["sql"].startswith('DELETE FROM "django_session"')
+        ]
+        self.assertEqual(len(session_deletes), 2)
+        self.assertEqual(session_purge.load_checkpoint()["last_key"], "expired3")
+
+        # الجولة التالية تستأنف من نقطة التوقف
+        self.assertEqual(session_purge.purge_expired(batch_size=2, sleep=0), (1, 0, True))
+        self.assertIsNone(session_purge.load_checkpoint())
+        self.assertEqual(
+            sorted(Session.objects.values_list("session_key", flat=True)), ["live0", "live1"]
+        )
+        self.assertEqual(list(Cart.objects.values_list("session_id", flat=True)), ["live0"])
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command("purge_sessions", "--batch-size", "2", "--sleep", "0", stdout=out)
+        self.assertIn("حُذفت 5 جلسة و1 سلة", out.getvalue())
+        self.assertEqual(Session.objects.count(), 2)
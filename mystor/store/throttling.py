@@ -0,0 +1,384 @@
+import hashlib
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+
+def get_client_ip(request):
+    """عنوان العميل، مع احترام عدد البروكسيات الموثوقة أمام التطبيق (مثل Render)"""
+    proxy_count = getattr(settings, "THROTTLE_PROXY_COUNT", 0)
+    if proxy_count:
+        forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+        ips = [ip.strip() for ip in forwarded.split(",") if ip.strip()]
+        if len(ips) >= proxy_count:
+            return ips[-proxy_count]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def too_many_requests(retry_after):
+    """رد 429 خفيف لا يلمس الجلسة ولا قاعدة البيانات"""
+    response = JsonResponse(
+        {"status": "error", "message": "محاولات كثيرة، يرجى المحاولة لاحقاً"},
+        status=429,
+    )
+    response["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+# ==========================================
+# 1. مخازن العدادات (Stores)
+# ==========================================
+# كل مخزن يوفر نفس الواجهة:
+#   incr(key, ttl)          -> زيادة ذرية لعداد وإعادة قيمته
+#   get(key)                -> قيمة العداد (0 إذا لم يوجد)
+#   update(key, func, ttl)  -> قراءة/تعديل/كتابة ذرية لحالة مركبة
+#                              (func(state) -> (new_state, result))، يحتاجها TokenBucket
+#   delete(key)
+
+
+class LocalMemoryStore:
+    """عدادات داخل العملية نفسها: مناسبة لخادم واحد بعامل واحد"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= now:
+            return None
+        return entry[0]
+
+    def _prune(self, now):
+        if len(self._data) > self.max_entries:
+            for key in [k for k, (_, exp) in self._data.items() if exp <= now]:
+                del self._data[key]
+
+    def incr(self, key, ttl):
+        now = time.time()
+        with self._lock:
+            value = self._live(key, now)
+            if value is None:
+                self._prune(now)
+                value, expires = 0, now + ttl
+            else:
+                expires = self._data[key][1]
+            value += 1
+            self._data[key] = (value, expires)
+            return value
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key, time.time()) or 0
+
+    def update(self, key, func, ttl):
+        now = time.time()
+        with self._lock:
+            state, result = func(self._live(key, now))
+            self._prune(now)
+            self._data[key] = (state, now + ttl)
+            return result
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class CacheStore:
+    """
+    عدادات في كاش Django مشترك بين عمال gunicorn. incr ذري فقط في Redis وMemcached؛
+    في FileBasedCache وLocMemCache هو get ثم set فتضيع زيادات العمال المتزامنة
+    ويقل العد وقت الهجوم بالضبط، لذلك تُرفض هذه الأنواع.
+    """
+
+    ATOMIC_BACKENDS = (RedisCache, BaseMemcachedCache)
+
+    def __init__(self, alias="shared"):
+        self.alias = alias
+        if not isinstance(self.cache, self.ATOMIC_BACKENDS):
+            raise ImproperlyConfigured(
+                f"CacheStore يحتاج كاش Redis أو Memcached للعدادات الذرية، والكاش "
+                f"{alias!r} هو {type(self.cache).__name__}: استخدم DatabaseStore"
+            )
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def incr(self, key, ttl):
+        self.cache.add(key, 0, ttl)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # انتهت صلاحية المفتاح بين add و incr
+            self.cache.set(key, 1, ttl)
+            return 1
+
+    def get(self, key):
+        return self.cache.get(key, 0)
+
+    def update(self, key, func, ttl):
+        # get ثم set بدون قفل: الطلبات المتزامنة تقرأ نفس حالة الدلو فتمر كلها،
+        # وهذا لا يصلح لحد أمني مثل محاولات الدخول
+        raise ImproperlyConfigured(
+            "CacheStore لا يدعم token_bucket (قراءة وكتابة غير ذرية): "
+            "استخدم DatabaseStore أو سياسة fixed_window/sliding_window"
+        )
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+
+class DatabaseStore:
+    """
+    عدادات في قاعدة البيانات الحالية، بدون أي خدمة إضافية. update ذري:
+    select_for_update في Postgres/MySQL، ومعاملات IMMEDIATE في SQLite تسلسل الكتابة.
+    """
+
+    # نسبة الطلبات التي تحذف العدادات المنتهية (تنظيف تدريجي)
+    prune_probability = 0.01
+
+    def __init__(self, using="default"):
+        self.using = using
+
+    @property
+    def model(self):
+        from .models import RateLimitCounter
+
+        return RateLimitCounter
+
+    def _prune(self, now):
+        if random.random() < self.prune_probability:
+            self.model.objects.using(self.using).filter(expires_at__lte=now).delete()
+
+    def incr(self, key, ttl):
+        now = time.time()
+        counters = self.model.objects.using(self.using)
+        with transaction.atomic(using=self.using):
+            updated = counters.filter(key=key, expires_at__gt=now).update(
+                value=F("value") + 1
+            )
+            if not updated:
+                try:
+                    with transaction.atomic(using=self.using):
+                        counters.update_or_create(
+                            key=key, defaults={"value": 1, "expires_at": now + ttl}
+                        )
+                except IntegrityError:
+                    counters.filter(key=key).update(value=F("value") + 1)
+            value = counters.filter(key=key).values_list("value", flat=True).first()
+        self._prune(now)
+        return int(value or 0)
+
+    def get(self, key):
+        value = (
+            self.model.objects.using(self.using)
+            .filter(key=key, expires_at__gt=time.time())
+            .values_list("value", flat=True)
+            .first()
+        )
+        return int(value or 0)
+
+    def update(self, key, func, ttl):
+        now = time.time()
+        counters = self.model.objects.using(self.using)
+        with transaction.atomic(using=self.using):
+            row = counters.select_for_update().filter(key=key).first()
+            current = row.state if row is not None and row.expires_at > now else None
+            state, result = func(current)
+            try:
+                with transaction.atomic(using=self.using):
+                    counters.update_or_create(
+                        key=key, defaults={"state": state, "expires_at": now + ttl}
+                    )
+            except IntegrityError:
+                # أول طلبين متزامنين لنفس المفتاح: الآخر أنشأ الصف، نعيد الحساب على حالته
+                row = counters.select_for_update().filter(key=key).first()
+                current = row.state if row.expires_at > now else None
+                state, result = func(current)
+                counters.filter(key=key).update(state=state, expires_at=now + ttl)
+        self._prune(now)
+        return result
+
+    def delete(self, key):
+        self.model.objects.using(self.using).filter(key=key).delete()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """المخزن المحدد في RATE_LIMIT_STORE (يُنشأ مرة واحدة لكل عملية)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                conf = getattr(
+                    settings,
+                    "RATE_LIMIT_STORE",
+                    {"BACKEND": "store.throttling.DatabaseStore"},
+                )
+                _store = import_string(conf["BACKEND"])(**conf.get("OPTIONS", {}))
+    return _store
+
+
+# ==========================================
+# 2. سياسات التحديد (Policies)
+# ==========================================
+# كل سياسة: hit(store, key) -> (مسموح؟، عدد الثواني قبل السماح مجدداً)
+
+
+class FixedWindow:
+    """عدد ثابت من الطلبات في كل نافذة زمنية"""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+
+    def hit(self, store, key):
+        now = time.time()
+        index = int(now // self.window)
+        count = store.incr(f"{key}:{index}", self.window)
+        retry_after = (index + 1) * self.window - now
+        return count <= self.limit, retry_after
+
+
+class SlidingWindow:
+    """نافذة منزلقة تقريبية: عداد النافذة الحالية + نسبة من السابقة"""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+
+    def hit(self, store, key):
+        now = time.time()
+        index = int(now // self.window)
+        elapsed = (now - index * self.window) / self.window
+        current = store.incr(f"{key}:{index}", self.window * 2)
+        previous = store.get(f"{key}:{index - 1}")
+        weighted = previous * (1 - elapsed) + current
+        allowed = weighted <= self.limit
+        retry_after = 0 if allowed else (1 - elapsed) * self.window
+        return allowed, retry_after
+
+
+class TokenBucket:
+    """
+    دلو رموز (Token Bucket): كل محاولة تستهلك رمزاً،
+    والرموز تتجدد بمعدل ثابت حتى السعة القصوى.
+    """
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        # الدلو الفارغ يمتلئ خلال هذه المدة، بعدها لا حاجة للاحتفاظ بالمفتاح
+        self.ttl = math.ceil(capacity / refill_per_second) + 1
+
+    def hit(self, store, key, tokens=1):
+        def take(state):
+            now = time.time()
+            if state is None:
+                available = self.capacity
+            else:
+                available, stamp = state
+                elapsed = max(0.0, now - stamp)
+                available = min(
+                    self.capacity, available + elapsed * self.refill_per_second
+                )
+            if available >= tokens:
+                return [available - tokens, now], (True, 0)
+            wait = (tokens - available) / self.refill_per_second
+            return [available, now], (False, wait)
+
+        return store.update(key, take, self.ttl)
+
+
+POLICIES = {
+    "fixed_window": FixedWindow,
+    "sliding_window": SlidingWindow,
+    "token_bucket": TokenBucket,
+}
+
+
+class RateLimit:
+    """سياسة مسماة مرتبطة بمخزن: RateLimit("login-ip", TokenBucket(20, 1))"""
+
+    def __init__(self, name, policy, store=None):
+        self.name = name
+        self.policy = policy
+        self._store = store
+
+    @property
+    def store(self):
+        return self._store or get_store()
+
+    def _key(self, ident):
+        return f"throttle:{self.name}:{ident}"
+
+    def hit(self, ident):
+        return self.policy.hit(self.store, self._key(ident))
+
+    def reset(self, ident):
+        self.store.delete(self._key(ident))
+
+    @classmethod
+    def from_config(cls, name, conf):
+        """{"policy": "fixed_window", "limit": 5, "window": 60}"""
+        options = dict(conf)
+        policy = POLICIES[options.pop("policy", "token_bucket")](**options)
+        return cls(name, policy)
+
+
+# ==========================================
+# 3. حد محاولات تسجيل الدخول
+# ==========================================
+
+
+class LoginThrottle:
+    """
+    حد لمحاولات الدخول لكل عنوان IP ولكل حساب. الدلو في DatabaseStore دائماً
+    (مهما كان RATE_LIMIT_STORE): محاولات متزامنة على نفس الحساب تُحتسب كلها.
+    """
+
+    DEFAULTS = {
+        "ip": {"capacity": 20, "refill_per_second": 20 / 60},
+        "account": {"capacity": 5, "refill_per_second": 5 / 300},
+    }
+
+    def __init__(self, store=None):
+        conf = {**self.DEFAULTS, **getattr(settings, "LOGIN_THROTTLE", {})}
+        store = store or DatabaseStore()
+        self.ip_limit = RateLimit("login-ip", TokenBucket(**conf["ip"]), store)
+        self.account_limit = RateLimit(
+            "login-account", TokenBucket(**conf["account"]), store
+        )
+
+    @staticmethod
+    def _account_ident(login_input):
+        # تجزئة المعرّف حتى يكون مفتاح الكاش آمناً مع أي محتوى
+        return hashlib.sha256(login_input.strip().lower().encode()).hexdigest()
+
+    def check(self, request, login_input):
+        allowed, retry_after = self.ip_limit.hit(get_client_ip(request))
+        if not allowed:
+            return False, retry_after
+        return self.account_limit.hit(self._account_ident(login_input))
+
+    def reset(self, login_input):
+        """بعد الدخول الناجح لا نحتسب أخطاء المستخدم السابقة ضده"""
+        self.account_limit.reset(self._account_ident(login_input))
+
+
+login_throttle = LoginThrottle()
@@ -8,10 +8,17 @@ urlpatterns = [
     path("products/", views.products, name="products"),
     path("product/<int:product_id>/", views.product_details, name="product_details"),
     path("checkout/", views.checkout, name="checkout"),
+    path("compare/", views.compare, name="compare"),
+    path("api/compare/toggle/", views.toggle_compare, name="toggle_compare"),
     path("about/", views.about, name="about"),
     path("profile/", views.profile, name="profile"),
     path("add-to-cart/", views.add_to_cart, name="add_to_cart"),
     path("add-review/<int:product_id>/", views.add_review, name="add_review"),
+    path(
+        "api/product/<int:product_id>/reviews/",
+        views.product_reviews,
+        name="product_reviews",
+    ),
     # path("cart_update/<int:product_id>/", views.cart_update, name="cart_update"),
     # path("cart_remove/<int:product_id>/", views.cart_remove, name="cart_remove"),
     path("remove-from-cart/", views.remove_from_cart, name="remove_from_cart"),
@@ -28,4 +35,8 @@ urlpatterns = [
         name="move_wishlist_to_cart",
     ),
     path("contact/", views.contact, name="contact"),
+    path("api/health/", views.health_status, name="health_status"),
+    path("metrics", views.metrics, name="metrics"),
+    path("sitemap.xml", views.feed_file, name="sitemap"),
+    path("feeds/<str:name>", views.feed_file, name="feed_file"),
 ]
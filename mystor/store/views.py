@@ -1,17 +1,51 @@
-from django.contrib.auth import update_session_auth_hash
-from django.contrib.auth.forms import PasswordChangeForm
+import hmac
 import json
+import os
 import urllib.parse
+
+from django.contrib.auth import update_session_auth_hash
+from django.contrib.auth.forms import PasswordChangeForm
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.static import serve
+from django.core.files.storage import default_storage
 from django.core.paginator import Paginator
 from django.urls import reverse
-from django.db.models import Q, Avg, Count
+from django.db.models import Q, Avg
 from django.db.models.functions import Coalesce
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from .models import Product, Category, Customer, Review, Wishlist
+from .models import Product, Category, Customer, Wishlist
+from .attributes import filter_products, parse_spec_filters
+from .compare import (
+    build_comparison,
+    compare_limit,
+    ids_from_source,
+    parse_ids,
+    set_compare_cookie,
+    toggle_compare_id,
+)
+from .catalog import (
+    all_categories,
+    latest_products,
+    product_details_data,
+    suggested_products,
+)
+from . import feeds
+from . import metrics as store_metrics
+from . import reservations
+from .recently_viewed import recent_products, record_view
+from .resilience import db_health
+from . import snapshot as catalog_snapshot
+from .storage import is_hashed_name
+from .reviews import reviews_page, serialize_review, submit_review
+from .throttling import login_throttle, too_many_requests
 
 
 # ==========================================
@@ -20,18 +54,14 @@ from .models import Product, Category, Customer, Review, Wishlist
 
 
 def index(request):
-    products = (
-        Product.objects.select_related("category")
-        .filter(stock__gt=0)
-        .order_by("-id")[:4]
-        .annotate(avg_rating=Avg("reviews__rating"), num_reviews=Count("reviews"))
-    )
+    # نفس النتيجة لكل الزوار: من الكاش ذي الطبقتين (store/catalog.py)
     return render(
         request,
         "index.html",
         {
-            "products": products,
-            "categories": Category.objects.all(),
+            "products": latest_products(),
+            "categories": all_categories(),
+            "recently_viewed": recent_products(request),
         },
     )
 
@@ -74,11 +104,16 @@ def products(request, cid=None):
             | Q(category__name__icontains=search_query)
         ).distinct()
 
+    # الفلترة بالمواصفات المنظمة: ?spec=ram:gte:16&spec=color:eq:black
+    spec_filters = parse_spec_filters(request.GET.getlist("spec"))
+    products_list = filter_products(products_list, spec_filters)
+
     # الترتيب
+    # التعادل بالأحدث (-id) كما في النسخة العمودية، فلا يتغير الترقيم بين المسارين
     if sort_by == "price_asc":
-        products_list = products_list.order_by("price")
+        products_list = products_list.order_by("price", "-id")
     elif sort_by == "price_desc":
-        products_list = products_list.order_by("-price")
+        products_list = products_list.order_by("-price", "-id")
     elif sort_by == "rating":
         products_list = products_list.annotate(
             avg_rating=Coalesce(Avg("reviews__rating"), 0.0)
@@ -86,6 +121,15 @@ def products(request, cid=None):
     else:
         products_list = products_list.order_by("-id")
 
+    # بدون بحث نصي أو فلاتر مواصفات: الفلترة والترتيب من النسخة العمودية (store/snapshot.py)
+    # وتُجلب منتجات الصفحة فقط من قاعدة البيانات
+    if not search_query and not spec_filters:
+        snapshot_result = catalog_snapshot.query(
+            category_id=category_obj.pk if category_obj else None, sort=sort_by
+        )
+        if snapshot_result is not None:
+            products_list = snapshot_result
+
     # الترقيم
     paginator = Paginator(products_list, 3)
     page_number = request.GET.get("page")
@@ -107,38 +151,138 @@ def products(request, cid=None):
         "products": products,
         "current_category": category_obj,
         "breadcrumbs": breadcrumbs,
-        "all_categories": Category.objects.all(),
+        "all_categories": all_categories(),
         "search_query": search_query,
         "sort_by": sort_by,
+        "spec_filters": spec_filters,
+        # للحفاظ على فلاتر المواصفات في روابط الترقيم
+        "spec_query": "".join(
+            "&" + urllib.parse.urlencode({"spec": ":".join(f)}) for f in spec_filters
+        ),
     }
     return render(request, "products.html", context)
 
 
 def product_details(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-    reviews = product.reviews.select_related("customer").order_by("-review_date")
-    review_summary = product.reviews.aggregate(
-        avg_rating=Avg("rating"), num_reviews=Count("id")
-    )
-
-    related_products = Product.objects.filter(category=product.category).exclude(
-        id=product.id
-    )[:4]
+    # كل بيانات الصفحة باستعلامات محدودة (store/loaders.py) ومن الكاش
+    data = product_details_data(product_id)
+    if data is None:
+        raise Http404("المنتج غير موجود")
 
     breadcrumbs = [
         {"title": "الرئيسية", "url": reverse("index")},
         {"title": "المنتجات", "url": reverse("products")},
-        {"title": product.name, "url": None},
+        {"title": data["product"]["name"], "url": None},
     ]
 
     context = {
-        "product": product,
+        **data,
         "breadcrumbs": breadcrumbs,
-        "reviews": reviews,
-        "related_products": related_products,
-        "review_summary": review_summary,
+        "recently_viewed": recent_products(request, exclude=product_id),
     }
-    return render(request, "product_details.html", context)
+    response = render(request, "product_details.html", context)
+    record_view(request, response, product_id)
+    return response
+
+
+def compare(request):
+    """مقارنة المنتجات: ?ids=1,2,3 أو ?source=cart|wishlist أو القائمة المحفوظة"""
+    if request.GET.get("ids"):
+        product_ids = parse_ids(request.GET["ids"])
+    else:
+        product_ids = ids_from_source(request, request.GET.get("source"))
+
+    breadcrumbs = [
+        {"title": "الرئيسية", "url": reverse("index")},
+        {"title": "مقارنة المنتجات", "url": None},
+    ]
+
+    context = {
+        **build_comparison(product_ids),
+        "breadcrumbs": breadcrumbs,
+        "compare_limit": compare_limit(),
+    }
+    return render(request, "compare.html", context)
+
+
+def toggle_compare(request):
+    """إضافة/إزالة منتج من قائمة المقارنة (كوكي موقّعة، بدون جدول ولا جلسة)"""
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+            product_id = int(data.get("product_id"))
+            added, ids = toggle_compare_id(request, product_id)
+            response = JsonResponse(
+                {
+                    "status": "added" if added else "removed",
+                    "message": "تمت الإضافة للمقارنة" if added else "تمت الإزالة من المقارنة",
+                    "compare_count": len(ids),
+                }
+            )
+            set_compare_cookie(response, ids)
+            return response
+        except Exception as e:
+            return JsonResponse({"status": "error", "message": str(e)})
+    return JsonResponse({"status": "error", "message": "Invalid request"})
+
+
+@staff_member_required
+def health_status(request):
+    """حالة قاعدة البيانات والوضع المتدهور لهذا العامل"""
+    return JsonResponse(db_health.state())
+
+
+def feed_file(request, name="sitemap.xml"):
+    """ملفات sitemap وfeed المولدة بـ manage.py generate_feeds (مضغوطة مسبقاً)"""
+    path = feeds.file_path(name)
+    if path is None:
+        raise Http404
+    stat = os.stat(path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if not_modified is not None:
+        return not_modified
+
+    content_type = "application/gzip" if name.endswith(".gz") else "application/xml"
+    response = FileResponse(open(path, "rb"), content_type=content_type)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    patch_cache_control(response, public=True, max_age=feeds.get_config()["MAX_AGE"])
+    return response
+
+
+def media_file(request, path):
+    """
+    الوسائط المرفوعة في التطوير (SERVE_MEDIA = DEBUG): الأسماء المبنية على المحتوى
+    لا يتغير محتواها فتُخزن سنة كاملة
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    # صور المنتجات والعملاء (storage.py) وصورها المصغرة فقط تُخزن في كاش عام
+    public = tuple(getattr(default_storage, "prefixes", ())) + ("variants/",)
+    if path.startswith(public) and is_hashed_name(path):
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+    elif path.startswith(public):
+        # الصور المصغرة والملفات القديمة قد تتغير تحت نفس الاسم
+        patch_cache_control(response, public=True, max_age=3600)
+    else:
+        # مجلدات أخرى داخل MEDIA_ROOT لا تُخزن في كاش مشترك (CDN أو proxy)
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def metrics(request):
+    """مقاييس كل العمال بصيغة Prometheus: للموظفين أو بالترويسة Authorization: Bearer <METRICS_TOKEN>"""
+    token = settings.METRICS_TOKEN
+    auth = request.META.get("HTTP_AUTHORIZATION", "")
+    authorized = bool(token) and hmac.compare_digest(auth, f"Bearer {token}")
+    if not (authorized or request.user.is_staff):
+        return HttpResponse("forbidden", status=403, content_type="text/plain")
+    return HttpResponse(
+        store_metrics.render_prometheus(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
 
 
 # ==========================================
@@ -164,6 +308,14 @@ def add_to_cart(request):
 
             cart = request.session.get("cart", {})
 
+            # حجز الكمية قبل إضافتها (InsufficientStock تظهر كرسالة خطأ)
+            if reservations.enabled():
+                cart_id = reservations.get_cart_id(request)
+                if quantity > 0:
+                    reservations.reserve(product.pk, cart_id, quantity)
+                else:
+                    reservations.release(product.pk, cart_id, -quantity)
+
             # منطق التحديث
             if product_id in cart:
                 cart[product_id] += quantity
@@ -174,6 +326,7 @@ def add_to_cart(request):
             request.session["cart"] = cart
             request.session.modified = True
             request.session.save()  # مهم جداً
+            store_metrics.inc("store_cart_mutations_total", action="add")
 
             print(f"✅ تم الحفظ في السلة: {cart}")
 
@@ -202,10 +355,13 @@ def remove_from_cart(request):
             cart = request.session.get("cart", {})
 
             if product_id in cart:
+                if reservations.enabled() and product_id.isdigit():
+                    reservations.release(int(product_id), reservations.get_cart_id(request))
                 del cart[product_id]
                 request.session["cart"] = cart
                 request.session.modified = True
                 request.session.save()
+                store_metrics.inc("store_cart_mutations_total", action="remove")
 
                 return JsonResponse(
                     {
@@ -222,6 +378,14 @@ def remove_from_cart(request):
 def checkout(request):
     """عرض صفحة السلة"""
     cart = request.session.get("cart", {})
+    unavailable = []
+    if cart and reservations.enabled():
+        # العميل ما زال يتسوق: تجديد الحجز، وما انتهى حجزه ونفد يُحذف من السلة
+        cart, unavailable = reservations.restore_cart(
+            reservations.get_cart_id(request), cart
+        )
+        if unavailable:
+            request.session["cart"] = cart
 
     cart_items = []
     total_price = 0
@@ -260,13 +424,14 @@ def checkout(request):
         {"title": "الرئيسية", "url": reverse("index")},
         {"title": "السلة", "url": None},
     ]
-    suggested_products = Product.objects.filter(stock__gt=0).order_by("-id")[:4]
-
     context = {
         "cart_items": cart_items,
+        "unavailable_items": Product.objects.filter(
+            id__in=[int(key) for key in unavailable]
+        ).values_list("name", flat=True),
         "total_price": total_price,
         "breadcrumbs": breadcrumbs,
-        "suggested_products": suggested_products,
+        "suggested_products": suggested_products(),
         "whatsapp_message": encoded_message,
     }
     return render(request, "checkout.html", context)
@@ -285,18 +450,15 @@ def login_ajax(request):
             if not login_input or not password:
                 return JsonResponse({"status": "error", "message": "البيانات ناقصة"})
 
-            user = None
-            if "@" in login_input:
-                try:
-                    u = User.objects.get(email__iexact=login_input)
-                    user = authenticate(request, username=u.username, password=password)
-                except User.DoesNotExist:
-                    pass
+            allowed, retry_after = login_throttle.check(request, login_input)
+            if not allowed:
+                return too_many_requests(retry_after)
 
-            if user is None:
-                user = authenticate(request, username=login_input, password=password)
+            # EmailOrUsernameBackend يبحث بالبريد أو اسم المستخدم باستعلام واحد
+            user = authenticate(request, username=login_input, password=password)
 
             if user:
+                login_throttle.reset(login_input)
                 login(request, user)
                 return JsonResponse(
                     {
@@ -426,30 +588,39 @@ def profile(request):
 # ==========================================
 def add_review(request, product_id):
     if request.method == "POST":
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {"status": "error", "message": "يجب تسجيل الدخول لإضافة تقييم"}
+            )
         try:
             data = json.loads(request.body)
             rating = int(data.get("rating"))
             comment = data.get("comment", "")
-            name = data.get("name", "Guest")
 
-            product = get_object_or_404(Product, id=product_id)
+            product = get_object_or_404(Product.objects.only("id"), id=product_id)
 
-            # البحث عن عميل موجود أو إنشاء جديد
-            customer, _ = Customer.objects.get_or_create(name=name)
-
-            new_review = Review.objects.create(
-                product=product, customer=customer, rating=rating, comment=comment
+            # العميل يُحدد من المستخدم المسجل (فهرس فريد على user_id)
+            customer, _ = Customer.objects.get_or_create(
+                user=request.user,
+                defaults={
+                    "name": request.user.get_full_name() or request.user.username,
+                    "email": request.user.email,
+                },
             )
 
+            # UPSERT للتقييم + تحديث ملخص المنتج في نفس المعاملة
+            review_date = submit_review(product.id, customer.id, rating, comment)
+
             return JsonResponse(
                 {
                     "status": "success",
                     "message": "تم إضافة التقييم",
                     "review": {
-                        "customer_name": customer.name,
+                        "customer_name": customer.name.strip()
+                        or request.user.username,
                         "rating": rating,
                         "comment": comment,
-                        "review_date": new_review.review_date.strftime("%d %b, %Y"),
+                        "review_date": review_date.strftime("%d %b, %Y"),
                     },
                 }
             )
@@ -458,6 +629,21 @@ def add_review(request, product_id):
     return JsonResponse({"status": "error", "message": "Invalid request"})
 
 
+def product_reviews(request, product_id):
+    """صفحات التقييمات التالية بصيغة JSON: ?cursor=..."""
+    try:
+        reviews, next_cursor = reviews_page(product_id, request.GET.get("cursor"))
+    except ValueError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+    return JsonResponse(
+        {
+            "status": "success",
+            "reviews": [serialize_review(review) for review in reviews],
+            "next_cursor": next_cursor,
+        }
+    )
+
+
 # 1. دالة تبديل المفضلة (تستخدم للأزرار في الكروت)
 @login_required
 def toggle_wishlist(request):
@@ -512,20 +698,30 @@ def move_wishlist_to_cart(request):
     cart = request.session.get("cart", {})
 
     items_moved_count = 0
+    moved_ids = []
     for item in wishlist_items:
-        pid = str(item.product.id)
+        if reservations.enabled():
+            try:
+                reservations.reserve(item.product_id, reservations.get_cart_id(request), 1)
+            except reservations.InsufficientStock:
+                # غير متوفر: يبقى في المفضلة
+                continue
+        pid = str(item.product_id)
         if pid in cart:
             cart[pid] += 1
         else:
             cart[pid] = 1
         items_moved_count += 1
+        moved_ids.append(item.pk)
 
     # حفظ السلة
     request.session["cart"] = cart
     request.session.modified = True
+    if items_moved_count:
+        store_metrics.inc("store_cart_mutations_total", action="from_wishlist")
 
     # حذف العناصر من المفضلة بعد النقل (اختياري، يفضل حذفها)
-    wishlist_items.delete()
+    Wishlist.objects.filter(pk__in=moved_ids).delete()
 
     return JsonResponse(
         {
@@ -0,0 +1,137 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.db import connections
+from django.urls import reverse
+
+from .catalog import (
+    all_categories,
+    latest_products,
+    main_categories,
+    product_details_data,
+    suggested_products,
+)
+from .models import Category, Product
+from .recently_viewed import background_request
+
+
+def _host():
+    hosts = [h for h in settings.ALLOWED_HOSTS if h not in ("*", "") and not h.startswith(".")]
+    return hosts[0] if hosts else "localhost"
+
+
+def _page_handler():
+    handler = BaseHandler()
+    handler.load_middleware()
+    return handler
+
+
+def _render_page(handler, url):
+    """
+    عرض الصفحة داخل العملية كزائر جديد (بدون كوكيز) عبر نفس الـ middleware حتى
+    تُخزن نسختها العامة في كاش الصفحات (ResilienceMiddleware) وتُترجم القوالب.
+    طلب خلفي (store_background_render): لا جلسة ولا مشاهدة، فلا يبدأ thread
+    عداد المشاهدات في عملية gunicorn الرئيسية قبل fork.
+    """
+    path, _, query = url.partition("?")
+    host = _host()
+    request = background_request(
+        {
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SCRIPT_NAME": "",
+            "SERVER_NAME": host,
+            "SERVER_PORT": "80",
+            "HTTP_HOST": host,
+        }
+    )
+    response = handler.get_response(request)
+    response.close()
+    if response.status_code != 200:
+        raise RuntimeError(f"{url}: {response.status_code}")
+
+
+def build_plan(top_products=50, pages=True):
+    """قائمة (المجموعة، الوصف، الدالة) مرتبة حسب الأهمية"""
+    plan = [
+        ("catalog", "all_categories", all_categories),
+        ("catalog", "main_categories", main_categories),
+        ("catalog", "latest_products", latest_products),
+        ("catalog", "suggested_products", suggested_products),
+    ]
+    # المنتجات الأكثر مشاهدة أولاً (view_count)، وهي نفسها ترتيب "الأكثر شعبية"
+    product_ids = list(
+        Product.objects.order_by("-view_count", "-id").values_list("pk", flat=True)[
+            :top_products
+        ]
+    )
+    plan += [
+        ("products", f"product:{pid}", lambda pid=pid: product_details_data(pid))
+        for pid in product_ids
+    ]
+    if pages:
+        urls = [reverse("index"), reverse("products")]
+        urls += [
+            f"{reverse('products')}?sort={sort}"
+            for sort in ("price_asc", "price_desc", "rating")
+        ]
+        urls += [
+            reverse("products", args=[cid])
+            for cid in Category.objects.values_list("pk", flat=True)
+        ]
+        urls += [reverse("product_details", args=[pid]) for pid in product_ids]
+        handler = _page_handler()
+        plan += [
+            ("pages", url, lambda url=url: _render_page(handler, url)) for url in urls
+        ]
+    return plan
+
+
+def _run(func):
+    try:
+        func()
+    finally:
+        # اتصالات قاعدة البيانات خاصة بكل thread
+        connections.close_all()
+
+
+def warm(budget=30.0, workers=4, top_products=50, pages=True):
+    """
+    تنفيذ خطة التسخين بالتوازي حتى تنتهي أو تنقضي الميزانية (بالثواني)، ثم انتظار
+    المهام التي بدأت فقط. لا يبقى أي thread بعد العودة. يعيد تقريراً: لكل مجموعة عدد المنجز والفاشل والإجمالي، والمدة.
+    """
+    started = time.monotonic()
+    plan = build_plan(top_products, pages)
+    report = {}
+    for group, _, _ in plan:
+        report.setdefault(group, {"done": 0, "failed": 0, "total": 0})["total"] += 1
+    errors = []
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warm")
+    futures = {executor.submit(_run, func): (group, label) for group, label, func in plan}
+    pending = set(futures)
+    while pending:
+        remaining = budget - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            group, label = futures[future]
+            if future.exception() is None:
+                report[group]["done"] += 1
+            else:
+                report[group]["failed"] += 1
+                errors.append(f"{label}: {future.exception()}")
+    # الميزانية انتهت: إلغاء ما لم يبدأ وانتظار ما يعمل حالياً. مع preload_app يعمل
+    # التسخين في عملية gunicorn الرئيسية قبل fork، وthread ما زال يعمل قد يحمل قفلاً
+    # (كاش الكتالوج، اتصال قاعدة البيانات) يبقى مأخوذاً للأبد في العمال
+    executor.shutdown(wait=True, cancel_futures=True)
+
+    return {
+        "groups": report,
+        "seconds": round(time.monotonic() - started, 2),
+        "budget_exhausted": bool(pending),
+        "errors": errors,
+    }